@@ -0,0 +1,64 @@
+"""
+Bounded-concurrency fan-out helpers for the batch endpoints.
+
+`run_bounded` runs one coroutine per item under a concurrency cap and yields
+each outcome as soon as it finishes, so results can be streamed back as
+NDJSON. A failing item is yielded as an error outcome instead of failing the
+whole batch.
+"""
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, Sequence
+
+from fastapi import HTTPException
+
+
+@dataclass
+class Outcome:
+    index: int
+    item: Any
+    result: Any = None
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+    ms: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def run_bounded(items: Sequence[Any], worker: Callable[[Any], Awaitable[Any]],
+                      concurrency: int) -> AsyncIterator[Outcome]:
+    """
+    Run `worker(item)` for every item, at most `concurrency` at a time,
+    yielding Outcomes in completion order. Pending work is cancelled if the
+    consumer stops early (e.g. the client disconnects).
+    """
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_one(index: int, item: Any) -> Outcome:
+        async with sem:
+            start = time.perf_counter()
+            outcome = Outcome(index=index, item=item)
+            try:
+                outcome.result = await worker(item)
+            except HTTPException as e:
+                outcome.error, outcome.status_code = str(e.detail), e.status_code
+            except Exception as e:
+                outcome.error, outcome.status_code = repr(e), 500
+            outcome.ms = round((time.perf_counter() - start) * 1000, 1)
+            return outcome
+
+    tasks = [asyncio.create_task(run_one(i, item)) for i, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def ndjson(obj: Any) -> bytes:
+    return (json.dumps(obj, separators=(",", ":")) + "\n").encode("utf-8")
@@ -0,0 +1,158 @@
+"""
+Benchmark: backend cold start, with a budget.
+
+Each run starts a fresh Python process that imports `main`, runs the FastAPI
+lifespan and answers one request. It reports:
+  import   time to import main (what every scale-to-zero worker pays first)
+  ready    import plus lifespan startup
+  first    ready plus the first GET /
+The slowest modules of one run are listed from `python -X importtime`.
+
+The pitch prompt renderer is checked too. Synthetic startups and investors
+are rendered with the precompiled template (prompts.py) and, when LangChain
+is installed, with the PromptTemplate it replaced. The outputs must be
+byte-identical. The backend no longer depends on LangChain; install it with
+requirements-dev.txt to run this check, otherwise it is skipped.
+
+The exit status is 1 when the median import or ready time exceeds its
+budget, so CI can track it.
+
+Usage (from backend/):
+    python -m benchmarks.bench_cold_start --runs 7 --import-budget-ms 1000 --ready-budget-ms 1500
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {backend!r})
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    ready = time.perf_counter()
+    client.get("/")
+    first = time.perf_counter()
+print(json.dumps({{"import": (imported - start) * 1000, "ready": (ready - start) * 1000,
+                  "first": (first - start) * 1000}}))
+"""
+
+
+def child_env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("SERPAPI_KEY", "bench")
+    # Point every upstream at a closed port: a cold start must not need the network
+    for provider in ("SERPAPI", "PROXYCURL", "TOGETHER"):
+        env[f"{provider}_BASE_URL"] = "http://127.0.0.1:9"
+    return env
+
+
+def cold_start(workdir: str) -> dict:
+    output = subprocess.run([sys.executable, "-c", CHILD.format(backend=str(BACKEND_DIR))], cwd=workdir,
+                            env=child_env(), capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(workdir: str, top: int) -> list:
+    """The modules `main` imports directly, slowest first, with their cumulative import time."""
+    code = f"import sys; sys.path.insert(0, {str(BACKEND_DIR)!r}); import main"
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=workdir, env=child_env(),
+                            capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        parts = line[len("import time:"):].split("|")
+        if not line.startswith("import time:") or len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2]
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            rows.append((int(parts[1]) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def check_prompt(samples: int) -> None:
+    import generation
+
+    rng = random.Random(0)
+    words = "seed series a fintech {braces} 'quotes' \"double\" ai climate\nnewline unicode-é".split(" ")
+
+    def text() -> str:
+        return " ".join(rng.choices(words, k=rng.randint(0, 12)))
+
+    cases = []
+    for i in range(samples):
+        startup = SimpleNamespace(name=f"Startup {i}", niche=text(), traction=text(), goals=text(),
+                                  extra_info=rng.choice([None, "", text()]))
+        investor = SimpleNamespace(name=rng.choice([None, f"Investor {i}"]), bio=text(), interests=text(),
+                                   linkedin=f"https://www.linkedin.com/in/investor-{i}", notable_investments=text(),
+                                   location=rng.choice(["", "Berlin"]))
+        cases.append((startup, investor, rng.choice(["professional", "casual"])))
+
+    start = time.perf_counter()
+    compiled = [generation.render_prompt(generation.pitch_template, *case) for case in cases]
+    compiled_us = (time.perf_counter() - start) / samples * 1e6
+    try:
+        from langchain.prompts import PromptTemplate
+    except ImportError:
+        print(f"prompt: {compiled_us:.1f} us per render (LangChain not installed; identity not checked)")
+        return
+    reference = PromptTemplate(input_variables=generation.pitch_template.input_variables,
+                               template=generation.pitch_template.template)
+    start = time.perf_counter()
+    expected = [generation.render_prompt(reference, *case) for case in cases]
+    reference_us = (time.perf_counter() - start) / samples * 1e6
+    mismatches = sum(a != b for a, b in zip(compiled, expected))
+    bound = generation.bind_startup(generation.pitch_template, cases[0][0])
+    bound_ref = reference.partial(**generation.startup_fields(cases[0][0]))
+    mismatches += sum(
+        generation.render_prompt(bound, None, investor, tone) != generation.render_prompt(bound_ref, None, investor, tone)
+        for _, investor, tone in cases
+    )
+    print(f"prompt: {compiled_us:.1f} us per render vs {reference_us:.1f} us with PromptTemplate, "
+          f"{mismatches} mismatches in {2 * samples} renders")
+    if mismatches:
+        raise SystemExit("precompiled prompt differs from PromptTemplate")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=1000.0)
+    parser.add_argument("--ready-budget-ms", type=float, default=1500.0)
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to list")
+    parser.add_argument("--prompt-samples", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cold_start(workdir)  # the first run also compiles bytecode; not counted
+        runs = [cold_start(workdir) for _ in range(args.runs)]
+        for ms, name in slowest_imports(workdir, args.top):
+            print(f"  {ms:8.1f} ms  {name}")
+
+    medians = {key: statistics.median(run[key] for run in runs) for key in ("import", "ready", "first")}
+    for key, value in medians.items():
+        print(f"{key:>6}: median {value:.0f} ms, max {max(run[key] for run in runs):.0f} ms")
+    check_prompt(args.prompt_samples)
+
+    over = [f"{key} {medians[key]:.0f} ms > {budget:g} ms" for key, budget in
+            (("import", args.import_budget_ms), ("ready", args.ready_budget_ms)) if medians[key] > budget]
+    if over:
+        raise SystemExit("over budget: " + ", ".join(over))
+    print("within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark: profile extraction backends (see extraction.py).
+
+Corpus: the committed debug_crunchbase.html plus synthetic profile pages of
+increasing size (profile header near the top, followed by filler sections,
+scripts and a footer). Every backend is first checked against the bs4
+reference for identical output, then timed. Each backend runs in a fresh
+process so its peak memory is measured on its own:
+  py_peak_kb   peak Python allocations (tracemalloc; misses libxml2's C heap)
+  rss_peak_kb  growth of the process's peak resident set while extracting
+
+Usage (from backend/):
+    python -m benchmarks.bench_extraction --sizes 50,500,2000 --seconds 2
+"""
+import argparse
+import multiprocessing
+import resource
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from extraction import available_backends, get_extractor  # noqa: E402
+
+DEBUG_PAGE = Path(__file__).resolve().parents[1] / "debug_crunchbase.html"
+
+
+def synthetic_page(size_kb: int, seed: int = 0) -> str:
+    """A Crunchbase-like profile page padded to roughly `size_kb` kilobytes."""
+    header = (
+        "<!DOCTYPE html><html><head><title>Profile</title>"
+        "<script>window.__state = {\"a\": \"<span>not text</span>\"};</script>"
+        "<style>.chip{color:red}</style></head><body>"
+        "<header><nav><a href='/'>Home</a><a class='nav-link' href='/discover'>Discover</a></nav></header>"
+        "<main><section class='profile-header'>"
+        f"<h1 class='profile-name title'>  Jane Q. Investor {seed} &amp; Partners </h1>"
+        "<div class='description-text'><span>Early-stage investor <b>backing</b> developer tools,"
+        " AI infrastructure &amp; fintech.<br>Based in San Francisco.</span></div>"
+        "<div class='chips-container'>"
+        "<a class='chip' href='/t/ai'> Artificial Intelligence </a>"
+        "<a class='chip' href='/t/devtools'>Developer Tools</a>"
+        "<a class='chip active' href='/t/fintech'>FinTech <!-- hot --></a>"
+        "</div></section>"
+    )
+    filler_section = (
+        "<section class='card'><h2>Recent Activity</h2><ul>"
+        + "".join(f"<li><a href='/org/{i}'>Organization {i}</a> raised a Series A<img src='/logo/{i}.png'></li>"
+                  for i in range(20))
+        + "</ul><p>Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor.</p>"
+        "<script>console.log('tracking');</script></section>"
+    )
+    footer = "</main><footer><p>&copy; Crunchbase</p></footer></body></html>"
+    body = [header]
+    size = len(header) + len(footer)
+    while size < size_kb * 1024:
+        body.append(filler_section)
+        size += len(filler_section)
+    body.append(footer)
+    return "".join(body)
+
+
+def build_corpus(sizes: List[int]) -> Dict[str, str]:
+    corpus = {"debug_crunchbase.html": DEBUG_PAGE.read_text(encoding="utf-8")}
+    for size in sizes:
+        corpus[f"synthetic {size} KB"] = synthetic_page(size)
+    return corpus
+
+
+def check_parity(corpus: Dict[str, str], backends: List[str]) -> List[str]:
+    reference = get_extractor("bs4")
+    mismatches = []
+    for label, page in corpus.items():
+        expected = reference(page)
+        for backend in backends:
+            got = get_extractor(backend)(page)
+            if got != expected:
+                mismatches.append(f"{backend} on {label}: {got!r} != {expected!r}")
+    return mismatches
+
+
+def measure(args) -> Dict[str, dict]:
+    """Runs in a fresh process: time and memory for one backend over every page."""
+    backend, corpus, seconds = args
+    extract = get_extractor(backend)
+    extract(next(iter(corpus.values())))  # import and warm up outside the measurement
+    results = {}
+    for label, page in corpus.items():
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        tracemalloc.start()
+        extract(page)
+        _, py_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+
+        count = 0
+        start = time.perf_counter()
+        deadline = start + seconds
+        while True:
+            extract(page)
+            count += 1
+            if time.perf_counter() >= deadline:
+                break
+        elapsed = time.perf_counter() - start
+        results[label] = {"pages_per_s": count / elapsed, "py_peak_kb": py_peak / 1024, "rss_peak_kb": rss_peak}
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="50,500,2000", help="synthetic page sizes in KB")
+    parser.add_argument("--seconds", type=float, default=2.0, help="timing budget per backend and page")
+    parser.add_argument("--backends", default=",".join(available_backends()))
+    args = parser.parse_args()
+
+    backends = [b for b in args.backends.split(",") if b]
+    corpus = build_corpus([int(s) for s in args.sizes.split(",") if s])
+
+    mismatches = check_parity(corpus, [b for b in backends if b != "bs4"])
+    if mismatches:
+        print("OUTPUT MISMATCH:")
+        for line in mismatches:
+            print("  " + line)
+        sys.exit(1)
+    print(f"parity: all backends match bs4 on {len(corpus)} pages\n")
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'page':<24}{'backend':<14}{'pages/s':>12}{'speedup':>10}{'py peak':>12}{'rss peak':>12}")
+    table = {}
+    for backend in backends:
+        with ctx.Pool(1) as pool:
+            table[backend] = pool.apply(measure, ((backend, corpus, args.seconds),))
+    for label in corpus:
+        base = table.get("bs4", {}).get(label, {}).get("pages_per_s")
+        for backend in backends:
+            r = table[backend][label]
+            speedup = f"{r['pages_per_s'] / base:.1f}x" if base else "-"
+            print(f"{label:<24}{backend:<14}{r['pages_per_s']:>12.1f}{speedup:>10}"
+                  f"{r['py_peak_kb']:>10.0f}KB{r['rss_peak_kb']:>10.0f}KB")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: per-request httpx.AsyncClient vs the shared pooled client.
+
+Starts a local SerpAPI stand-in and fires the same /search call through
+both clients at a fixed concurrency, then reports latency and throughput.
+Against a local plain-HTTP server only the TCP connect is saved per call;
+against the real upstreams each reused connection also skips a TLS handshake,
+so production gains are larger than what this prints.
+
+Usage (from backend/):
+    python -m benchmarks.bench_http_client --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, List
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.standins import StandinServer, create_app  # noqa: E402
+
+PARAMS = {"engine": "google", "q": "seed investor site:linkedin.com/in", "num": 5, "api_key": "bench"}
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(call: Callable[[], Awaitable[None]], total: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    return {
+        "rps": total / elapsed,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    with StandinServer(create_app(latency=args.latency)) as server:
+        os.environ["SERPAPI_BASE_URL"] = server.url
+        import http_clients
+
+        async def per_request():
+            async with httpx.AsyncClient() as client:
+                resp = await client.get(f"{server.url}/search", params=PARAMS)
+                resp.raise_for_status()
+
+        await http_clients.startup()
+        shared = http_clients.get_client("serpapi")
+
+        async def pooled():
+            resp = await shared.get("/search", params=PARAMS)
+            resp.raise_for_status()
+
+        # Warm up both paths so the first-import/JIT costs are not measured
+        await run(per_request, args.concurrency, args.concurrency)
+        await run(pooled, args.concurrency, args.concurrency)
+
+        results = {
+            "per-request client": await run(per_request, args.requests, args.concurrency),
+            "shared pooled client": await run(pooled, args.requests, args.concurrency),
+        }
+        await http_clients.shutdown()
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, upstream latency {args.latency * 1000:.0f} ms")
+    print(f"{'client':<22}{'req/s':>10}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, r in results.items():
+        print(f"{name:<22}{r['rps']:>10.1f}{r['mean_ms']:>9.2f}ms{r['p50_ms']:>8.2f}ms{r['p95_ms']:>8.2f}ms{r['p99_ms']:>8.2f}ms")
+    base, pooled_r = results["per-request client"], results["shared pooled client"]
+    print(f"throughput gain: {pooled_r['rps'] / base['rps']:.2f}x, p50 latency: {base['p50_ms'] / pooled_r['p50_ms']:.2f}x lower")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated upstream latency in seconds")
+    asyncio.run(main(parser.parse_args()))
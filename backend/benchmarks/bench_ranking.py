@@ -0,0 +1,93 @@
+"""
+Benchmark: investor-startup fit ranking (see ranking.py).
+
+Builds a corpus of synthetic enriched profiles, then reports:
+  index     tokenizing and adding every profile (done once, as profiles arrive)
+  prepare   rebuilding IDF and normalised weights after the corpus changed
+  rank      scoring the whole corpus for one startup and taking the top-k
+  update    adding one profile and ranking again (incremental path)
+
+Usage (from backend/):
+    python -m benchmarks.bench_ranking --investors 100000 --top-k 10
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from ranking import FitRanker  # noqa: E402
+
+TOPICS = (
+    "ai machine learning infrastructure developer tools fintech payments climate energy "
+    "health biotech robotics saas marketplace consumer crypto security data analytics "
+    "edtech logistics mobility gaming media enterprise cloud devops insurance proptech"
+).split()
+STAGES = ["pre-seed", "seed", "series a", "series b", "growth"]
+WORDS = "partner investor founder operator angel fund backing early stage companies teams".split()
+
+
+def synthetic_profile(i: int, rng: random.Random) -> dict:
+    topics = rng.sample(TOPICS, 4)
+    return {
+        "name": f"Investor {i}",
+        "linkedin": f"https://www.linkedin.com/in/investor-{i}",
+        "bio": " ".join(rng.choices(WORDS + topics, k=30)) + f" {rng.choice(STAGES)}",
+        "interests": ", ".join(topics[:3]),
+        "notable_investments": ", ".join(f"{rng.choice(TOPICS).title()} Labs {rng.randint(1, 5000)}" for _ in range(3)),
+        "location": rng.choice(["San Francisco", "New York", "London", "Berlin", "Bangalore"]),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--investors", type=int, default=100000)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    profiles = [synthetic_profile(i, rng) for i in range(args.investors)]
+    startups = [
+        SimpleNamespace(niche=" ".join(rng.sample(TOPICS, 2)), traction="10k users, growing 20% monthly",
+                        goals=f"raise a {rng.choice(STAGES)} round")
+        for _ in range(args.queries)
+    ]
+
+    ranker = FitRanker()
+    start = time.perf_counter()
+    ranker.add_many(profiles)
+    index_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ranker.rank(startups[0], args.top_k)
+    first_ms = (time.perf_counter() - start) * 1000
+
+    rank_ms = []
+    for startup in startups:
+        start = time.perf_counter()
+        result = ranker.rank(startup, args.top_k)
+        rank_ms.append((time.perf_counter() - start) * 1000)
+
+    update_ms = []
+    for i in range(5):
+        start = time.perf_counter()
+        ranker.add(synthetic_profile(i, rng))  # replaces an existing investor
+        ranker.rank(startups[i % len(startups)], args.top_k)
+        update_ms.append((time.perf_counter() - start) * 1000)
+
+    print(f"investors: {args.investors}, vocabulary: {len(ranker.vocab)}")
+    print(f"index:   {index_s:.2f}s ({args.investors / index_s:.0f} profiles/s)")
+    print(f"prepare + first rank: {first_ms:.1f} ms")
+    print(f"rank:    p50 {statistics.median(rank_ms):.1f} ms, max {max(rank_ms):.1f} ms")
+    print(f"update + rank: p50 {statistics.median(update_ms):.1f} ms")
+    best = result["results"][0]
+    print(f"example top hit: {best['investor']['name']} score {best['score']} fields {best['fields']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark: JSON serialization of large responses (see serialization.py).
+
+Renders /rank_investors and /search_investors shaped payloads of 10 to 10k
+investor profiles three ways:
+  current         what FastAPI does with a returned dict: jsonable_encoder,
+                  then JSONResponse (stdlib json)
+  response_model  validating against the typed model and dumping it with
+                  Pydantic, FastAPI's path when a handler returns a dict and
+                  declares a response_model
+  fast            FastJSONResponse, what the endpoints return now
+For each it reports time per response, throughput in profiles/s and MB/s,
+and peak memory allocated while rendering (tracemalloc, in a separate pass).
+`fast` must produce the same bytes as `current`; the benchmark exits with an
+error otherwise. `response_model` output is flagged when it differs (the
+model reorders keys to its declaration order and drops undeclared ones),
+which is why the endpoints do not use that path.
+
+Usage (from backend/):
+    python -m benchmarks.bench_serialization --sizes 10,100,1000,10000
+"""
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+
+from benchmarks.bench_ranking import synthetic_profile  # noqa: E402
+from main import RankResponse, SearchResponse  # noqa: E402
+from serialization import FastJSONResponse, orjson  # noqa: E402
+
+
+def rank_payload(n: int, rng: random.Random) -> dict:
+    results = [{"investor": synthetic_profile(i, rng), "score": round(rng.random(), 4),
+                "fields": {"bio": round(rng.random(), 4), "interests": round(rng.random(), 4),
+                           "notable_investments": round(rng.random(), 4)}} for i in range(n)]
+    return {"results": results, "total": n, "ms": 12.3}
+
+
+def search_payload(n: int, rng: random.Random) -> dict:
+    def result(i: int, site: str) -> dict:
+        return {"title": f"Investor {i} - Partner at Fund {rng.randint(1, 500)} | LinkedIn",
+                "url": f"https://www.{site}/investor-{i}",
+                "snippet": "Partner at Example Ventures. Seed and Series A in fintech, climate and AI, Zürich."}
+
+    return {"linkedin": [result(i, "linkedin.com/in") for i in range(n // 2)],
+            "crunchbase": [result(i, "crunchbase.com/person") for i in range(n - n // 2)],
+            "source": "serpapi"}
+
+
+def paths(model) -> Dict[str, Callable[[dict], bytes]]:
+    adapter = TypeAdapter(model)
+    return {
+        "current": lambda payload: JSONResponse(jsonable_encoder(payload)).body,
+        "response_model": lambda payload: adapter.dump_json(adapter.validate_python(payload)),
+        "fast": lambda payload: FastJSONResponse(payload).body,
+    }
+
+
+def timed(render: Callable[[dict], bytes], payload: dict, min_seconds: float) -> float:
+    """Seconds per render, averaged over at least `min_seconds`."""
+    render(payload)
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        render(payload)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / runs
+
+
+def peak_bytes(render: Callable[[dict], bytes], payload: dict) -> int:
+    tracemalloc.start()
+    try:
+        render(payload)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000,10000", help="profiles per payload, comma-separated")
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="time spent per measurement")
+    args = parser.parse_args()
+
+    print(f"encoder: {'orjson ' + orjson.__version__ if orjson is not None else 'stdlib json (orjson not installed)'}")
+    rng = random.Random(0)
+    mismatches = 0
+    for name, build, model in (("rank", rank_payload, RankResponse), ("search", search_payload, SearchResponse)):
+        renderers = paths(model)
+        for size in (int(s) for s in args.sizes.split(",")):
+            payload = build(size, rng)
+            expected = renderers["current"](payload)
+            baseline = None
+            for path, render in renderers.items():
+                if render(payload) != expected:
+                    mismatches += path == "fast"
+                    print(f"{name} x{size}: {path} output differs from current")
+                seconds = timed(render, payload, args.min_seconds)
+                baseline = baseline or seconds
+                print(f"{name:>6} x{size:<6} {path:<15} {seconds * 1000:9.3f} ms  {size / seconds:12,.0f} profiles/s  "
+                      f"{len(expected) / seconds / 1e6:8.1f} MB/s  peak {peak_bytes(render, payload) / 1e6:7.2f} MB  "
+                      f"{baseline / seconds:5.1f}x")
+    if mismatches:
+        raise SystemExit(f"{mismatches} fast outputs differ from the current path")
+
+
+if __name__ == "__main__":
+    main()
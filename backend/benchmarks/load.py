@@ -0,0 +1,313 @@
+"""
+End-to-end load benchmark for every backend endpoint.
+
+Starts the upstream stand-ins (benchmarks/standins.py) and the backend
+(uvicorn main:app) as subprocesses, with the backend's caches, search index
+and snapshots in a fresh temporary directory. Then drives each endpoint in
+turn with a fixed number of requests at a fixed concurrency and reports
+throughput and p50/p95/p99 latency. Streaming endpoints are timed until the
+last byte.
+
+Every run is saved to benchmarks/results/<time>-<commit>.json. Use --compare
+to diff against an earlier run (a file, or "latest") and --fail-on-regression
+to exit non-zero when an endpoint got slower or lost throughput beyond
+--threshold percent.
+
+Usage (from backend/):
+    python -m benchmarks.load --requests 200 --concurrency 20 --latency 0.05 --distribution lognormal --jitter 0.5
+    python -m benchmarks.load --endpoints search_investors,generate --cold --compare latest --fail-on-regression
+    python -m benchmarks.load --target http://127.0.0.1:8000   # an already running backend
+
+scrape_crunchbase needs Playwright's Chromium; without it that endpoint
+reports errors.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.bench_http_client import percentile  # noqa: E402
+from benchmarks.standins import add_profile_arguments, free_port  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+STARTUP = {"name": "Acme", "niche": "AI developer tools", "traction": "10k users, 20% monthly growth",
+           "goals": "raise a seed round", "extra_info": "https://acme.example"}
+
+
+def investor(i: int) -> dict:
+    return {"name": f"Investor {i}", "bio": "Seed investor in developer tools.", "interests": "AI, DevTools",
+            "linkedin": f"https://www.linkedin.com/in/investor-{i}", "notable_investments": "Acme AI",
+            "location": "San Francisco"}
+
+
+# name -> (method, path, body builder(i, cold) or None, response kind)
+SCENARIOS: Dict[str, tuple] = {
+    "root": ("GET", "/", None, "json"),
+    "search_investors": ("POST", "/search_investors", lambda i, cold: {
+        "keywords": f"seed investor {i}", "num_results": 5, "no_cache": cold}, "json"),
+    "search_investors_50": ("POST", "/search_investors", lambda i, cold: {
+        "keywords": f"seed investor {i}", "num_results": 50, "no_cache": cold}, "json"),
+    "search_investors_stream": ("POST", "/search_investors_stream", lambda i, cold: {
+        "keywords": f"seed investor {i}", "num_results": 20, "no_cache": cold}, "stream"),
+    "enrich_investor": ("POST", "/enrich_investor", lambda i, cold: {
+        "linkedin_url": f"https://www.linkedin.com/in/investor-{i}", "no_cache": cold}, "json"),
+    "auto_enrich_investor": ("POST", "/auto_enrich_investor", lambda i, cold: {
+        "name": f"Investor {i}", "no_cache": cold}, "json"),
+    "bulk_enrich_investors": ("POST", "/bulk_enrich_investors", lambda i, cold: {
+        "investors": [f"Investor {i}-{n}" for n in range(10)], "no_cache": cold}, "stream"),
+    "rank_investors": ("POST", "/rank_investors", lambda i, cold: {"startup": STARTUP, "top_k": 10}, "json"),
+    "generate": ("POST", "/generate", lambda i, cold: {
+        "startup": STARTUP, "investor": investor(i), "fresh": cold}, "json"),
+    "generate_stream": ("POST", "/generate_stream", lambda i, cold: {
+        "startup": STARTUP, "investor": investor(i), "fresh": cold}, "stream"),
+    "generate_batch": ("POST", "/generate_batch", lambda i, cold: {
+        "startup": STARTUP, "investors": [investor(i * 5 + n) for n in range(5)], "fresh": cold}, "stream"),
+    "submit_job": ("POST", "/jobs", lambda i, cold: {
+        "kind": "generate", "payload": {"startup": STARTUP, "investor": investor(i), "fresh": cold}}, "json"),
+    "scrape_crunchbase": ("POST", "/scrape_crunchbase", None, "json"),  # body needs the stand-in URL
+    "cache_stats": ("GET", "/cache/stats", None, "json"),
+    "generation_stats": ("GET", "/generation/stats", None, "json"),
+    "search_index_stats": ("GET", "/search_index/stats", None, "json"),
+    "upstream_stats": ("GET", "/upstream/stats", None, "json"),
+}
+
+
+def git_revision() -> dict:
+    def git(*args: str) -> str:
+        try:
+            return subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True,
+                                  timeout=30).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+
+    return {"commit": git("rev-parse", "--short", "HEAD") or "unknown",
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def wait_until_up(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def start_standins(args: argparse.Namespace, port: int) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "benchmarks.standins", "--port", str(port),
+           "--latency", str(args.latency), "--jitter", str(args.jitter), "--distribution", args.distribution,
+           "--error-rate", str(args.error_rate), "--throttle-rate", str(args.throttle_rate),
+           "--retry-after", str(args.retry_after), "--seed", str(args.seed)]
+    for override in args.profile:
+        cmd += ["--profile", override]
+    return subprocess.Popen(cmd, cwd=BACKEND_DIR)
+
+
+def start_backend(port: int, upstream: str, workdir: str) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "SERPAPI_BASE_URL": upstream, "PROXYCURL_BASE_URL": upstream, "TOGETHER_BASE_URL": upstream,
+        "SERPAPI_KEY": "bench", "PROXYCURL_KEY": "bench", "TOGETHER_API_KEY": "bench",
+    })
+    cmd = [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", str(BACKEND_DIR),
+           "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    # Relative paths (cache databases, search index, snapshots) land in the temporary workdir
+    return subprocess.Popen(cmd, cwd=workdir, env=env)
+
+
+async def drive(client: httpx.AsyncClient, name: str, build: Callable[[int], Optional[dict]],
+                total: int, concurrency: int) -> dict:
+    method, path, _, kind = SCENARIOS[name]
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    next_index = iter(range(total))
+
+    async def worker():
+        for i in next_index:
+            body = build(i)
+            start = time.perf_counter()
+            try:
+                if kind == "stream":
+                    async with client.stream(method, path, json=body) as resp:
+                        async for _ in resp.aiter_raw():
+                            pass
+                else:
+                    resp = await client.request(method, path, json=body)
+                    resp.read()
+                statuses[str(resp.status_code)] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    ok = sum(n for status, n in statuses.items() if status.startswith("2"))
+    return {
+        "requests": total,
+        "ok": ok,
+        "statuses": dict(statuses),
+        "rps": round(total / elapsed, 2),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+    }
+
+
+async def run_all(target: str, upstream: Optional[str], args: argparse.Namespace, names: List[str]) -> Dict[str, dict]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=target, limits=limits, timeout=args.timeout) as client:
+        for name in names:
+            _, _, builder, _ = SCENARIOS[name]
+            if name == "scrape_crunchbase":
+                base = upstream or "https://www.crunchbase.com"
+                build = lambda i: {"urls": [f"{base}/person/investor-{i}"]}  # noqa: E731
+            elif builder is None:
+                build = lambda i: None  # noqa: E731
+            else:
+                distinct = args.distinct
+                build = lambda i, b=builder: b(i % distinct if distinct else i, args.cold)  # noqa: E731
+            # A short warm-up so imports and connection setup are not measured
+            await drive(client, name, build, min(args.concurrency, args.requests), args.concurrency)
+            results[name] = await drive(client, name, build, args.requests, args.concurrency)
+            r = results[name]
+            failed = {s: n for s, n in r["statuses"].items() if not s.startswith("2")}
+            print(f"{name:<24}{r['rps']:>9.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}"
+                  f"{r['ok']:>8}/{r['requests']:<6}{' ' + json.dumps(failed) if failed else ''}", flush=True)
+    return results
+
+
+def previous_run(path: str, exclude: Path) -> Optional[Path]:
+    if path != "latest":
+        return Path(path)
+    runs = sorted(p for p in RESULTS_DIR.glob("*.json") if p != exclude)
+    return runs[-1] if runs else None
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """Print per-endpoint changes against `baseline` and return the regressions."""
+    regressions = []
+    print(f"\ncompared with {baseline['meta']['commit']}{' (dirty)' if baseline['meta'].get('dirty') else ''}"
+          f" from {baseline['meta']['time']}:")
+    print(f"{'endpoint':<24}{'req/s':>16}{'p95':>18}{'p99':>18}")
+    for name, now in current["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if not before:
+            continue
+
+        def delta(key: str) -> float:
+            return (now[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+
+        print(f"{name:<24}{now['rps']:>9.1f} {delta('rps'):>+5.0f}%{now['p95_ms']:>10.1f} {delta('p95_ms'):>+5.0f}%"
+              f"{now['p99_ms']:>10.1f} {delta('p99_ms'):>+5.0f}%")
+        # Ignore sub-millisecond wobble on very fast endpoints
+        if delta("p95_ms") > threshold and now["p95_ms"] - before["p95_ms"] > 1.0:
+            regressions.append(f"{name}: p95 {before['p95_ms']} -> {now['p95_ms']} ms")
+        if -delta("rps") > threshold:
+            regressions.append(f"{name}: throughput {before['rps']} -> {now['rps']} req/s")
+        if now["ok"] < before["ok"]:
+            regressions.append(f"{name}: successful requests {before['ok']} -> {now['ok']}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default=",".join(SCENARIOS), help="comma-separated scenario names")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=60.0, help="client timeout per request in seconds")
+    parser.add_argument("--distinct", type=int, default=0,
+                        help="cycle through this many distinct payloads (0: every request is new)")
+    parser.add_argument("--cold", action="store_true", help="send no_cache/fresh so backend caches are bypassed")
+    parser.add_argument("--target", help="benchmark this running backend instead of starting one")
+    parser.add_argument("--label", default="", help="free-form note stored with the results")
+    parser.add_argument("--compare", help='results file to compare with, or "latest"')
+    parser.add_argument("--threshold", type=float, default=20.0, help="regression threshold in percent")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--no-save", action="store_true", help="do not write a results file")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    names = [n for n in args.endpoints.split(",") if n]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown endpoints {unknown}; choose from {', '.join(SCENARIOS)}")
+
+    processes: List[subprocess.Popen] = []
+    upstream = None
+    try:
+        with tempfile.TemporaryDirectory(prefix="load-bench-") as workdir:
+            target = args.target
+            if not target:
+                upstream = f"http://127.0.0.1:{free_port()}"
+                processes.append(start_standins(args, int(upstream.rsplit(":", 1)[1])))
+                wait_until_up(f"{upstream}/standin/stats")
+                target = f"http://127.0.0.1:{free_port()}"
+                processes.append(start_backend(int(target.rsplit(":", 1)[1]), upstream, workdir))
+                wait_until_up(target)
+
+            print(f"{args.requests} requests per endpoint, concurrency {args.concurrency}, upstream latency "
+                  f"{args.latency * 1000:.0f} ms {args.distribution}, errors {args.error_rate:.1%}, "
+                  f"429s {args.throttle_rate:.1%}{', cold' if args.cold else ''}")
+            print(f"{'endpoint':<24}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ok':>8}")
+            endpoints = asyncio.run(run_all(target, upstream, args, names))
+            upstream_stats = httpx.get(f"{upstream}/standin/stats").json() if upstream else None
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    meta = {**git_revision(), "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "label": args.label, "python": sys.version.split()[0], "cpus": os.cpu_count(),
+            "settings": {k: v for k, v in vars(args).items()
+                         if k not in ("compare", "fail_on_regression", "no_save", "label")}}
+    run = {"meta": meta, "endpoints": endpoints, "upstream": upstream_stats}
+
+    saved = None
+    if not args.no_save:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        saved = RESULTS_DIR / f"{stamp}-{meta['commit']}{'-dirty' if meta['dirty'] else ''}.json"
+        saved.write_text(json.dumps(run, indent=2))
+        print(f"\nsaved {saved.relative_to(BACKEND_DIR)}")
+
+    if args.compare:
+        baseline_path = previous_run(args.compare, saved)
+        if baseline_path is None:
+            print("no earlier run to compare with")
+            return
+        regressions = compare(run, json.loads(baseline_path.read_text()), args.threshold)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for line in regressions:
+                print("  " + line)
+            if args.fail_on_regression:
+                sys.exit(1)
+        else:
+            print("\nno regressions")
+
+
+if __name__ == "__main__":
+    main()
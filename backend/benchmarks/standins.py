@@ -0,0 +1,273 @@
+"""
+Local stand-ins for the upstream APIs the backend calls.
+
+They return responses shaped like SerpAPI, Proxycurl and Together (plus a
+Crunchbase-like profile page for the scraper) so the backend can be
+exercised and benchmarked without spending real quota. Point the backend at
+them with SERPAPI_BASE_URL / PROXYCURL_BASE_URL / TOGETHER_BASE_URL.
+
+Each provider can be given an UpstreamProfile: a latency distribution, a
+rate of 500 errors and a rate of 429 responses carrying Retry-After.
+
+Run standalone (from backend/):
+    python -m benchmarks.standins --port 9000 --latency 0.2 --distribution lognormal \\
+        --error-rate 0.01 --throttle-rate 0.02 --profile together:latency=1.5,jitter=0.5
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass, field, fields, replace
+from typing import Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+
+PROVIDERS = ("serpapi", "proxycurl", "together", "crunchbase")
+DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+SEARCH_RESULTS = 100  # results a stand-in Google query has across all its pages
+
+
+@dataclass
+class UpstreamProfile:
+    """
+    How one stand-in provider behaves. `latency` is the mean delay in
+    seconds; `jitter` is the spread (uniform: +/- jitter, normal: standard
+    deviation, lognormal: sigma of the underlying normal; exponential ignores
+    it). `error_rate` and `throttle_rate` are the fractions of requests
+    answered with 500 and with 429 + Retry-After.
+    """
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    distribution: str = "fixed"
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after: float = 1.0
+    rng: random.Random = field(default_factory=random.Random, repr=False, compare=False)
+
+    def delay(self) -> float:
+        mean = self.latency
+        if mean <= 0:
+            return 0.0
+        if self.distribution == "uniform":
+            value = self.rng.uniform(mean - self.jitter, mean + self.jitter)
+        elif self.distribution == "normal":
+            value = self.rng.gauss(mean, self.jitter)
+        elif self.distribution == "lognormal":
+            # Scaled so the mean stays `latency` while sigma sets the tail
+            value = self.rng.lognormvariate(0.0, self.jitter) * mean / math.exp(self.jitter ** 2 / 2)
+        elif self.distribution == "exponential":
+            value = self.rng.expovariate(1.0 / mean)
+        else:
+            value = mean
+        return max(0.0, value)
+
+    def fault(self) -> Optional[JSONResponse]:
+        roll = self.rng.random()
+        if roll < self.throttle_rate:
+            return JSONResponse({"error": "Too many requests (stand-in)"}, status_code=429,
+                                headers={"Retry-After": f"{self.retry_after:g}"})
+        if roll < self.throttle_rate + self.error_rate:
+            return JSONResponse({"error": "Internal error (stand-in)"}, status_code=500)
+        return None
+
+
+def parse_profile_spec(spec: str, base: UpstreamProfile) -> UpstreamProfile:
+    """'latency=0.4,jitter=0.2,distribution=lognormal,error_rate=0.01' applied on top of `base`."""
+    types = {f.name: f.type for f in fields(UpstreamProfile) if f.name != "rng"}
+    changes = {}
+    for item in filter(None, spec.split(",")):
+        key, _, value = item.partition("=")
+        key = key.strip().replace("-", "_")
+        if key not in types:
+            raise ValueError(f"Unknown stand-in setting {key!r}; choose from {', '.join(types)}")
+        changes[key] = value.strip() if key == "distribution" else float(value)
+    if changes.get("distribution", base.distribution) not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution; choose from {', '.join(DISTRIBUTIONS)}")
+    return replace(base, rng=random.Random(base.rng.random()), **changes)
+
+
+def create_app(latency: float = 0.0, profiles: Optional[Dict[str, UpstreamProfile]] = None) -> FastAPI:
+    """
+    Build a stand-in app. Providers without an entry in `profiles` answer
+    every request after a fixed `latency` seconds and never fail.
+    """
+    app = FastAPI()
+    profiles = dict(profiles or {})
+    for name in PROVIDERS:
+        profiles.setdefault(name, UpstreamProfile(latency=latency))
+    counters: Dict[str, Dict[str, int]] = {name: {"ok": 0, "429": 0, "500": 0} for name in PROVIDERS}
+
+    async def behave(provider: str) -> Optional[JSONResponse]:
+        profile = profiles[provider]
+        await asyncio.sleep(profile.delay())
+        response = profile.fault()
+        counters[provider][str(response.status_code) if response else "ok"] += 1
+        return response
+
+    @app.get("/search")
+    async def serpapi_search(request: Request):
+        fault = await behave("serpapi")
+        if fault:
+            return fault
+        params = request.query_params
+        if params.get("engine") == "linkedin_profile":
+            return {"linkedin_profile": {
+                "name": "Jane Investor",
+                "about": "Early-stage investor in developer tools and AI infrastructure.",
+                "interests": ["AI", "DevTools", "Fintech"],
+                "featured": ["Acme AI", "Globex"],
+                "location": "San Francisco Bay Area",
+            }}
+        query = params.get("q", "")
+        num = int(params.get("num", 10) or 10)
+        start = int(params.get("start", 0) or 0)
+        results = []
+        for i in range(start, min(start + num, SEARCH_RESULTS)):
+            if "crunchbase" in query or (i % 2 and "linkedin" not in query):
+                link = f"https://www.crunchbase.com/person/investor-{i}"
+                snippet = "Notable investments include Acme AI, Globex, Initech."
+            else:
+                link = f"https://www.linkedin.com/in/investor-{i}"
+                snippet = "Partner at Example Ventures. Seed and Series A."
+            results.append({"position": i + 1, "title": f"Investor {i} - {query}", "link": link, "snippet": snippet})
+        data = {"organic_results": results}
+        if start + num < SEARCH_RESULTS:
+            data["serpapi_pagination"] = {"current": start // num + 1, "next": f"/search?start={start + num}"}
+        return data
+
+    @app.get("/api/v2/linkedin")
+    async def proxycurl_linkedin(url: str = ""):
+        fault = await behave("proxycurl")
+        if fault:
+            return fault
+        return {
+            "full_name": "Jane Investor",
+            "summary": "Investor focused on AI infrastructure and developer tools.",
+            "activities": ["Angel investing", "Mentoring founders"],
+            "city": "San Francisco",
+            "experiences": [{"notable_investments": ["Acme AI"]}],
+            "public_identifier": url.rstrip("/").rsplit("/", 1)[-1],
+        }
+
+    @app.post("/v1/completions")
+    async def together_completions(request: Request):
+        fault = await behave("together")
+        if fault:
+            return fault
+        body = await request.json()
+        token_delay = profiles["together"].latency / len(COMPLETION_TOKENS)
+        if body.get("stream"):
+            return StreamingResponse(_stream_tokens(body, token_delay), media_type="text/event-stream")
+        return {
+            "id": "standin",
+            "model": body.get("model", ""),
+            "choices": [{"text": "".join(COMPLETION_TOKENS), "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(body.get("prompt", "")) // 4, "completion_tokens": 12},
+        }
+
+    @app.get("/person/{slug}")
+    async def crunchbase_person(slug: str):
+        fault = await behave("crunchbase")
+        if fault:
+            return fault
+        return HTMLResponse(
+            "<html><body><h1 class='profile-name'>Jane Investor</h1>"
+            "<div class='description-text'><span>Early-stage investor.</span></div>"
+            "<a class='chip'>AI</a><a class='chip'>Fintech</a></body></html>"
+        )
+
+    @app.get("/standin/stats")
+    async def standin_stats():
+        return counters
+
+    return app
+
+
+COMPLETION_TOKENS = ["Subject:", " Quick", " intro", "\n\n", "Hi", " there", ",", " ..."]
+
+
+async def _stream_tokens(body: dict, token_delay: float):
+    for token in COMPLETION_TOKENS:
+        chunk = {"choices": [{"text": token, "finish_reason": None}], "model": body.get("model", "")}
+        yield f"data: {json.dumps(chunk)}\n\n"
+        await asyncio.sleep(token_delay)
+    yield "data: [DONE]\n\n"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class StandinServer:
+    """Runs a stand-in app with uvicorn on a background thread."""
+
+    def __init__(self, app: FastAPI, port: Optional[int] = None):
+        self.port = port or free_port()
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="off")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "StandinServer":
+        self.thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("stand-in server did not start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser) -> None:
+    """Stand-in behaviour flags, shared with the load harness."""
+    parser.add_argument("--latency", type=float, default=0.0, help="mean upstream latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="latency spread (see UpstreamProfile)")
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 500 responses")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of 429 responses")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds on 429s")
+    parser.add_argument("--profile", action="append", default=[], metavar="PROVIDER:SPEC",
+                        help="per-provider override, e.g. together:latency=1.5,jitter=0.5 (repeatable)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for latency and faults")
+
+
+def profiles_from_args(args: argparse.Namespace) -> Dict[str, UpstreamProfile]:
+    rng = random.Random(args.seed)
+    base = UpstreamProfile(latency=args.latency, jitter=args.jitter, distribution=args.distribution,
+                           error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                           retry_after=args.retry_after)
+    profiles = {name: replace(base, rng=random.Random(rng.random())) for name in PROVIDERS}
+    for override in args.profile:
+        provider, _, spec = override.partition(":")
+        if provider not in profiles:
+            raise SystemExit(f"Unknown provider {provider!r}; choose from {', '.join(PROVIDERS)}")
+        profiles[provider] = parse_profile_spec(spec, profiles[provider])
+    return profiles
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9000)
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+    uvicorn.run(create_app(profiles=profiles_from_args(args)), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Warm, in-process browser pool for scraping Crunchbase profiles.
+
+One Chromium instance is launched on first use and kept for the life of the
+backend. It holds a fixed number of browser contexts, each with one reusable
+page, handed out through a queue. Images, fonts and media are blocked at the
+network layer. Every URL gets a hard deadline, and a page that misbehaves is
+replaced instead of being returned to the pool. Captured HTML goes to the
+snapshot store off the request path.
+
+Settings (environment variables):
+  SCRAPER_POOL_SIZE   contexts/pages kept warm, i.e. max parallel scrapes (default 4)
+  SCRAPER_DEADLINE    seconds allowed per URL (default 20)
+  SCRAPER_HEADLESS    "0" to show the browser while debugging (default 1)
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Set
+
+from fastapi import HTTPException
+
+from batch import run_bounded
+from config import env_flag, env_float, env_int
+from metrics import span, upstream_call
+from scraper import PROFILE_SELECTOR, ScrapeError, parse_profile
+from snapshots import snapshot_store
+
+logger = logging.getLogger(__name__)
+
+SCRAPER_POOL_SIZE = env_int("SCRAPER_POOL_SIZE", 4)
+SCRAPER_DEADLINE = env_float("SCRAPER_DEADLINE", 20.0)
+SCRAPER_HEADLESS = env_flag("SCRAPER_HEADLESS", True)
+
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+
+
+async def _block_heavy_resources(route) -> None:
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class BrowserPool:
+    def __init__(self, size: int = SCRAPER_POOL_SIZE, headless: bool = SCRAPER_HEADLESS):
+        self.size = max(1, size)
+        self.headless = headless
+        self._playwright = None
+        self._browser = None
+        self._pages: Optional[asyncio.Queue] = None
+        self._start_lock = asyncio.Lock()
+        self._pending: Set[asyncio.Task] = set()
+
+    @property
+    def started(self) -> bool:
+        return self._browser is not None
+
+    async def start(self) -> None:
+        """Launch the browser and open the pool's pages. Safe to call repeatedly."""
+        async with self._start_lock:
+            if self.started:
+                return
+            try:
+                from playwright.async_api import async_playwright
+            except ImportError:
+                raise HTTPException(status_code=503, detail="Playwright is not installed on this server.")
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=self.headless)
+            self._pages = asyncio.Queue()
+            for _ in range(self.size):
+                self._pages.put_nowait(await self._new_page())
+
+    async def _new_page(self):
+        context = await self._browser.new_context()
+        await context.route("**/*", _block_heavy_resources)
+        return await context.new_page()
+
+    async def close(self) -> None:
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        self._pages = None
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator:
+        """Borrow a warm page. It is reset in the background when returned, or replaced if broken."""
+        with span("scrape.acquire_page"):
+            await self.start()
+            page = await self._pages.get()
+        reusable = False
+        try:
+            yield page
+            reusable = True
+        except Exception:
+            # A failed navigation leaves the page usable once it is reset
+            reusable = True
+            raise
+        finally:
+            # Cancelled mid-navigation (deadline) the page may be in any state, so replace it
+            self._background(self._recycle(page) if reusable else self._replace(page))
+
+    def _background(self, coro) -> None:
+        task = asyncio.ensure_future(coro)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _recycle(self, page) -> None:
+        if self._pages is None:
+            return
+        try:
+            await page.goto("about:blank")
+        except Exception:
+            await self._replace(page)
+            return
+        self._pages.put_nowait(page)
+
+    async def _replace(self, page) -> None:
+        try:
+            await page.context.close()
+        except Exception:
+            pass
+        if self._pages is None:
+            return
+        try:
+            self._pages.put_nowait(await self._new_page())
+        except Exception as e:
+            logger.warning("Could not replace browser page: %r", e)
+
+    async def fetch_html(self, url: str, deadline: float = SCRAPER_DEADLINE) -> str:
+        """
+        Load `url` and return its HTML once the profile header has rendered.
+        Raises ScrapeError (with any captured HTML) on failure or when `deadline` passes.
+        """
+        start = time.monotonic()
+        async with self.page() as page:
+            remaining = max(0.1, deadline - (time.monotonic() - start))
+            try:
+                with upstream_call("crunchbase", "page") as call:
+                    response = await page.goto(url, timeout=remaining * 1000)
+                    call.status = response.status if response is not None else None
+                    remaining = max(0.1, deadline - (time.monotonic() - start))
+                    await page.wait_for_selector(PROFILE_SELECTOR, timeout=remaining * 1000)
+                return await page.content()
+            except Exception as e:
+                try:
+                    content = await page.content()
+                except Exception:
+                    content = None
+                raise ScrapeError(f"Scraping failed: {repr(e)}", content) from e
+
+    async def scrape(self, url: str, deadline: float = SCRAPER_DEADLINE) -> dict:
+        """Scrape one profile; waiting for a free page counts against the deadline."""
+        try:
+            content = await asyncio.wait_for(self.fetch_html(url, deadline), deadline)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail=f"Scraping {url} exceeded its {deadline:g}s deadline.")
+        except ScrapeError as e:
+            snapshot_store.save_in_background(url, e.content, "error")
+            raise HTTPException(status_code=502, detail=str(e))
+        snapshot_store.save_in_background(url, content, "ok")
+        with span("scrape.parse"):
+            return parse_profile(content)
+
+    async def scrape_many(self, urls: List[str], deadline: float = SCRAPER_DEADLINE) -> List[dict]:
+        """Scrape `urls` concurrently, one per pooled page; failures are reported per URL."""
+        results: List[dict] = [None] * len(urls)
+        async for outcome in run_bounded(urls, lambda url: self.scrape(url, deadline), self.size):
+            line = {"url": outcome.item, "ms": outcome.ms}
+            if outcome.ok:
+                line.update(status="ok", profile=outcome.result)
+            else:
+                line.update(status="error", status_code=outcome.status_code, error=outcome.error)
+            results[outcome.index] = line
+        return results
+
+
+browser_pool = BrowserPool()
@@ -0,0 +1,139 @@
+"""
+Prompt token budgeting for pitch generation.
+
+Investor fields reach the pitch prompt at whatever length enrichment returned
+them, and Proxycurl summaries and Crunchbase snippets often repeat each
+other. Before a prompt is rendered the investor fields are compacted:
+  1. Sentences and list items that already appear in a higher-priority field
+     (or earlier in the same field) are dropped.
+  2. Each field is trimmed to its own budget, at a sentence end when that
+     keeps most of the budget, otherwise at a word.
+  3. If the fields together still exceed PROMPT_INVESTOR_TOKENS, the
+     lowest-priority fields are trimmed further.
+Priority, highest first: name, location, interests, notable investments, bio.
+The LinkedIn URL is never changed.
+
+Token counts are estimates from a local approximation of a BPE tokenizer
+(words of up to six letters, digit groups of up to three and punctuation
+marks count as one token each), so no tokenizer has to be downloaded. It errs
+slightly high on English text; compare it with the prompt_tokens Together
+reports, which every generation response carries next to it.
+
+Settings (environment variables):
+  PROMPT_INVESTOR_TOKENS     budget of all investor fields together (default 400)
+  PROMPT_NAME_TOKENS         budget of the investor name (default 24)
+  PROMPT_LOCATION_TOKENS     budget of the location (default 24)
+  PROMPT_INTERESTS_TOKENS    budget of the interests (default 96)
+  PROMPT_INVESTMENTS_TOKENS  budget of the notable investments (default 96)
+  PROMPT_BIO_TOKENS          budget of the bio (default 240)
+"""
+import re
+from typing import Dict, List
+
+from config import env_int
+from metrics import PROMPT_TOKENS_COMPACTED
+
+PROMPT_INVESTOR_TOKENS = env_int("PROMPT_INVESTOR_TOKENS", 400)
+
+# Investor template fields, highest priority first, with their budgets
+FIELD_BUDGETS = {
+    "investor_name": env_int("PROMPT_NAME_TOKENS", 24),
+    "investor_location": env_int("PROMPT_LOCATION_TOKENS", 24),
+    "investor_interests": env_int("PROMPT_INTERESTS_TOKENS", 96),
+    "investor_notable_investments": env_int("PROMPT_INVESTMENTS_TOKENS", 96),
+    "investor_bio": env_int("PROMPT_BIO_TOKENS", 240),
+}
+# Fields that are comma-separated lists rather than prose
+LIST_FIELDS = {"investor_interests", "investor_notable_investments"}
+
+TOKEN_RE = re.compile(r"[^\W\d_]+|\d{1,3}|\S")
+WORD_RE = re.compile(r"\w+")
+SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+|\s*[\n;|•]\s*")
+LIST_SPLIT_RE = re.compile(r"\s*[,\n;|•]\s*")
+ELLIPSIS = "…"
+
+
+def _cost(token: str) -> int:
+    return (len(token) + 5) // 6 if token[0].isalpha() else 1
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate number of LLM tokens in `text`."""
+    return sum(_cost(m.group()) for m in TOKEN_RE.finditer(text)) if text else 0
+
+
+def trim_to_budget(text: str, budget: int) -> str:
+    """`text` cut to at most `budget` estimated tokens; a cut mid-sentence ends with an ellipsis."""
+    if estimate_tokens(text) <= budget:
+        return text
+    if budget <= 1:
+        return ""
+    used = end = sentence_end = 0
+    for m in TOKEN_RE.finditer(text):
+        used += _cost(m.group())
+        if used > budget - 1:  # one token is kept for the ellipsis
+            break
+        end = m.end()
+        if m.group() in ".!?":
+            sentence_end = end
+    if sentence_end and sentence_end >= end // 2:
+        return text[:sentence_end]
+    return text[:end].rstrip(" ,;:-") + ELLIPSIS if end else ""
+
+
+def _dedupe(fields: Dict[str, str]) -> int:
+    """Drop sentences and list items already seen in a higher-priority field. Returns how many were dropped."""
+    seen = " "
+    dropped = 0
+    for name in FIELD_BUDGETS:
+        text = fields.get(name) or ""
+        splitter = LIST_SPLIT_RE if name in LIST_FIELDS else SENTENCE_SPLIT_RE
+        segments = [segment for segment in splitter.split(text) if segment.strip()]
+        kept = []
+        for segment in segments:
+            key = " ".join(WORD_RE.findall(segment.lower()))
+            if key and f" {key} " in seen:
+                continue
+            kept.append(segment)
+            seen += f"{key} | "  # the separator keeps keys from matching across segments
+        if len(kept) < len(segments):
+            dropped += len(segments) - len(kept)
+            fields[name] = (", " if name in LIST_FIELDS else " ").join(kept)
+    return dropped
+
+
+def compact_investor(fields: Dict[str, str]) -> dict:
+    """
+    Deduplicate and trim the investor fields of `fields` in place (see the
+    module docstring). Returns a report: the estimated investor tokens after
+    compaction, the tokens removed, the number of duplicate segments dropped
+    and the fields that were trimmed.
+    """
+    before = {name: estimate_tokens(fields.get(name) or "") for name in FIELD_BUDGETS}
+    dropped = _dedupe(fields)
+    tokens = {name: estimate_tokens(fields.get(name) or "") for name in FIELD_BUDGETS}
+    deduped_total = sum(tokens.values())
+    trimmed: List[str] = []
+    for name, budget in FIELD_BUDGETS.items():
+        if tokens[name] > budget:
+            fields[name] = trim_to_budget(fields[name], budget)
+            tokens[name] = estimate_tokens(fields[name])
+            trimmed.append(name)
+    total = sum(tokens.values())
+    for name in reversed(list(FIELD_BUDGETS)):
+        if total <= PROMPT_INVESTOR_TOKENS:
+            break
+        fields[name] = trim_to_budget(fields[name] or "", max(tokens[name] - (total - PROMPT_INVESTOR_TOKENS), 0))
+        total -= tokens[name]
+        tokens[name] = estimate_tokens(fields[name])
+        total += tokens[name]
+        if name not in trimmed:
+            trimmed.append(name)
+    PROMPT_TOKENS_COMPACTED.inc("dedupe", amount=sum(before.values()) - deduped_total)
+    PROMPT_TOKENS_COMPACTED.inc("trim", amount=deduped_total - total)
+    return {
+        "investor_tokens": total,
+        "compacted_tokens": sum(before.values()) - total,
+        "deduplicated": dropped,
+        "trimmed_fields": [name[len("investor_"):] for name in trimmed],
+    }
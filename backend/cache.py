@@ -0,0 +1,250 @@
+"""
+Two-tier TTL cache for upstream lookups.
+
+An in-process LRU tier sits in front of a persistent SQLite tier. Entries are
+fresh until their TTL, then served stale for a further window while a single
+background refresh runs (stale-while-revalidate). Concurrent misses for the
+same key are merged into one upstream call. `max_entries` optionally bounds
+the persistent tier as well.
+
+Settings (environment variables):
+  CACHE_DB_PATH                  SQLite file for the persistent tier (default upstream_cache.sqlite3)
+  CACHE_MEMORY_ENTRIES           LRU tier size (default 1024)
+  CACHE_STALE_WHILE_REVALIDATE   seconds an expired entry may still be served (default 3600)
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from config import env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "upstream_cache.sqlite3")
+CACHE_MEMORY_ENTRIES = env_int("CACHE_MEMORY_ENTRIES", 1024)
+CACHE_STALE_WHILE_REVALIDATE = env_float("CACHE_STALE_WHILE_REVALIDATE", 3600.0)
+
+# (value, expires_at, stale_until)
+Entry = Tuple[Any, float, float]
+
+
+def normalize_query(query: Optional[str]) -> str:
+    """Case- and whitespace-insensitive form of a search query."""
+    return " ".join((query or "").lower().split())
+
+
+def normalize_url(url: Optional[str]) -> str:
+    """Drop scheme, www., query string and trailing slash so equivalent profile URLs share a key."""
+    parts = urlsplit((url or "").strip().lower())
+    host = parts.netloc or parts.path.split("/", 1)[0]
+    path = parts.path if parts.netloc else parts.path[len(host):]
+    if host.startswith("www."):
+        host = host[4:]
+    return f"{host}{path.rstrip('/')}"
+
+
+def make_key(*parts: Any) -> str:
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TieredCache:
+    # How many disk writes happen between size-eviction passes
+    EVICT_EVERY = 64
+
+    def __init__(self, db_path: str = CACHE_DB_PATH, memory_entries: int = CACHE_MEMORY_ENTRIES,
+                 stale_window: float = CACHE_STALE_WHILE_REVALIDATE, max_entries: Optional[int] = None):
+        self.db_path = db_path
+        self.memory_entries = memory_entries
+        self.stale_window = stale_window
+        self.max_entries = max_entries
+        self._puts_since_evict = 0
+        self.stats: Dict[str, Counter] = {}
+        self._memory: "OrderedDict[Tuple[str, str], Entry]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+
+    # --- SQLite tier ---
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, stale_until REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            self._db.execute("DELETE FROM cache WHERE stale_until < ?", (time.time(),))
+            self._db.commit()
+        return self._db
+
+    def _disk_get(self, namespace: str, key: str) -> Optional[Entry]:
+        with self._db_lock:
+            row = self._conn().execute(
+                "SELECT value, expires_at, stale_until FROM cache WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def _disk_put(self, namespace: str, key: str, entry: Entry) -> None:
+        value, expires_at, stale_until = entry
+        with self._db_lock:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, stale_until) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), expires_at, stale_until),
+            )
+            self._puts_since_evict += 1
+            if self.max_entries and self._puts_since_evict >= self.EVICT_EVERY:
+                self._puts_since_evict = 0
+                # Keep the persistent tier bounded: drop the entries closest to expiry first
+                conn.execute(
+                    "DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache ORDER BY expires_at"
+                    " LIMIT MAX(0, (SELECT COUNT(*) FROM cache) - ?))",
+                    (self.max_entries,),
+                )
+            conn.commit()
+
+    def close(self) -> None:
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # --- memory tier ---
+    def _memory_get(self, namespace: str, key: str) -> Optional[Entry]:
+        entry = self._memory.get((namespace, key))
+        if entry is not None:
+            self._memory.move_to_end((namespace, key))
+        return entry
+
+    def _memory_put(self, namespace: str, key: str, entry: Entry) -> None:
+        self._memory[(namespace, key)] = entry
+        self._memory.move_to_end((namespace, key))
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    # --- public API ---
+    def count(self, namespace: str, event: str, n: int = 1) -> None:
+        self.stats.setdefault(namespace, Counter())[event] += n
+
+    async def _lookup(self, namespace: str, key: str) -> Tuple[Optional[Entry], str]:
+        entry = self._memory_get(namespace, key)
+        if entry is not None:
+            return entry, "memory"
+        entry = await asyncio.to_thread(self._disk_get, namespace, key)
+        if entry is not None:
+            self._memory_put(namespace, key, entry)
+        return entry, "disk"
+
+    async def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Return a fresh (unexpired) value without fetching, or None."""
+        entry, tier = await self._lookup(namespace, key)
+        if entry is not None and time.time() < entry[1]:
+            self.count(namespace, f"{tier}_hits")
+            return entry[0]
+        self.count(namespace, "misses")
+        return None
+
+    async def put(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        now = time.time()
+        entry = (value, now + ttl, now + ttl + self.stale_window)
+        self._memory_put(namespace, key, entry)
+        await asyncio.to_thread(self._disk_put, namespace, key, entry)
+
+    async def get_or_fetch(self, namespace: str, key: str, fetch: Callable[[], Awaitable[Any]],
+                           ttl: float, bypass: bool = False) -> Any:
+        """
+        Return the cached value for (namespace, key), calling `fetch` on a miss.
+        `bypass=True` skips both tiers for the read but still stores the fresh value.
+        Only successful results are stored; exceptions from `fetch` propagate.
+        """
+        value, _ = await self.get_or_fetch_with_source(namespace, key, fetch, ttl, bypass)
+        return value
+
+    async def get_or_fetch_with_source(self, namespace: str, key: str, fetch: Callable[[], Awaitable[Any]],
+                                       ttl: float, bypass: bool = False) -> Tuple[Any, str]:
+        """
+        Like get_or_fetch, but also say where the value came from:
+        "memory", "disk", "stale", "upstream" or "coalesced" (joined an in-flight fetch).
+        """
+        if bypass:
+            self.count(namespace, "bypassed")
+        else:
+            entry, tier = await self._lookup(namespace, key)
+            if entry is not None:
+                value, expires_at, stale_until = entry
+                now = time.time()
+                if now < expires_at:
+                    self.count(namespace, f"{tier}_hits")
+                    return value, tier
+                if now < stale_until:
+                    self.count(namespace, "stale_hits")
+                    self._revalidate(namespace, key, fetch, ttl)
+                    return value, "stale"
+            self.count(namespace, "misses")
+        task, joined = self._fetch(namespace, key, fetch, ttl)
+        return await asyncio.shield(task), "coalesced" if joined else "upstream"
+
+    def inflight(self, namespace: str, key: str) -> Optional[asyncio.Task]:
+        """The fetch running for (namespace, key), if any; await it through asyncio.shield."""
+        return self._inflight.get((namespace, key))
+
+    def _fetch(self, namespace: str, key: str, fetch: Callable[[], Awaitable[Any]],
+               ttl: float) -> Tuple[asyncio.Task, bool]:
+        flight = (namespace, key)
+        task = self._inflight.get(flight)
+        if task is not None:
+            self.count(namespace, "coalesced")
+            return task, True
+
+        async def fetch_and_store():
+            value = await fetch()
+            await self.put(namespace, key, value, ttl)
+            return value
+
+        task = asyncio.ensure_future(fetch_and_store())
+        self._inflight[flight] = task
+        task.add_done_callback(lambda _: self._inflight.pop(flight, None))
+        return task, False
+
+    def _revalidate(self, namespace: str, key: str, fetch: Callable[[], Awaitable[Any]], ttl: float) -> None:
+        if (namespace, key) in self._inflight:
+            return
+        self.count(namespace, "refreshes")
+        task, _ = self._fetch(namespace, key, fetch, ttl)
+        self._background.add(task)
+        task.add_done_callback(self._background_done)
+
+    def _background_done(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Background cache refresh failed: %r", task.exception())
+
+    def snapshot(self) -> dict:
+        """Hit/miss counters per namespace plus tier sizes, for the /cache/stats endpoint."""
+        totals = Counter()
+        for counter in self.stats.values():
+            totals.update(counter)
+        return {
+            "namespaces": {ns: dict(counter) for ns, counter in self.stats.items()},
+            "totals": dict(totals),
+            "memory_entries": len(self._memory),
+            "inflight": len(self._inflight),
+        }
+
+
+upstream_cache = TieredCache()
@@ -0,0 +1,34 @@
+"""
+Environment-driven settings shared by the backend modules.
+"""
+import os
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+SERPAPI_KEY = os.getenv("SERPAPI_KEY")
+PROXYCURL_KEY = os.getenv("PROXYCURL_KEY")
+
+REQUIRED_SETTINGS = ("SERPAPI_KEY",)
+
+
+def validate_settings() -> None:
+    """Raise if a required setting is missing. Called when the app starts."""
+    missing = [name for name in REQUIRED_SETTINGS if not os.getenv(name)]
+    if missing:
+        raise RuntimeError(f"{', '.join(missing)} not set in environment variables.")
@@ -0,0 +1,247 @@
+"""
+Auto-enrichment pipeline: LinkedIn search, Crunchbase search and Proxycurl.
+
+The Crunchbase search does not depend on LinkedIn, so it runs concurrently
+with the LinkedIn search, and Proxycurl starts as soon as the LinkedIn URL
+is known. Every stage has its own deadline; a stage that misses it is
+reported as "timeout" and the profile is built from whatever finished.
+
+SerpAPI and Proxycurl responses go through the two-tier cache in cache.py,
+keyed on the normalized query or profile URL. Enriched profiles are added to
+the local search index and the fit ranker on a worker thread; a profile that
+comes back unchanged from the cache is not rewritten.
+
+Deadlines and cache TTLs (seconds) are configurable through environment variables:
+  ENRICH_LINKEDIN_DEADLINE    (default 10)
+  ENRICH_CRUNCHBASE_DEADLINE  (default 6)
+  ENRICH_PROXYCURL_DEADLINE   (default 10)
+  CACHE_TTL_SERPAPI_SEARCH    (default 6 hours)
+  CACHE_TTL_SERPAPI_PROFILE   (default 1 day)
+  CACHE_TTL_PROXYCURL         (default 7 days)
+"""
+import asyncio
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException
+
+from cache import make_key, normalize_query, normalize_url, upstream_cache
+from config import PROXYCURL_KEY, SERPAPI_KEY, env_float
+from metrics import span
+from search_index import search_index
+from upstream import upstream_error, upstreams
+
+LINKEDIN_DEADLINE = env_float("ENRICH_LINKEDIN_DEADLINE", 10.0)
+CRUNCHBASE_DEADLINE = env_float("ENRICH_CRUNCHBASE_DEADLINE", 6.0)
+PROXYCURL_DEADLINE = env_float("ENRICH_PROXYCURL_DEADLINE", 10.0)
+
+CACHE_TTL_SERPAPI_SEARCH = env_float("CACHE_TTL_SERPAPI_SEARCH", 6 * 3600.0)
+CACHE_TTL_SERPAPI_PROFILE = env_float("CACHE_TTL_SERPAPI_PROFILE", 24 * 3600.0)
+CACHE_TTL_PROXYCURL = env_float("CACHE_TTL_PROXYCURL", 7 * 24 * 3600.0)
+
+NOTABLE_INVESTMENTS_RE = re.compile(r'Notable investments? (include|includes|such as|:)? ([^.]+)', re.IGNORECASE)
+
+Stages = Dict[str, Dict[str, Any]]
+
+
+async def serpapi_search(params: dict, error_label: str = "SerpAPI Google Search", no_cache: bool = False,
+                         on_fetch: Optional[Callable[[dict], None]] = None) -> dict:
+    """
+    Run a SerpAPI query through the cache. The key ignores the api_key and
+    normalizes the query (`q`) or profile URL (`url`). `on_fetch` is called
+    with the response only when it came from SerpAPI, not from the cache.
+    """
+    engine = params.get("engine", "google")
+    key_params = {k: v for k, v in params.items() if k != "api_key"}
+    if "q" in key_params:
+        key_params["q"] = normalize_query(key_params["q"])
+    if "url" in key_params:
+        key_params["url"] = normalize_url(key_params["url"])
+    ttl = CACHE_TTL_SERPAPI_PROFILE if engine == "linkedin_profile" else CACHE_TTL_SERPAPI_SEARCH
+
+    async def fetch():
+        response = await upstreams["serpapi"].request(engine, "GET", "/search", params=params)
+        if response.status_code != 200:
+            raise upstream_error(response, error_label)
+        data = response.json()
+        if on_fetch is not None:
+            on_fetch(data)
+        return data
+
+    return await upstream_cache.get_or_fetch(f"serpapi:{engine}", make_key(key_params), fetch, ttl, bypass=no_cache)
+
+
+async def linkedin_search(name: str, location: Optional[str] = None, keywords: Optional[str] = None,
+                          no_cache: bool = False) -> Tuple[str, str]:
+    """Find the investor's LinkedIn URL with a SerpAPI Google search. Returns (url, snippet)."""
+    search_keywords = keywords or f'{name} investor site:linkedin.com/in'
+    if location:
+        search_keywords += f' {location}'
+    params = {
+        "engine": "google",
+        "q": search_keywords,
+        "api_key": SERPAPI_KEY,
+        "num": 1
+    }
+    data = await serpapi_search(params, no_cache=no_cache)
+    for item in data.get("organic_results", []):
+        link = item.get("link", "")
+        if "linkedin.com/in" in link:
+            return link, item.get("snippet", "")
+    raise HTTPException(status_code=404, detail="No LinkedIn profile found for this name.")
+
+
+async def crunchbase_search(name: str, no_cache: bool = False) -> Tuple[str, str]:
+    """Search Crunchbase for the investor. Returns (crunchbase_bio, notable_investments)."""
+    params = {
+        "engine": "google",
+        "q": f'{name} site:crunchbase.com',
+        "api_key": SERPAPI_KEY,
+        "num": 1
+    }
+    data = await serpapi_search(params, no_cache=no_cache)
+    for item in data.get("organic_results", []):
+        link = item.get("link", "")
+        if "crunchbase.com" in link:
+            crunchbase_bio = item.get("snippet", "")
+            # Try to extract notable investments from the snippet
+            # e.g. "Notable investments include Uber, Twitter, AngelList."
+            match = NOTABLE_INVESTMENTS_RE.search(crunchbase_bio)
+            return crunchbase_bio, match.group(2).strip() if match else ""
+    return "", ""
+
+
+def _remember(profile: dict) -> None:
+    if not search_index.add_profile(profile):
+        return  # already indexed and ranked as it is
+    # Imported on first use so NumPy stays off the import path (main.lifespan preloads it)
+    from ranking import fit_ranker
+
+    fit_ranker.add(profile)
+
+
+def remember_profile(profile: dict) -> None:
+    """Make an enriched profile searchable and rankable, without blocking the event loop."""
+    search_index.write_in_background(_remember, dict(profile))
+
+
+async def linkedin_profile(linkedin_url: str, no_cache: bool = False) -> dict:
+    """Build an investor profile from SerpAPI's LinkedIn profile engine."""
+    params = {
+        "engine": "linkedin_profile",
+        "url": linkedin_url,
+        "api_key": SERPAPI_KEY
+    }
+    data = await serpapi_search(params, "SerpAPI LinkedIn Profile", no_cache=no_cache)
+    profile = data.get("linkedin_profile", {})
+    investor = {
+        "name": profile.get("name", ""),
+        "bio": profile.get("about", ""),
+        "interests": ", ".join(profile.get("interests", [])) if profile.get("interests") else "",
+        "linkedin": linkedin_url,
+        "notable_investments": ", ".join(profile.get("featured", [])) if profile.get("featured") else "",
+        "location": profile.get("location", "")
+    }
+    remember_profile(investor)
+    return investor
+
+
+async def proxycurl_profile(linkedin_url: str, no_cache: bool = False) -> dict:
+    """Fetch the LinkedIn profile through Proxycurl (free tier supports this endpoint)."""
+    headers = {"Authorization": f"Bearer {PROXYCURL_KEY}"}
+    params = {"url": linkedin_url, "use_cache": "if-present"}
+
+    async def fetch():
+        response = await upstreams["proxycurl"].request("linkedin", "GET", "/api/v2/linkedin", headers=headers,
+                                                        params=params)
+        if response.status_code != 200:
+            raise upstream_error(response, "Proxycurl")
+        return response.json()
+
+    key = make_key(normalize_url(linkedin_url))
+    return await upstream_cache.get_or_fetch("proxycurl", key, fetch, CACHE_TTL_PROXYCURL, bypass=no_cache)
+
+
+async def _in_span(name: str, coro: Awaitable):
+    with span(name):
+        return await coro
+
+
+async def run_stage(stages: Stages, name: str, coro: Awaitable, deadline: float, required: bool = False):
+    """
+    Await `coro` under `deadline` and record its status and duration in `stages`.
+    Optional stages return None on timeout or failure; required ones raise.
+    """
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        return await asyncio.wait_for(_in_span(f"enrich.{name}", coro), deadline)
+    except asyncio.TimeoutError:
+        status = "timeout"
+        if required:
+            raise HTTPException(status_code=504, detail=f"Stage '{name}' exceeded its {deadline:g}s deadline.")
+        return None
+    except HTTPException as e:
+        status = "not_found" if e.status_code == 404 else "error"
+        if required:
+            raise
+        return None
+    except httpx.HTTPError:
+        status = "error"
+        if required:
+            raise
+        return None
+    except asyncio.CancelledError:
+        status = "cancelled"
+        raise
+    finally:
+        stages[name] = {"status": status, "ms": round((time.perf_counter() - start) * 1000, 1)}
+
+
+async def auto_enrich(name: str, location: Optional[str] = None, keywords: Optional[str] = None,
+                      no_cache: bool = False) -> dict:
+    """Build an investor profile from LinkedIn, Crunchbase and (if configured) Proxycurl."""
+    stages: Stages = {}
+    crunchbase_task = asyncio.create_task(
+        run_stage(stages, "crunchbase_search", crunchbase_search(name, no_cache), CRUNCHBASE_DEADLINE)
+    )
+    try:
+        linkedin_url, snippet = await run_stage(
+            stages, "linkedin_search", linkedin_search(name, location, keywords, no_cache), LINKEDIN_DEADLINE, required=True
+        )
+        pdata = None
+        if PROXYCURL_KEY:
+            pdata = await run_stage(stages, "proxycurl", proxycurl_profile(linkedin_url, no_cache), PROXYCURL_DEADLINE)
+        else:
+            stages["proxycurl"] = {"status": "skipped", "ms": 0.0}
+        crunchbase_bio, notable_investments = (await crunchbase_task) or ("", "")
+    finally:
+        crunchbase_task.cancel()
+
+    if pdata is not None:
+        experiences = pdata.get("experiences")
+        profile = {
+            "name": pdata.get("full_name", name),
+            "bio": pdata.get("summary", snippet),
+            "interests": ", ".join(pdata.get("activities", [])) if pdata.get("activities") else "",
+            "linkedin": linkedin_url,
+            "notable_investments": notable_investments or (", ".join(experiences[0].get("notable_investments", [])) if experiences else ""),
+            "location": pdata.get("city", ""),
+            "crunchbase_bio": crunchbase_bio
+        }
+    else:
+        # Fallback: Use snippet from SerpAPI and Crunchbase
+        profile = {
+            "name": name,
+            "bio": snippet,
+            "interests": "",
+            "linkedin": linkedin_url,
+            "notable_investments": notable_investments,
+            "location": "",
+            "crunchbase_bio": crunchbase_bio
+        }
+    remember_profile(profile)
+    profile["stages"] = stages
+    return profile
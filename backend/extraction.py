@@ -0,0 +1,269 @@
+"""
+Pluggable extraction of investor data from Crunchbase profile HTML.
+
+Every backend runs the same three selectors and returns the same dict:
+  h1.profile-name               -> name
+  div.description-text > span   -> bio
+  a.chip (all)                  -> interests, joined with ", "
+
+Every backend first drops NUL characters, which html.parser keeps and
+libxml2 turns into U+FFFD. Text inside <template> never counts, though the
+elements in it still match (as in BeautifulSoup).
+
+Backends:
+  bs4     BeautifulSoup with html.parser; builds a full tree (the reference)
+  lxml    libxml2 via lxml.html and XPath; needs the optional `lxml` package.
+          Opt-in only: libxml2 builds a different tree from malformed markup
+          than html.parser does, so its output can differ from bs4's. An <a>
+          opened inside another <a> closes the outer one (nested chips give
+          "x, y" where the other backends give "xy, y"), and misplaced table
+          tags are moved out of their parent (`<span><td>text` loses the
+          text). A page libxml2 finds empty, e.g. only a comment, gives the
+          defaults like the other backends.
+  stream  stdlib tokenizer that never builds a tree. With stop_early it also
+          stops once the name and bio are found and the element holding the
+          first group of chips has closed; this assumes every chip sits in that
+          one group, so use it only on pages where that holds.
+
+EXTRACTION_BACKEND picks the default: "stream" (also what "auto" means), or
+one of the names above. stream matches bs4 on malformed pages as well.
+"""
+import importlib.util
+import os
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional, Tuple
+
+NAME_DEFAULT = "Investor"
+BIO_DEFAULT = "Not specified"
+INTERESTS_DEFAULT = "Not specified"
+
+EXTRACTION_BACKEND = os.getenv("EXTRACTION_BACKEND", "stream")
+
+# Elements html.parser's tree builder treats as empty (never pushed on the stack)
+VOID_ELEMENTS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link",
+    "menuitem", "meta", "param", "source", "track", "wbr", "basefont", "bgsound",
+    "command", "frame", "image", "isindex", "nextid", "spacer",
+}
+# Their text is not part of an ancestor's .text in BeautifulSoup
+NON_TEXT_ELEMENTS = {"script", "style", "template"}
+
+
+def normalize_html(content: str) -> str:
+    """`content` without NUL characters, so every parser sees the same text."""
+    return content.replace("\x00", "")
+
+
+def build_profile(name: Optional[str], bio: Optional[str], chips: List[str]) -> dict:
+    """Apply the scraper's defaults; every backend funnels through here so outputs match."""
+    return {
+        "name": name.strip() if name is not None else NAME_DEFAULT,
+        "bio": bio.strip() if bio is not None else BIO_DEFAULT,
+        "interests": ", ".join([chip.strip() for chip in chips]) or INTERESTS_DEFAULT,
+    }
+
+
+# --- bs4 ---
+def extract_bs4(content: str) -> dict:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(normalize_html(content), "html.parser")
+    name_tag = soup.select_one("h1.profile-name")
+    bio_tag = soup.select_one("div.description-text > span")
+    return build_profile(
+        name_tag.text if name_tag else None,
+        bio_tag.text if bio_tag else None,
+        [tag.text for tag in soup.select("a.chip")],
+    )
+
+
+# --- lxml ---
+def _has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+_LXML_XPATHS: Dict[str, object] = {}
+
+
+def extract_lxml(content: str) -> dict:
+    import lxml.html
+    from lxml import etree
+
+    if not _LXML_XPATHS:
+        _LXML_XPATHS.update(
+            name=etree.XPath(f"(//h1[{_has_class('profile-name')}])[1]"),
+            bio=etree.XPath(f"(//div[{_has_class('description-text')}]/span)[1]"),
+            chips=etree.XPath(f"//a[{_has_class('chip')}]"),
+        )
+    content = normalize_html(content)
+    if not content.strip():
+        return build_profile(None, None, [])
+    try:
+        root = lxml.html.document_fromstring(content)
+    except etree.ParserError:  # "Document is empty": nothing but comments or stray end tags
+        return build_profile(None, None, [])
+    name = _LXML_XPATHS["name"](root)
+    bio = _LXML_XPATHS["bio"](root)
+    return build_profile(
+        _lxml_text(name[0]) if name else None,
+        _lxml_text(bio[0]) if bio else None,
+        [_lxml_text(tag) for tag in _LXML_XPATHS["chips"](root)],
+    )
+
+
+def _lxml_text(element) -> str:
+    if any(ancestor.tag == "template" for ancestor in element.iterancestors()):
+        return ""
+    parts = []
+
+    def walk(el):
+        if el.tag in NON_TEXT_ELEMENTS:
+            return
+        if isinstance(el.tag, str) and el.text:
+            parts.append(el.text)
+        for child in el:
+            walk(child)
+            if child.tail:
+                parts.append(child.tail)
+
+    walk(element)
+    return "".join(parts)
+
+
+# --- stream ---
+class _StopParsing(Exception):
+    pass
+
+
+class _ProfileScanner(HTMLParser):
+    """
+    Tracks the open-element stack the way BeautifulSoup's html.parser builder
+    does (end tags pop back to the nearest matching open tag; unmatched end
+    tags are ignored) and collects text for the three selectors as it goes.
+    """
+
+    def __init__(self, stop_early: bool = False):
+        super().__init__(convert_charrefs=True)
+        self.stop_early = stop_early
+        self.stack: List[Tuple[str, frozenset]] = []
+        self.captures: List[list] = []  # [kind, depth, parts, chip index]
+        self.name: Optional[str] = None
+        self.bio: Optional[str] = None
+        self.chips: List[Optional[str]] = []  # a chip's slot is taken when it opens, so nested chips keep document order
+        self._name_claimed = False
+        self._bio_claimed = False
+        self._chip_group_depth: Optional[int] = None
+        self._chips_closed = False
+        self._non_text_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        classes = frozenset()
+        for key, value in attrs:
+            if key == "class" and value:
+                classes = frozenset(value.split())
+        kind = slot = None
+        if tag == "h1" and not self._name_claimed and "profile-name" in classes:
+            kind, self._name_claimed = "name", True
+        elif (tag == "span" and not self._bio_claimed and self.stack
+              and self.stack[-1][0] == "div" and "description-text" in self.stack[-1][1]):
+            kind, self._bio_claimed = "bio", True
+        elif tag == "a" and "chip" in classes:
+            kind, slot = "chip", len(self.chips)
+            self.chips.append(None)
+            if self._chip_group_depth is None:
+                self._chip_group_depth = len(self.stack)
+        if tag in VOID_ELEMENTS:
+            if kind:
+                self._finish(kind, "", slot)
+            return
+        self.stack.append((tag, classes))
+        if tag in NON_TEXT_ELEMENTS:
+            self._non_text_depth += 1
+        if kind:
+            self.captures.append([kind, len(self.stack), [], slot])
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        for index in range(len(self.stack) - 1, -1, -1):
+            if self.stack[index][0] == tag:
+                break
+        else:
+            return
+        for closed, _ in self.stack[index:]:
+            if closed in NON_TEXT_ELEMENTS:
+                self._non_text_depth -= 1
+        del self.stack[index:]
+        while self.captures and self.captures[-1][1] > index:
+            kind, _, parts, slot = self.captures.pop()
+            self._finish(kind, "".join(parts), slot)
+        if self._chip_group_depth is not None and index <= self._chip_group_depth - 1:
+            self._chips_closed = True
+        if self.stop_early and self._done():
+            raise _StopParsing
+
+    def handle_data(self, data):
+        if self.captures and not self._non_text_depth:
+            for capture in self.captures:
+                capture[2].append(data)
+
+    def _finish(self, kind: str, text: str, slot: Optional[int] = None) -> None:
+        if kind == "name":
+            self.name = text
+        elif kind == "bio":
+            self.bio = text
+        else:
+            self.chips[slot] = text
+
+    def _done(self) -> bool:
+        return self.name is not None and self.bio is not None and self._chips_closed
+
+    def close_open_captures(self) -> None:
+        # Like BeautifulSoup, elements still open at the end of the document keep their text
+        while self.captures:
+            kind, _, parts, slot = self.captures.pop(0)
+            self._finish(kind, "".join(parts), slot)
+
+
+def extract_stream(content: str, stop_early: bool = False) -> dict:
+    scanner = _ProfileScanner(stop_early=stop_early)
+    try:
+        scanner.feed(normalize_html(content))
+        scanner.close()
+    except _StopParsing:
+        pass
+    scanner.close_open_captures()
+    return build_profile(scanner.name, scanner.bio, scanner.chips)
+
+
+def extract_stream_early(content: str) -> dict:
+    return extract_stream(content, stop_early=True)
+
+
+EXTRACTORS: Dict[str, Callable[[str], dict]] = {
+    "bs4": extract_bs4,
+    "lxml": extract_lxml,
+    "stream": extract_stream,
+    "stream-early": extract_stream_early,
+}
+
+
+def available_backends() -> List[str]:
+    names = list(EXTRACTORS)
+    if importlib.util.find_spec("lxml") is None:
+        names.remove("lxml")
+    if importlib.util.find_spec("bs4") is None:
+        names.remove("bs4")
+    return names
+
+
+def get_extractor(backend: Optional[str] = None) -> Callable[[str], dict]:
+    name = backend or EXTRACTION_BACKEND
+    if name == "auto":
+        name = "stream"
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown extraction backend {name!r}; choose from {', '.join(EXTRACTORS)}")
+    return EXTRACTORS[name]
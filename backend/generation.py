@@ -0,0 +1,578 @@
+"""
+Pitch prompt rendering and Together completions.
+
+All completions go through the shared Together limits in upstream.py, so
+single and batch generation together stay within the provider's quota, and
+throttled or failed calls are retried there.
+
+A pitch is generated in two phases. The email comes first, with its own
+token budget, so it is never cut short by the critique. Feedback is a
+separate completion over the finished email, run after the email is
+returned or on demand. Each phase reports its own latency.
+
+Investor fields are compacted to a token budget before the prompt is
+rendered (see budget.py). Each call's max_tokens is picked per request:
+the caller's budget if given, otherwise what the phase's recent completions
+needed: the 95th percentile of their lengths times COMPLETION_HEADROOM. Until
+COMPLETION_MIN_SAMPLES completions of a phase have been seen, the default is
+the phase cap. A completion cut off at max_tokens counts as needing the
+whole cap, so truncations raise the default again. Either way max_tokens is
+at most the phase cap and never more than the context window leaves room
+for. Every phase reports its estimated and actual prompt tokens, completion
+tokens, max_tokens and Together's finish_reason ("length" means cut off).
+
+Completions are cached by content: the key is the fully rendered prompt plus
+model and sampling parameters. Concurrent identical requests share one call,
+streamed or not: a streamed completion runs once per key (SharedStream) and
+every caller streaming the same key receives its chunks, and a plain
+completion waits for a stream in flight rather than starting its own. A
+streamed completion is cached only if Together ended it with [DONE].
+`fresh=True` forces a new sample.
+
+Settings (environment variables):
+  TOGETHER_MODEL                   model name (default meta-llama/Llama-3-8b-chat-hf)
+  TOGETHER_MAX_CONCURRENCY         concurrent completions (default 16, see upstream.py)
+  TOGETHER_RPS                     completion starts per second, 0 for unlimited (default 0)
+  PITCH_MAX_TOKENS                 token budget of the email phase at most (default 700)
+  FEEDBACK_MAX_TOKENS              token budget of the feedback phase at most (default 400)
+  COMPLETION_HEADROOM              default max_tokens over the measured p95 length (default 1.25)
+  COMPLETION_MIN_SAMPLES           completions of a phase measured before the default drops below its cap (default 20)
+  MIN_COMPLETION_TOKENS            smallest max_tokens a request may pick (default 64)
+  TOGETHER_CONTEXT_TOKENS          context window of TOGETHER_MODEL (default 8192)
+  COMPLETION_CACHE_DB_PATH         SQLite file for cached completions (default completion_cache.sqlite3)
+  COMPLETION_CACHE_TTL             seconds a completion is reused (default 7 days)
+  COMPLETION_CACHE_MAX_ENTRIES     persistent entries kept (default 10000)
+  COMPLETION_CACHE_MEMORY_ENTRIES  in-process LRU size (default 256)
+"""
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from budget import compact_investor, estimate_tokens
+from cache import TieredCache, make_key
+from config import env_float, env_int
+from metrics import record_tokens, span
+from prompts import CompiledTemplate
+from upstream import upstream_error, upstreams
+
+TOGETHER_MODEL = os.getenv("TOGETHER_MODEL", "meta-llama/Llama-3-8b-chat-hf")
+together = upstreams["together"]
+TOGETHER_MAX_CONCURRENCY = together.max_concurrency
+PITCH_MAX_TOKENS = env_int("PITCH_MAX_TOKENS", 700)
+FEEDBACK_MAX_TOKENS = env_int("FEEDBACK_MAX_TOKENS", 400)
+COMPLETION_HEADROOM = env_float("COMPLETION_HEADROOM", 1.25)
+COMPLETION_MIN_SAMPLES = env_int("COMPLETION_MIN_SAMPLES", 20)
+MIN_COMPLETION_TOKENS = env_int("MIN_COMPLETION_TOKENS", 64)
+TOGETHER_CONTEXT_TOKENS = env_int("TOGETHER_CONTEXT_TOKENS", 8192)
+
+COMPLETION_CACHE_TTL = env_float("COMPLETION_CACHE_TTL", 7 * 24 * 3600.0)
+completion_cache = TieredCache(
+    db_path=os.getenv("COMPLETION_CACHE_DB_PATH", "completion_cache.sqlite3"),
+    memory_entries=env_int("COMPLETION_CACHE_MEMORY_ENTRIES", 256),
+    stale_window=0.0,
+    max_entries=env_int("COMPLETION_CACHE_MAX_ENTRIES", 10000),
+)
+CACHE_NAMESPACE = "completions"
+
+# Recent time-to-first-token samples (ms) from streamed completions
+ttft_samples: Deque[float] = deque(maxlen=1000)
+
+# --- Enhanced Prompt Template ---
+pitch_template = CompiledTemplate(
+    input_variables=[
+        "startup_name", "startup_niche", "startup_traction", "startup_goals", "startup_extra_info",
+        "investor_name", "investor_bio", "investor_interests", "investor_linkedin", "investor_notable_investments", "investor_location"
+    ],
+    template=(
+        "You are an expert startup advisor. Write a personalized investor pitch email for the startup '{startup_name}'. "
+        "The pitch is for {investor_name}. Use the following context about the investor to personalize the email. "
+        "Their bio is: '{investor_bio}'. They are interested in: '{investor_interests}'. "
+        "LinkedIn: {investor_linkedin}. Notable investments: {investor_notable_investments}. Location: {investor_location}.\n\n"
+        "Make sure the email includes: "
+        "1. A strong 1-liner hook after the greeting. "
+        "2. A line about why this investor is a fit, using their bio, interests, investments, and location. "
+        "3. A brief explanation of the unique tech. "
+        "4. A breakdown of how the funding will be used. "
+        "5. A specific call-to-action (e.g., a 15-minute call next week).\n\n"
+        "---\n"
+        "STARTUP DETAILS:\n"
+        "Niche: {startup_niche}\n"
+        "Traction: {startup_traction}\n"
+        "Goals: {startup_goals}\n"
+        "Additional Info: {startup_extra_info}\n"
+        "---\n\n"
+        "INVESTOR PITCH EMAIL:"
+    )
+)
+
+FEEDBACK_INTRO = "You are an expert startup advisor. Here is an investor pitch email:\n\n---\n"
+FEEDBACK_PROMPT = ("\n---\n\nHow to make this email more effective?\n\n"
+                   "Please focus on the email's content and structure. Avoid suggesting specific changes to the subject line or sender name.\n\n"
+                   "1. Is the 1-liner hook effective in grabbing the investor's attention?\n"
+                   "2. Is the explanation of why the investor is a fit for the startup clear and concise?\n"
+                   "3. Is the unique tech explained in a way that resonates with the investor's interests and investments?\n"
+                   "4. Is the breakdown of how the funding will be used clear and specific?\n"
+                   "5. Is the call-to-action clear and direct?\n\n"
+                   "Please provide constructive feedback and suggestions for improvement.")
+
+
+def startup_fields(s) -> dict:
+    return {
+        "startup_name": s.name,
+        "startup_niche": s.niche,
+        "startup_traction": s.traction,
+        "startup_goals": s.goals,
+        "startup_extra_info": s.extra_info or "",
+    }
+
+
+def investor_fields(i, report: Optional[dict] = None) -> dict:
+    """The investor half of the template values, compacted to the prompt budget; `report` receives its counts."""
+    fields = {
+        "investor_name": i.name or "",
+        "investor_bio": i.bio or "",
+        "investor_interests": i.interests or "",
+        "investor_linkedin": i.linkedin or "",
+        "investor_notable_investments": i.notable_investments or "",
+        "investor_location": i.location or "",
+    }
+    compacted = compact_investor(fields)
+    if report is not None:
+        report.update(compacted)
+    fields["investor_name"] = fields["investor_name"] or "Investor"
+    fields["investor_bio"] = fields["investor_bio"] or "Not specified"
+    fields["investor_interests"] = fields["investor_interests"] or "Not specified"
+    return fields
+
+
+def bind_startup(template: CompiledTemplate, startup) -> CompiledTemplate:
+    """Pre-fill the startup half of `template` so only investor fields vary per call."""
+    return template.partial(**startup_fields(startup))
+
+
+def render_prompt(template: CompiledTemplate, startup, investor, tone: str, report: Optional[dict] = None) -> str:
+    """
+    Render the pitch email prompt. Pass `startup=None` when `template` already
+    has the startup fields bound (see bind_startup). If `report` is given it
+    receives the compaction counts (see budget.compact_investor) and the
+    estimated "prompt_tokens" of the result.
+    """
+    with span("prompt.render"):
+        fields = investor_fields(investor, report)
+        if startup is not None:
+            fields.update(startup_fields(startup))
+        prompt = template.format(**fields)
+        prompt += f"\n\nWrite the email in a {tone} tone."
+        if report is not None:
+            report["prompt_tokens"] = estimate_tokens(prompt)
+        return prompt
+
+
+def render_feedback_prompt(pitch: str) -> str:
+    """The critique prompt for a generated email."""
+    return FEEDBACK_INTRO + pitch.strip() + FEEDBACK_PROMPT
+
+
+def completion_budget(prompt: str, cap: int, requested: Optional[int] = None,
+                      prompt_tokens: Optional[int] = None) -> int:
+    """
+    max_tokens for one call: `requested` (default `cap`), at most `cap`, and no
+    more than the context window leaves after the prompt; never below
+    MIN_COMPLETION_TOKENS.
+    """
+    if prompt_tokens is None:
+        prompt_tokens = estimate_tokens(prompt)
+    room = TOGETHER_CONTEXT_TOKENS - prompt_tokens
+    return max(min(requested or cap, cap, room), MIN_COMPLETION_TOKENS)
+
+
+def record_completion_length(phase: str, text: str, usage: dict, finish_reason: Optional[str]) -> None:
+    """Note how many tokens an upstream completion of `phase` needed; one cut off at max_tokens needed the cap."""
+    if finish_reason == "length":
+        tokens = PHASE_CAPS[phase]
+    else:
+        tokens = usage.get("completion_tokens") or estimate_tokens(text)
+    completion_lengths[phase].append(tokens)
+
+
+def expected_tokens(phase: str) -> int:
+    """
+    The default max_tokens of `phase`: the 95th percentile of its recent
+    completion lengths times COMPLETION_HEADROOM, or the phase cap until
+    COMPLETION_MIN_SAMPLES have been measured.
+    """
+    cap = PHASE_CAPS[phase]
+    samples = sorted(completion_lengths[phase])
+    if len(samples) < COMPLETION_MIN_SAMPLES:
+        return cap
+    p95 = samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+    return min(cap, math.ceil(p95 * COMPLETION_HEADROOM))
+
+
+def pitch_budget(prompt: str, report: dict, requested: Optional[int] = None) -> int:
+    """max_tokens for the email phase; `report` is the render_prompt report of `prompt`."""
+    return completion_budget(prompt, PITCH_MAX_TOKENS, requested or expected_tokens("pitch"), report["prompt_tokens"])
+
+
+def feedback_budget(prompt: str, requested: Optional[int] = None) -> int:
+    """max_tokens for the feedback phase, whose critique prompt is `prompt`."""
+    return completion_budget(prompt, FEEDBACK_MAX_TOKENS, requested or expected_tokens("feedback"))
+
+
+def token_counts(prompt: str, text: str, max_tokens: int, usage: dict, finish_reason: Optional[str] = None) -> dict:
+    """
+    A call's token report: estimated and Together-reported prompt and completion
+    tokens, max_tokens, and why Together stopped ("stop", or "length" when the
+    completion hit max_tokens). The reported values are None when Together sent
+    none (some streamed completions, or completions cached before they were kept).
+    """
+    return {
+        "prompt_estimate": estimate_tokens(prompt),
+        "prompt": usage.get("prompt_tokens"),
+        "completion_estimate": estimate_tokens(text),
+        "completion": usage.get("completion_tokens"),
+        "max_tokens": max_tokens,
+        "finish_reason": finish_reason,
+    }
+
+
+def _together_request(prompt: str, max_tokens: int, temperature: float, model: Optional[str], stream: bool = False):
+    api_key = os.getenv("TOGETHER_API_KEY")
+    if not api_key:
+        raise HTTPException(status_code=500, detail="Together API key not set.")
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "model": model or TOGETHER_MODEL,
+        "prompt": prompt,
+        "max_tokens": max_tokens,
+        "temperature": temperature
+    }
+    if stream:
+        payload["stream"] = True
+    return headers, payload
+
+
+def completion_key(prompt: str, max_tokens: int, temperature: float, model: Optional[str]) -> str:
+    return make_key(model or TOGETHER_MODEL, max_tokens, temperature, prompt)
+
+
+def _record_saved(usage: dict) -> None:
+    completion_cache.count(CACHE_NAMESPACE, "saved_prompt_tokens", int(usage.get("prompt_tokens") or 0))
+    completion_cache.count(CACHE_NAMESPACE, "saved_completion_tokens", int(usage.get("completion_tokens") or 0))
+
+
+async def _complete_upstream(prompt: str, max_tokens: int, temperature: float, model: Optional[str]) -> dict:
+    headers, payload = _together_request(prompt, max_tokens, temperature, model)
+    response = await together.request("completion", "POST", "/v1/completions", headers=headers, json=payload)
+    if response.status_code != 200:
+        raise upstream_error(response, "Together API")
+    data = response.json()
+    usage = data.get("usage") or {}
+    record_tokens(payload["model"], usage)
+    choice = (data.get("choices") or [{}])[0]
+    return {"text": choice.get("text", ""), "usage": usage, "finish_reason": choice.get("finish_reason")}
+
+
+async def _complete_or_join(prompt: str, max_tokens: int, temperature: float, model: Optional[str],
+                            key: str, fresh: bool) -> dict:
+    stream = None if fresh else shared_streams.get(key)
+    if stream is not None:
+        completion_cache.count(CACHE_NAMESPACE, "coalesced")
+        return await stream.result()
+    return await _complete_upstream(prompt, max_tokens, temperature, model)
+
+
+async def complete(prompt: str, max_tokens: int = 700, temperature: float = 0.7, model: Optional[str] = None,
+                   fresh: bool = False) -> dict:
+    """
+    Run one Together completion under the shared provider limits, through the completion cache.
+    Returns {"text", "usage", "finish_reason", "cached"}; `fresh=True` skips the cached sample.
+    """
+    key = completion_key(prompt, max_tokens, temperature, model)
+    value, source = await completion_cache.get_or_fetch_with_source(
+        CACHE_NAMESPACE, key, lambda: _complete_or_join(prompt, max_tokens, temperature, model, key, fresh),
+        COMPLETION_CACHE_TTL, bypass=fresh,
+    )
+    cached = source != "upstream"
+    if cached:
+        _record_saved(value.get("usage") or {})
+    return {**value, "cached": cached}
+
+
+async def stream_completion(prompt: str, max_tokens: int = 700, temperature: float = 0.7,
+                            model: Optional[str] = None, usage: Optional[dict] = None,
+                            finish: Optional[dict] = None) -> AsyncIterator[str]:
+    """
+    Run a streaming Together completion and yield text chunks as they arrive.
+    Together streams server-sent events: `data: {json chunk}` lines ending with `data: [DONE]`;
+    a stream that ends without [DONE] was cut off and raises a 502.
+    If `usage` is given it is filled from the chunk that reports token usage,
+    and `finish["reason"]` is set from the chunk that reports the finish_reason.
+    """
+    headers, payload = _together_request(prompt, max_tokens, temperature, model, stream=True)
+    reported: dict = {}
+    reason = None
+    async with together.stream("stream", "POST", "/v1/completions", headers=headers, json=payload) as response:
+        if response.status_code != 200:
+            await response.aread()
+            raise upstream_error(response, "Together API")
+        finished = False
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                finished = True
+                break
+            chunk = json.loads(data)
+            if chunk.get("usage"):
+                reported.update(chunk["usage"])
+            choice = (chunk.get("choices") or [{}])[0]
+            reason = choice.get("finish_reason") or reason
+            text = choice.get("text") or ""
+            if text:
+                yield text
+    record_tokens(payload["model"], reported)
+    if not finished:
+        raise HTTPException(status_code=502, detail="Together API stream ended before [DONE].")
+    if usage is not None:
+        usage.update(reported)
+    if finish is not None:
+        finish["reason"] = reason
+
+
+class SharedStream:
+    """
+    One streamed completion, relayed to every caller that asks for the same
+    key while it runs. Chunks already received are replayed to late joiners.
+    It is cancelled when its last caller leaves before it finishes, and
+    cached when it finishes.
+    """
+
+    def __init__(self, key: str, prompt: str, max_tokens: int, temperature: float):
+        self.key = key
+        self.chunks: List[str] = []
+        self.usage: dict = {}
+        self.finish: dict = {}
+        self.error: Optional[BaseException] = None
+        self.closed = False
+        self.listeners = 0
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._run(prompt, max_tokens, temperature))
+
+    async def _run(self, prompt: str, max_tokens: int, temperature: float) -> None:
+        try:
+            async for text in stream_completion(prompt, max_tokens, temperature, usage=self.usage, finish=self.finish):
+                self.chunks.append(text)
+                self._notify()
+            value = {"text": "".join(self.chunks), "usage": self.usage, "finish_reason": self.finish.get("reason")}
+            await completion_cache.put(CACHE_NAMESPACE, self.key, value, COMPLETION_CACHE_TTL)
+        except asyncio.CancelledError:
+            self.error = HTTPException(status_code=499, detail="Stream cancelled.")
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            if shared_streams.get(self.key) is self:
+                del shared_streams[self.key]
+            self.closed = True
+            self._notify()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def relay(self) -> AsyncIterator[str]:
+        """Every chunk of the completion, from the first; raises what the upstream stream raised."""
+        self.listeners += 1
+        try:
+            sent = 0
+            while True:
+                while sent < len(self.chunks):
+                    yield self.chunks[sent]
+                    sent += 1
+                if self.closed:
+                    break
+                await self._changed.wait()
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.listeners -= 1
+            if not self.listeners and not self.closed:
+                self.task.cancel()
+
+    async def result(self) -> dict:
+        """The finished completion as {"text", "usage", "finish_reason"}."""
+        text = "".join([chunk async for chunk in self.relay()])
+        return {"text": text, "usage": dict(self.usage), "finish_reason": self.finish.get("reason")}
+
+
+# Streamed completions in flight, by completion key
+shared_streams: Dict[str, SharedStream] = {}
+PHASE_CAPS = {"pitch": PITCH_MAX_TOKENS, "feedback": FEEDBACK_MAX_TOKENS}
+# Token lengths of recent upstream completions, by phase (see expected_tokens)
+completion_lengths: Dict[str, Deque[int]] = {phase: deque(maxlen=200) for phase in PHASE_CAPS}
+
+
+async def complete_phase(phase: str, prompt: str, max_tokens: int, fresh: bool = False) -> dict:
+    """complete() timed as one generation phase ("pitch" or "feedback"); adds "ms" and "tokens"."""
+    start = time.perf_counter()
+    with span(f"phase.{phase}"):
+        completion = await complete(prompt, max_tokens, fresh=fresh)
+    usage, finish_reason = completion.get("usage") or {}, completion.get("finish_reason")
+    if not completion["cached"]:
+        record_completion_length(phase, completion["text"], usage, finish_reason)
+    return {**completion, "ms": round((time.perf_counter() - start) * 1000, 1),
+            "tokens": token_counts(prompt, completion["text"], max_tokens, usage, finish_reason)}
+
+
+def budget_summary(report: dict) -> dict:
+    """The compaction counts of a render_prompt report, as responses show them."""
+    return {key: report[key] for key in ("compacted_tokens", "deduplicated", "trimmed_fields")}
+
+
+def phase_summary(completion: dict, budget: Optional[dict] = None) -> dict:
+    """What a response reports about one phase; `budget` (a render_prompt report) adds the compaction counts."""
+    summary = {"ms": completion["ms"], "cached": completion["cached"], "tokens": completion["tokens"]}
+    if budget is not None:
+        summary["budget"] = budget_summary(budget)
+    return summary
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_completion_events(prompt: str, fresh: bool = False, max_tokens: int = PITCH_MAX_TOKENS,
+                                   temperature: float = 0.7, prefix: str = "", phase: str = "pitch",
+                                   out: Optional[dict] = None, info: Optional[dict] = None) -> AsyncIterator[str]:
+    """
+    Relay a streamed completion as SSE: one `token` event per chunk, then a
+    `done` event with time-to-first-token, total time and token counts, or an
+    `error` event. Event names carry `prefix` (e.g. "feedback_token"), and
+    `info` is added to the done event; `phase` is the generation phase whose
+    completion lengths an upstream stream adds to. A cached completion, or one a plain
+    complete() call is already fetching, is sent as a single token event. A
+    completion already streaming for the same key is joined (see
+    SharedStream). The full text is left in `out["text"]` when it succeeds.
+    """
+    start = time.perf_counter()
+    key = completion_key(prompt, max_tokens, temperature, None)
+    stream = None
+    if not fresh:
+        cached = await completion_cache.get(CACHE_NAMESPACE, key)
+        flight = completion_cache.inflight(CACHE_NAMESPACE, key)
+        if cached is None and flight is not None:
+            completion_cache.count(CACHE_NAMESPACE, "coalesced")
+            try:
+                cached = await asyncio.shield(flight)
+            except HTTPException as e:
+                yield sse_event(f"{prefix}error", {"detail": e.detail})
+                return
+            except Exception as e:
+                yield sse_event(f"{prefix}error", {"detail": repr(e)})
+                return
+        if cached is not None:
+            _record_saved(cached.get("usage") or {})
+            ttft_ms = round((time.perf_counter() - start) * 1000, 1)
+            if out is not None:
+                out["text"] = cached.get("text", "")
+            yield sse_event(f"{prefix}token", {"text": cached.get("text", "")})
+            yield sse_event(f"{prefix}done", {"ttft_ms": ttft_ms, "total_ms": ttft_ms, "chunks": 1, "cached": True,
+                                              "tokens": token_counts(prompt, cached.get("text", ""), max_tokens,
+                                                                    cached.get("usage") or {},
+                                                                    cached.get("finish_reason")),
+                                              **(info or {})})
+            return
+        stream = shared_streams.get(key)
+    else:
+        completion_cache.count(CACHE_NAMESPACE, "bypassed")
+    joined = stream is not None
+    if joined:
+        completion_cache.count(CACHE_NAMESPACE, "coalesced")
+    else:
+        stream = SharedStream(key, prompt, max_tokens, temperature)
+        shared_streams.setdefault(key, stream)
+    ttft_ms = None
+    parts = []
+    try:
+        async for text in stream.relay():
+            if ttft_ms is None:
+                ttft_ms = round((time.perf_counter() - start) * 1000, 1)
+                if not prefix:
+                    ttft_samples.append(ttft_ms)
+            parts.append(text)
+            yield sse_event(f"{prefix}token", {"text": text})
+    except HTTPException as e:
+        yield sse_event(f"{prefix}error", {"detail": e.detail})
+        return
+    except Exception as e:
+        yield sse_event(f"{prefix}error", {"detail": repr(e)})
+        return
+    text = "".join(parts)
+    finish_reason = stream.finish.get("reason")
+    if joined:
+        _record_saved(stream.usage)
+    else:
+        record_completion_length(phase, text, stream.usage, finish_reason)
+    if out is not None:
+        out["text"] = text
+    yield sse_event(f"{prefix}done", {"ttft_ms": ttft_ms, "total_ms": round((time.perf_counter() - start) * 1000, 1),
+                                      "chunks": len(parts), "cached": joined,
+                                      "tokens": token_counts(prompt, text, max_tokens, stream.usage, finish_reason),
+                                      **(info or {})})
+
+
+async def stream_pitch_events(prompt: str, feedback: bool = True, fresh: bool = False,
+                              max_tokens: int = PITCH_MAX_TOKENS, budget: Optional[dict] = None) -> AsyncIterator[str]:
+    """
+    Stream the email phase (`token`/`done`/`error` events), then, if asked,
+    the feedback phase over the finished email (`feedback_token`,
+    `feedback_done`, `feedback_error`). The email is complete on the client
+    before the critique starts. `budget` (the render_prompt report) is added
+    to the email's done event.
+    """
+    pitch: dict = {}
+    info = {"budget": budget_summary(budget)} if budget is not None else None
+    with span("phase.pitch"):
+        async for event in stream_completion_events(prompt, fresh, max_tokens, out=pitch, info=info):
+            yield event
+    if feedback and pitch.get("text"):
+        feedback_prompt = render_feedback_prompt(pitch["text"])
+        with span("phase.feedback"):
+            async for event in stream_completion_events(feedback_prompt, fresh,
+                                                        feedback_budget(feedback_prompt),
+                                                        prefix="feedback_", phase="feedback"):
+                yield event
+
+
+def ttft_stats() -> dict:
+    """Summary of recent time-to-first-token samples for streamed pitches."""
+    samples = sorted(ttft_samples)
+    if not samples:
+        return {"count": 0}
+
+    def pct(p: float) -> float:
+        return samples[min(len(samples) - 1, int(p / 100 * len(samples)))]
+
+    return {
+        "count": len(samples),
+        "mean_ms": round(sum(samples) / len(samples), 1),
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "max_ms": samples[-1],
+    }
+
+
+def cache_stats() -> dict:
+    """Completion cache hits, misses and tokens saved."""
+    return dict(completion_cache.stats.get(CACHE_NAMESPACE, {}))
@@ -0,0 +1,106 @@
+"""
+App-lifetime pooled HTTP clients, one per upstream provider.
+
+Every upstream (SerpAPI, Proxycurl, Together) gets a single httpx.AsyncClient
+that is opened in the FastAPI lifespan and closed on shutdown, so keep-alive
+connections (and their TCP/TLS handshakes) are reused across requests.
+
+Tunable through environment variables:
+  HTTP_MAX_CONNECTIONS             total connections per provider (default 100)
+  HTTP_MAX_KEEPALIVE_CONNECTIONS   idle connections kept open (default 20)
+  HTTP_KEEPALIVE_EXPIRY            seconds an idle connection is kept (default 30)
+  HTTP2                            "1" to negotiate HTTP/2 (needs the `h2` package)
+  <PROVIDER>_TIMEOUT               read/write timeout in seconds, e.g. SERPAPI_TIMEOUT
+  <PROVIDER>_CONNECT_TIMEOUT       connect timeout in seconds
+  <PROVIDER>_BASE_URL              override the upstream, e.g. for local stand-ins
+"""
+import importlib.util
+import logging
+import os
+from dataclasses import dataclass
+from typing import Dict
+
+import httpx
+
+from config import env_flag, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ProviderConfig:
+    name: str
+    base_url: str
+    timeout: float
+    connect_timeout: float
+
+
+def _provider(name: str, base_url: str, timeout: float, connect_timeout: float = 5.0) -> ProviderConfig:
+    prefix = name.upper()
+    return ProviderConfig(
+        name=name,
+        base_url=os.getenv(f"{prefix}_BASE_URL", base_url),
+        timeout=env_float(f"{prefix}_TIMEOUT", timeout),
+        connect_timeout=env_float(f"{prefix}_CONNECT_TIMEOUT", connect_timeout),
+    )
+
+
+PROVIDERS: Dict[str, ProviderConfig] = {
+    "serpapi": _provider("serpapi", "https://serpapi.com", 20.0),
+    "proxycurl": _provider("proxycurl", "https://nubela.co/proxycurl", 30.0),
+    "together": _provider("together", "https://api.together.xyz", 60.0),
+}
+
+HTTP_MAX_CONNECTIONS = env_int("HTTP_MAX_CONNECTIONS", 100)
+HTTP_MAX_KEEPALIVE_CONNECTIONS = env_int("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20)
+HTTP_KEEPALIVE_EXPIRY = env_float("HTTP_KEEPALIVE_EXPIRY", 30.0)
+HTTP2 = env_flag("HTTP2")
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _http2_enabled() -> bool:
+    if HTTP2 and importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP2=1 but the 'h2' package is not installed; falling back to HTTP/1.1")
+        return False
+    return HTTP2
+
+
+def build_client(provider: str) -> httpx.AsyncClient:
+    """Create a pooled client for `provider` using the configured limits and timeouts."""
+    cfg = PROVIDERS[provider]
+    return httpx.AsyncClient(
+        base_url=cfg.base_url,
+        timeout=httpx.Timeout(cfg.timeout, connect=cfg.connect_timeout),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        http2=_http2_enabled(),
+    )
+
+
+async def startup() -> None:
+    """Open one client per provider. Called from the FastAPI lifespan."""
+    for name in PROVIDERS:
+        if name not in _clients:
+            _clients[name] = build_client(name)
+
+
+async def shutdown() -> None:
+    """Close every client and drop its pooled connections."""
+    while _clients:
+        _, client = _clients.popitem()
+        await client.aclose()
+
+
+def get_client(provider: str) -> httpx.AsyncClient:
+    """
+    Return the shared client for `provider`.
+    Created on first use if the lifespan has not run (e.g. scripts and benchmarks).
+    """
+    client = _clients.get(provider)
+    if client is None or client.is_closed:
+        client = _clients[provider] = build_client(provider)
+    return client
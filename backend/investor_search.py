@@ -0,0 +1,186 @@
+"""
+Investor search on SerpAPI: site-restricted, paged and concurrent.
+
+A search runs one Google query per site, restricted to LinkedIn profiles or
+to Crunchbase, and both run at once. Each site starts with as many result
+pages as its quota needs (num_results / SEARCH_PAGE_SIZE, rounded up), all
+fetched concurrently, so a large num_results costs about one page's latency
+rather than one per page. A further wave is fetched only when duplicates or
+off-site links left the quota short.
+
+Pages are consumed in rank order, and URLs are deduplicated across pages
+(LinkedIn's country subdomains count as one profile). A site stops, and its
+outstanding pages are cancelled, as soon as its quota is filled or Google
+runs out of results: a page with no organic results, or one whose
+serpapi_pagination has no "next" link. A page with fewer results than
+requested is not the end; Google often returns 8 or 9 for num=10. search()
+yields each page's new results as soon as they are accepted, so callers can
+stream partial results.
+
+If a site's first page fails the search fails. A failed later page is
+skipped: pages already started after it are still used, but no further
+pages are started for that site.
+
+Settings (environment variables):
+  SEARCH_PAGE_SIZE  results requested per page (default 10)
+  SEARCH_MAX_PAGES  pages fetched per site at most (default 10)
+"""
+import asyncio
+import logging
+import re
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from cache import normalize_url
+from config import SERPAPI_KEY, env_int
+from enrichment import serpapi_search
+from search_index import search_index
+
+logger = logging.getLogger(__name__)
+
+SEARCH_PAGE_SIZE = env_int("SEARCH_PAGE_SIZE", 10)
+SEARCH_MAX_PAGES = env_int("SEARCH_MAX_PAGES", 10)
+
+# site -> (query restriction, substring a result link must contain)
+SITES = {
+    "linkedin": ("site:linkedin.com/in", "linkedin.com/in"),
+    "crunchbase": ("site:crunchbase.com", "crunchbase.com"),
+}
+SITE_OPERATOR_RE = re.compile(r"\s*\bsite:\S+", re.IGNORECASE)
+
+
+def site_query(keywords: str, site: str) -> str:
+    """`keywords` restricted to `site`, replacing any site: operator they already had."""
+    return f"{SITE_OPERATOR_RE.sub('', keywords).strip()} {SITES[site][0]}".strip()
+
+
+def result_key(url: str) -> str:
+    key = normalize_url(url)
+    host, _, path = key.partition("/")
+    if host.endswith(".linkedin.com"):  # de.linkedin.com/in/x is linkedin.com/in/x
+        return f"linkedin.com/{path}"
+    return key
+
+
+async def fetch_page(query: str, page: int, no_cache: bool = False) -> Tuple[List[dict], bool]:
+    """One page of organic results, and whether Google has more after it."""
+    params = {"engine": "google", "q": query, "api_key": SERPAPI_KEY, "num": SEARCH_PAGE_SIZE}
+    if page:
+        params["start"] = page * SEARCH_PAGE_SIZE
+    # Only pages fresh from SerpAPI are indexed; cached ones already were
+    data = await serpapi_search(params, no_cache=no_cache, on_fetch=index_results)
+    items = data.get("organic_results", [])
+    return items, bool(items) and bool((data.get("serpapi_pagination") or {}).get("next"))
+
+
+def index_results(data: dict) -> None:
+    search_index.write_in_background(search_index.add_results, data.get("organic_results", []))
+
+
+class SiteSearch:
+    """The pages of one site's query, consumed in rank order until `quota` unique results are found."""
+
+    def __init__(self, site: str, keywords: str, quota: int, no_cache: bool = False):
+        self.site = site
+        self.query = site_query(keywords, site)
+        self.quota = quota
+        self.no_cache = no_cache
+        self.results: List[dict] = []
+        self.seen: Set[str] = set()
+        self.tasks: Dict[int, asyncio.Task] = {}
+        self.arrived: Dict[int, Optional[Tuple[List[dict], bool]]] = {}
+        self.consumed = 0  # pages consumed so far, in rank order
+        self.failed = False  # a page failed: use the pages started so far, start no more
+        self.done = quota <= 0
+
+    @property
+    def waiting(self) -> bool:
+        """Every page started so far has been consumed, and more may be needed."""
+        return not self.done and self.consumed == len(self.tasks)
+
+    def launch(self) -> List[Tuple[int, asyncio.Task]]:
+        """Start enough further pages to fill the rest of the quota if every result on them is new."""
+        if self.failed:
+            return []
+        missing = self.quota - len(self.results)
+        first = len(self.tasks)
+        started = []
+        for page in range(first, min(first + -(-missing // SEARCH_PAGE_SIZE), SEARCH_MAX_PAGES)):
+            self.tasks[page] = asyncio.create_task(fetch_page(self.query, page, self.no_cache))
+            started.append((page, self.tasks[page]))
+        return started
+
+    def accept(self, page: int, fetched: Optional[Tuple[List[dict], bool]]) -> List[Tuple[int, List[dict]]]:
+        """
+        Record a finished page (its fetch_page result, or None if it failed)
+        and return the pages it let through, in rank order, as (page, new
+        results). Pages after a missing one wait for it.
+        """
+        self.arrived[page] = fetched
+        if fetched is None:
+            self.failed = True
+        accepted = []
+        while not self.done and self.consumed in self.arrived:
+            page_items, more = self.arrived.pop(self.consumed) or ([], True)
+            new: List[dict] = []
+            accepted.append((self.consumed, new))
+            self.consumed += 1
+            for item in page_items:
+                link = item.get("link", "")
+                key = result_key(link)
+                if SITES[self.site][1] not in link or key in self.seen:
+                    continue
+                self.seen.add(key)
+                result = {"title": item.get("title", ""), "url": link, "snippet": item.get("snippet", "")}
+                self.results.append(result)
+                new.append(result)
+                if len(self.results) >= self.quota:
+                    break
+            # Filled, Google has no further results, or a failure left nothing more to wait for
+            if len(self.results) >= self.quota or not more or (self.failed and self.consumed == len(self.tasks)):
+                self.done = True
+        if self.done:
+            self.cancel()
+        return [(number, results) for number, results in accepted if results]
+
+    def cancel(self) -> None:
+        for task in self.tasks.values():
+            if task.done() and not task.cancelled():
+                task.exception()  # mark a failure nobody will consume as retrieved
+            task.cancel()
+
+
+async def search(keywords: str, num_results: int, no_cache: bool = False,
+                 sites: Iterable[str] = SITES) -> AsyncIterator[Tuple[str, int, List[dict]]]:
+    """
+    Search `sites` (by default every site in SITES) for up to `num_results`
+    results each. Yields (site, page, new results) as pages are accepted; the
+    results of one site arrive in rank order.
+    """
+    searches = [SiteSearch(site, keywords, num_results, no_cache) for site in sites]
+    pending: Dict[asyncio.Task, Tuple[SiteSearch, int]] = {}
+    for site_search in searches:
+        for page, task in site_search.launch():
+            pending[task] = (site_search, page)
+    try:
+        while pending:
+            finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                site_search, page = pending.pop(task)
+                if task.cancelled():
+                    continue
+                fetched = None
+                if task.exception() is not None:
+                    if page == 0:
+                        raise task.exception()
+                    logger.warning("%s search page %d failed: %r", site_search.site, page, task.exception())
+                else:
+                    fetched = task.result()
+                for accepted_page, new in site_search.accept(page, fetched):
+                    yield site_search.site, accepted_page, new
+                if site_search.waiting:
+                    for next_page, next_task in site_search.launch():
+                        pending[next_task] = (site_search, next_page)
+            pending = {task: owner for task, owner in pending.items() if not owner[0].done}
+    finally:
+        for site_search in searches:
+            site_search.cancel()
@@ -0,0 +1,421 @@
+"""
+Durable background jobs for long-running generation and enrichment.
+
+POST /jobs stores a job in a local SQLite queue and returns its id at once.
+The caller then polls GET /jobs/{id} (optionally long-polling with ?wait=),
+or subscribes to GET /jobs/{id}/events for server-sent status updates. A
+client that disconnects loses nothing: the result stays in the queue until
+JOB_RESULT_TTL passes.
+
+A pool of async workers claims jobs in priority order (higher first, then
+oldest first) and runs the handler registered for the job's kind. A job
+identical to one that is queued, running or already finished (same kind
+and payload) is not run twice; its id is returned instead. Jobs asking for
+fresh results only share queued or running work.
+
+Several backend processes can share one queue file. Each one claims jobs
+atomically and sends a heartbeat. If a process stops heartbeating, whether
+it crashed or was killed, the jobs it was running are queued again. A job
+interrupted JOB_MAX_ATTEMPTS times is marked failed. A clean shutdown
+requeues its running jobs immediately.
+
+Every SQLite call runs on a worker thread (asyncio.to_thread), so a queue
+file locked by another process never stalls the event loop. A database error
+in a worker or the heartbeat is logged and retried on the next tick rather
+than stopping it; a job whose result could not be stored is queued again.
+
+Settings (environment variables):
+  JOB_DB_PATH        SQLite file (default jobs.sqlite3)
+  JOB_WORKERS        concurrent jobs per process (default 8)
+  JOB_MAX_ATTEMPTS   runs before an interrupted job is given up (default 3)
+  JOB_RESULT_TTL     seconds finished jobs are kept (default 1 day)
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+from fastapi import HTTPException
+
+from cache import make_key
+from config import env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.sqlite3")
+JOB_WORKERS = env_int("JOB_WORKERS", 8)
+JOB_MAX_ATTEMPTS = env_int("JOB_MAX_ATTEMPTS", 3)
+JOB_RESULT_TTL = env_float("JOB_RESULT_TTL", 24 * 3600.0)
+
+MAX_WAIT = 60.0  # longest long-poll, in seconds
+POLL_INTERVAL = 1.0  # seconds; also picks up jobs queued by other processes
+HEARTBEAT_INTERVAL = 2.0
+OWNER_TIMEOUT = 10.0  # a process silent this long is presumed dead
+PURGE_INTERVAL = 300.0
+FINISHED = ("done", "failed", "cancelled")
+
+Handler = Callable[[dict], Awaitable[Any]]
+
+_COLUMNS = ("id, kind, status, priority, payload, result, error, status_code, attempts,"
+            " created_at, started_at, finished_at")
+
+
+async def _wait_event(event: asyncio.Event, timeout: float) -> None:
+    """
+    Wait until `event` is set or `timeout` passes. asyncio.wait_for can swallow
+    a cancellation that arrives just as the event is set (Python < 3.12), which
+    would leave stop() waiting on a worker that never ends.
+    """
+    waiter = asyncio.ensure_future(event.wait())
+    try:
+        await asyncio.wait((waiter,), timeout=timeout)
+    finally:
+        waiter.cancel()
+
+
+def _row_to_job(row: tuple) -> dict:
+    (job_id, kind, status, priority, payload, result, error, status_code, attempts,
+     created_at, started_at, finished_at) = row
+    job = {"id": job_id, "kind": kind, "status": status, "priority": priority, "attempts": attempts,
+           "created_at": created_at, "started_at": started_at, "finished_at": finished_at,
+           "payload": json.loads(payload)}
+    if status == "done":
+        job["result"] = json.loads(result)
+    elif status in ("failed", "cancelled"):
+        job.update(error=error, status_code=status_code)
+    return job
+
+
+class JobQueue:
+    def __init__(self, path: str = JOB_DB_PATH, workers: int = JOB_WORKERS):
+        self.path = path
+        self.workers = max(1, workers)
+        self.owner = uuid.uuid4().hex
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._handlers: Dict[str, Handler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        # Jobs this process claimed and has not finished; added under the lock by _claim
+        self._owned: Set[str] = set()
+        self._cancelled: Set[str] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._watchers: Dict[str, Set[asyncio.Event]] = {}
+        self._last_purge = 0.0
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.executescript(
+                "PRAGMA journal_mode=WAL;"
+                "PRAGMA synchronous=NORMAL;"
+                "PRAGMA busy_timeout=5000;"
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, priority INTEGER NOT NULL,"
+                " payload TEXT NOT NULL, dedup_key TEXT NOT NULL,"
+                " result TEXT, error TEXT, status_code INTEGER, attempts INTEGER NOT NULL DEFAULT 0,"
+                " owner TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL);"
+                "CREATE TABLE IF NOT EXISTS owners (id TEXT PRIMARY KEY, heartbeat REAL NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS jobs_queued ON jobs (status, priority DESC, created_at);"
+                "CREATE INDEX IF NOT EXISTS jobs_by_key ON jobs (dedup_key, status);"
+            )
+        return self._db
+
+    def register(self, kind: str, handler: Handler) -> None:
+        """`handler(payload)` runs one job and returns its JSON-serializable result."""
+        self._handlers[kind] = handler
+
+    # --- submitting and reading ---
+    async def submit(self, kind: str, payload: dict, priority: int = 0, fresh: bool = False) -> dict:
+        """
+        Queue a job, or return the identical one already queued, running or
+        (unless `fresh`) finished. Returns {"id", "status", "deduplicated"}.
+        """
+        if kind not in self._handlers:
+            raise HTTPException(status_code=400, detail=f"Unknown job kind {kind!r}.")
+        job = await asyncio.to_thread(self._submit, kind, payload, priority, fresh)
+        if not job["deduplicated"] and self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    def _submit(self, kind: str, payload: dict, priority: int, fresh: bool) -> dict:
+        dedup_key = make_key(kind, payload)
+        reusable = ("queued", "running") if fresh else ("queued", "running", "done")
+        with self._lock:
+            conn = self._conn()
+            existing = conn.execute(
+                f"SELECT id, status, priority FROM jobs WHERE dedup_key = ? AND status IN ({','.join('?' * len(reusable))})"
+                " ORDER BY created_at DESC LIMIT 1",
+                (dedup_key, *reusable),
+            ).fetchone()
+            if existing is not None:
+                job_id, status, current = existing
+                if status == "queued" and priority > current:
+                    # A more urgent duplicate moves the shared job up the queue
+                    conn.execute("UPDATE jobs SET priority = ? WHERE id = ?", (priority, job_id))
+                    conn.commit()
+                return {"id": job_id, "status": status, "deduplicated": True}
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, priority, payload, dedup_key, created_at)"
+                " VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, kind, priority, json.dumps(payload), dedup_key, time.time()),
+            )
+            conn.commit()
+        return {"id": job_id, "status": "queued", "deduplicated": False}
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self._get, job_id)
+
+    def _get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn().execute(f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = _row_to_job(row)
+            if job["status"] == "queued":
+                job["position"] = self._position(job)
+        return job
+
+    def _position(self, job: dict) -> int:
+        """How many queued jobs run before this one. Called with the lock held."""
+        return self._conn().execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued'"
+                " AND (priority > ? OR (priority = ? AND created_at < ?))",
+                (job["priority"], job["priority"], job["created_at"]),
+            ).fetchone()[0]
+
+    async def watch(self, job_id: str) -> AsyncIterator[dict]:
+        """Yield the job whenever its status or queue position changes, ending once it finishes."""
+        event = asyncio.Event()
+        self._watchers.setdefault(job_id, set()).add(event)
+        try:
+            last = None
+            while True:
+                event.clear()
+                job = await self.get(job_id)
+                if job is None:
+                    return
+                if (job["status"], job.get("position")) != last:
+                    last = (job["status"], job.get("position"))
+                    yield job
+                if job["status"] in FINISHED:
+                    return
+                # Woken by a local worker; the timeout catches jobs run by other processes
+                await _wait_event(event, POLL_INTERVAL)
+        finally:
+            watchers = self._watchers.get(job_id)
+            if watchers is not None:
+                watchers.discard(event)
+                if not watchers:
+                    del self._watchers[job_id]
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        """The job once it finishes, or as it is when `timeout` passes."""
+        job = await self.get(job_id)
+
+        async def until_finished():
+            nonlocal job
+            async for job in self.watch(job_id):
+                pass
+
+        if job is not None and job["status"] not in FINISHED and timeout > 0:
+            try:
+                await asyncio.wait_for(until_finished(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    async def cancel(self, job_id: str) -> Optional[dict]:
+        """Cancel a queued job, or a running one if this process is running it."""
+        task = self._running.get(job_id)
+        statuses = ("queued", "running") if task is not None else ("queued",)
+        await asyncio.to_thread(self._mark_cancelled, job_id, statuses)
+        if task is not None:
+            self._cancelled.add(job_id)
+            task.cancel()
+        self._notify(job_id)
+        return await self.get(job_id)
+
+    def _mark_cancelled(self, job_id: str, statuses: tuple) -> None:
+        with self._lock:
+            self._conn().execute(
+                "UPDATE jobs SET status = 'cancelled', error = 'Cancelled by request.', status_code = 499,"
+                f" finished_at = ? WHERE id = ? AND status IN ({','.join('?' * len(statuses))})",
+                (time.time(), job_id, *statuses))
+            self._conn().commit()
+
+    async def stats(self) -> dict:
+        counts = await asyncio.to_thread(self._counts)
+        return {"workers": self.workers, "running_here": len(self._running),
+                "jobs": {status: counts.get(status, 0) for status in ("queued", "running", *FINISHED)}}
+
+    def _counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    # --- workers ---
+    def _heartbeat(self) -> int:
+        """
+        Mark this process alive, then requeue the jobs of processes that are
+        not, and this process's own jobs that it no longer runs (their result
+        could not be stored). Returns how many were requeued.
+        """
+        now = time.time()
+        with self._lock:
+            running = tuple(self._owned)
+            conn = self._conn()
+            conn.execute("INSERT OR REPLACE INTO owners VALUES (?, ?)", (self.owner, now))
+            conn.execute("DELETE FROM owners WHERE heartbeat < ?", (now - OWNER_TIMEOUT,))
+            placeholders = ",".join("?" * len(running))
+            orphaned = ("status = 'running' AND (owner IS NULL OR owner NOT IN (SELECT id FROM owners)"
+                        f" OR (owner = ? AND id NOT IN ({placeholders})))")
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', status_code = 500, finished_at = ?,"
+                f" error = 'Interrupted too many times.' WHERE {orphaned} AND attempts >= ?",
+                (now, self.owner, *running, JOB_MAX_ATTEMPTS))
+            requeued = conn.execute(f"UPDATE jobs SET status = 'queued', owner = NULL WHERE {orphaned}",
+                                    (self.owner, *running)).rowcount
+            conn.commit()
+        return requeued
+
+    async def _keep_alive(self) -> None:
+        while True:
+            try:
+                requeued = await asyncio.to_thread(self._heartbeat)
+                if requeued:
+                    logger.info("Requeued %d interrupted jobs", requeued)
+                    if self._wakeup is not None:
+                        self._wakeup.set()
+                if time.monotonic() - self._last_purge > PURGE_INTERVAL:
+                    await asyncio.to_thread(self._purge)
+            except sqlite3.Error as e:
+                logger.warning("Job queue heartbeat failed, retrying: %r", e)
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    def _purge(self) -> None:
+        with self._lock:
+            self._conn().execute(
+                f"DELETE FROM jobs WHERE status IN ({','.join('?' * len(FINISHED))}) AND finished_at < ?",
+                (*FINISHED, time.time() - JOB_RESULT_TTL))
+            self._conn().commit()
+        self._last_purge = time.monotonic()
+
+    def _claim(self) -> Optional[tuple]:
+        with self._lock:
+            conn = self._conn()
+            row = conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, owner = ?, started_at = ?"
+                " WHERE id = (SELECT id FROM jobs WHERE status = 'queued' ORDER BY priority DESC, created_at LIMIT 1)"
+                " RETURNING id, kind, payload",
+                (self.owner, time.time()),
+            ).fetchone()
+            conn.commit()
+            if row is not None:
+                self._owned.add(row[0])
+        return row
+
+    async def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None,
+                      status_code: Optional[int] = None) -> None:
+        await asyncio.to_thread(self._store_outcome, job_id, status, result, error, status_code)
+        self._notify(job_id)
+
+    def _store_outcome(self, job_id: str, status: str, result: Any, error: Optional[str],
+                       status_code: Optional[int]) -> None:
+        with self._lock:
+            self._conn().execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, status_code = ?, finished_at = ?"
+                " WHERE id = ? AND status = 'running'",
+                (status, json.dumps(result) if status == "done" else None, error, status_code, time.time(), job_id))
+            self._conn().commit()
+
+    def _notify(self, job_id: str) -> None:
+        for event in self._watchers.get(job_id, ()):
+            event.set()
+
+    async def _run(self, job_id: str, kind: str, payload: dict) -> None:
+        handler = self._handlers.get(kind)
+        if handler is None:
+            try:
+                await self._finish(job_id, "failed", error=f"No handler for job kind {kind!r}.", status_code=500)
+            finally:
+                self._owned.discard(job_id)
+            return
+        task = asyncio.ensure_future(handler(payload))
+        self._running[job_id] = task
+        self._notify(job_id)
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            if job_id not in self._cancelled:
+                self._running.pop(job_id, None)
+                raise  # the worker itself is stopping; stop() requeues the job
+            outcome = ("cancelled", None, "Cancelled by request.", 499)
+        except HTTPException as e:
+            outcome = ("failed", None, str(e.detail), e.status_code)
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job_id, kind)
+            outcome = ("failed", None, repr(e), 500)
+        else:
+            outcome = ("done", result, None, None)
+        finally:
+            self._cancelled.discard(job_id)
+        try:
+            await self._finish(job_id, *outcome)
+        finally:
+            # Still running in the database if _finish failed; the next heartbeat requeues it
+            self._running.pop(job_id, None)
+            self._owned.discard(job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                claimed = await asyncio.to_thread(self._claim)
+                if claimed is not None:
+                    job_id, kind, payload = claimed
+                    await self._run(job_id, kind, json.loads(payload))
+                    continue
+            except sqlite3.Error as e:
+                logger.warning("Job queue worker hit a database error, retrying: %r", e)
+            self._wakeup.clear()
+            await _wait_event(self._wakeup, POLL_INTERVAL)
+
+    def start(self) -> None:
+        """Start the workers and the heartbeat. Called from the FastAPI lifespan."""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._keep_alive())]
+        self._tasks += [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Stop the workers and put the jobs they were running back in the queue."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+        await asyncio.to_thread(self._release)
+
+    def _release(self) -> None:
+        with self._lock:
+            conn = self._conn()
+            # A clean shutdown does not count against the job's attempts
+            conn.execute("UPDATE jobs SET status = 'queued', owner = NULL, attempts = attempts - 1"
+                         " WHERE status = 'running' AND owner = ?", (self.owner,))
+            conn.execute("DELETE FROM owners WHERE id = ?", (self.owner,))
+            conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+job_queue = JobQueue()
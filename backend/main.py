@@ -2,17 +2,59 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-import os
-import httpx
-from langchain.prompts import PromptTemplate
-from typing import Optional, List, Dict
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from contextlib import asynccontextmanager
+import importlib
+from typing import Dict, Optional, List
+from typing_extensions import TypedDict
 import asyncio
-import json
-import sys
-import subprocess
+import time
 
-app = FastAPI()
+import enrichment
+import generation
+import http_clients
+import investor_search
+import metrics
+from batch import ndjson, run_bounded
+from browser_pool import SCRAPER_DEADLINE, browser_pool
+from snapshots import snapshot_store
+from jobs import MAX_WAIT, job_queue
+from search_index import LOCAL_SEARCH_ENABLED, LOCAL_SEARCH_MIN_HITS, search_index
+from serialization import FastJSONResponse
+from cache import upstream_cache
+from upstream import upstreams
+from config import env_int, validate_settings
+from generation import pitch_template
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Checked here rather than at import so tools can import the app without credentials
+    validate_settings()
+    # One pooled client per upstream for the lifetime of the app
+    await http_clients.startup()
+    await asyncio.to_thread(search_index.load)
+    # NumPy (via ranking.py) loads in the background instead of delaying the first request
+    preload = asyncio.create_task(asyncio.to_thread(importlib.import_module, "ranking"))
+    job_queue.start()
+    try:
+        yield
+    finally:
+        await job_queue.stop()
+        job_queue.close()
+        await asyncio.gather(preload, return_exceptions=True)
+        await http_clients.shutdown()
+        upstream_cache.close()
+        generation.completion_cache.close()
+        await browser_pool.close()
+        snapshot_store.close()
+        await search_index.flush()
+        search_index.close()
+
+app = FastAPI(lifespan=lifespan)
+# Per-endpoint latency, Server-Timing headers and slow-request logs (see metrics.py)
+app.add_middleware(metrics.MetricsMiddleware)
 
 class StartupInfo(BaseModel):
     name: str
@@ -34,241 +76,461 @@ class PitchRequest(BaseModel):
     investor: InvestorInfo
     tone: Optional[str] = "professional"
     feedback: Optional[bool] = True
+    fresh: Optional[bool] = False  # force a new sample instead of a cached completion
+    max_tokens: Optional[int] = None  # email token budget, at most PITCH_MAX_TOKENS; default follows measured email lengths
+
+class BatchPitchRequest(BaseModel):
+    startup: StartupInfo
+    investors: List[InvestorInfo]
+    tone: Optional[str] = "professional"
+    feedback: Optional[bool] = True
+    concurrency: Optional[int] = None  # defaults to TOGETHER_MAX_CONCURRENCY
+    fresh: Optional[bool] = False
+    max_tokens: Optional[int] = None  # per email, at most PITCH_MAX_TOKENS; default follows measured email lengths
 
 class InvestorSearchRequest(BaseModel):
     keywords: str  # e.g. "investor venture capital site:linkedin.com/in"
     num_results: int = 5
+    no_cache: Optional[bool] = False  # skip cached SerpAPI results
 
 class InvestorEnrichRequest(BaseModel):
     linkedin_url: str
+    no_cache: Optional[bool] = False
+
+class RankInvestorsRequest(BaseModel):
+    startup: StartupInfo
+    top_k: int = Field(10, ge=1)
+    investors: Optional[List[InvestorInfo]] = None  # rank these instead of every enriched investor
+
+class BulkEnrichRequest(BaseModel):
+    investors: List[str]  # investor names or LinkedIn profile URLs
+    location: Optional[str] = None  # applied to every name lookup
+    concurrency: Optional[int] = None  # defaults to BULK_ENRICH_CONCURRENCY
+    no_cache: Optional[bool] = False
+
+class CrunchbaseScrapeRequest(BaseModel):
+    urls: List[str]
+    deadline: Optional[float] = None  # seconds per URL, defaults to SCRAPER_DEADLINE
 
 class AutoEnrichRequest(BaseModel):
     name: str
     location: Optional[str] = None
     keywords: Optional[str] = None  # extra keywords for search
+    no_cache: Optional[bool] = False
 
-# --- Enhanced Prompt Template ---
-pitch_template = PromptTemplate(
-    input_variables=[
-        "startup_name", "startup_niche", "startup_traction", "startup_goals", "startup_extra_info",
-        "investor_name", "investor_bio", "investor_interests", "investor_linkedin", "investor_notable_investments", "investor_location"
-    ],
-    template=(
-        "You are an expert startup advisor. Write a personalized investor pitch email for the startup '{startup_name}'. "
-        "The pitch is for {investor_name}. Use the following context about the investor to personalize the email. "
-        "Their bio is: '{investor_bio}'. They are interested in: '{investor_interests}'. "
-        "LinkedIn: {investor_linkedin}. Notable investments: {investor_notable_investments}. Location: {investor_location}.\n\n"
-        "Make sure the email includes: "
-        "1. A strong 1-liner hook after the greeting. "
-        "2. A line about why this investor is a fit, using their bio, interests, investments, and location. "
-        "3. A brief explanation of the unique tech. "
-        "4. A breakdown of how the funding will be used. "
-        "5. A specific call-to-action (e.g., a 15-minute call next week).\n\n"
-        "---\n"
-        "STARTUP DETAILS:\n"
-        "Niche: {startup_niche}\n"
-        "Traction: {startup_traction}\n"
-        "Goals: {startup_goals}\n"
-        "Additional Info: {startup_extra_info}\n"
-        "---\n\n"
-        "INVESTOR PITCH EMAIL:"
-    )
-)
+class FeedbackRequest(BaseModel):
+    pitch: str  # the generated email to critique
+    fresh: Optional[bool] = False
+    max_tokens: Optional[int] = None  # at most FEEDBACK_MAX_TOKENS; default follows measured critique lengths
+
+class JobRequest(BaseModel):
+    kind: str  # "generate", "feedback", "enrich" or "auto_enrich"
+    payload: dict  # the request body of the matching endpoint
+    priority: Optional[int] = 0  # higher runs first
+
+# Response models of the endpoints that return large lists. They are TypedDicts: typed for
+# OpenAPI and type checkers, but plain dicts at run time, returned as FastJSONResponse so
+# neither validation nor jsonable_encoder touches every profile (see serialization.py)
+class InvestorProfile(TypedDict, total=False):
+    name: str
+    bio: Optional[str]
+    interests: Optional[str]
+    linkedin: Optional[str]
+    notable_investments: Optional[str]
+    location: Optional[str]
+
+class SearchResult(TypedDict):
+    title: str
+    url: str
+    snippet: str
 
-SERPAPI_KEY = os.getenv("SERPAPI_KEY")
-PROXYCURL_KEY = os.getenv("PROXYCURL_KEY")
-if not SERPAPI_KEY:
-    raise RuntimeError("SERPAPI_KEY not set in environment variables.")
+class SearchResponse(TypedDict):
+    linkedin: List[SearchResult]
+    crunchbase: List[SearchResult]
+    source: str  # "local", "serpapi", or "mixed" when only some sites needed SerpAPI
 
-@app.post("/search_investors")
+class RankedInvestor(TypedDict):
+    investor: InvestorProfile
+    score: float
+    fields: Dict[str, float]  # per-field cosine similarity
+
+class RankResponse(TypedDict):
+    results: List[RankedInvestor]
+    total: int
+    ms: float
+
+class ScrapeResult(TypedDict, total=False):
+    url: str
+    ms: float
+    status: str  # "ok" or "error"
+    profile: InvestorProfile
+    status_code: int
+    error: str
+
+class ScrapeResponse(TypedDict):
+    results: List[ScrapeResult]
+
+BULK_ENRICH_CONCURRENCY = env_int("BULK_ENRICH_CONCURRENCY", 20)
+BULK_ENRICH_MAX_CONCURRENCY = env_int("BULK_ENRICH_MAX_CONCURRENCY", 100)
+
+def local_search(req: InvestorSearchRequest) -> Dict[str, List[dict]]:
+    """
+    Results from the local index (see search_index.py) for each site that has
+    enough hits to skip SerpAPI; sites that are short are left out.
+    """
+    if not LOCAL_SEARCH_ENABLED or req.no_cache:
+        return {}
+    with metrics.span("search.local"):
+        local = search_index.search(req.keywords, req.num_results)
+    needed = LOCAL_SEARCH_MIN_HITS or req.num_results
+    return {site: results for site, results in local.items() if len(results) >= needed}
+
+def search_source(local: Dict[str, List[dict]]) -> str:
+    if len(local) == len(investor_search.SITES):
+        return "local"
+    return "mixed" if local else "serpapi"
+
+@app.post("/search_investors", response_model=SearchResponse)
 async def search_investors(req: InvestorSearchRequest):
-    params = {
-        "engine": "google",
-        "q": req.keywords,
-        "api_key": SERPAPI_KEY,
-        "num": req.num_results
-    }
-    async with httpx.AsyncClient() as client:
-        response = await client.get("https://serpapi.com/search", params=params)
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail=f"SerpAPI Google Search error: {response.text}")
-        data = response.json()
-        linkedin_results = []
-        crunchbase_results = []
-        for item in data.get("organic_results", [])[:req.num_results * 2]:  # scan more for both types
-            link = item.get("link", "")
-            title = item.get("title", "")
-            snippet = item.get("snippet", "")
-            if "linkedin.com/in" in link:
-                linkedin_results.append({"title": title, "url": link, "snippet": snippet})
-            elif "crunchbase.com" in link:
-                crunchbase_results.append({"title": title, "url": link, "snippet": snippet})
-            # Stop if we have enough of both
-            if len(linkedin_results) >= req.num_results and len(crunchbase_results) >= req.num_results:
-                break
-        return {
-            "linkedin": linkedin_results[:req.num_results],
-            "crunchbase": crunchbase_results[:req.num_results]
-        }
+    # Investors we have already seen are answered from the local index; SerpAPI is
+    # only called for a site with too few local hits, or for all when the caller asks for no_cache
+    local = local_search(req)
+    results = {site: local.get(site, []) for site in investor_search.SITES}
+    remote = [site for site in investor_search.SITES if site not in local]
+    # Site-restricted LinkedIn and Crunchbase queries, their pages fetched concurrently (see investor_search.py)
+    if remote:
+        async for site, _, items in investor_search.search(req.keywords, req.num_results,
+                                                           no_cache=bool(req.no_cache), sites=remote):
+            results[site].extend(items)
+    return FastJSONResponse({**results, "source": search_source(local)})
+
+@app.post("/search_investors_stream")
+async def search_investors_stream(req: InvestorSearchRequest):
+    """
+    Like /search_investors, but streamed as NDJSON: one line per result page
+    as soon as its new results are in ({"site", "page", "results", "progress"}),
+    then a summary line. A failed search ends with an error line instead.
+    """
+    async def stream():
+        start = time.perf_counter()
+        found = {site: 0 for site in investor_search.SITES}
+        local = local_search(req)
+        remote = [site for site in investor_search.SITES if site not in local]
+        try:
+            for site, results in local.items():
+                found[site] = len(results)
+                yield ndjson({"site": site, "page": 0, "results": results, "progress": dict(found)})
+            if remote:
+                async for site, page, items in investor_search.search(req.keywords, req.num_results,
+                                                                      no_cache=bool(req.no_cache), sites=remote):
+                    found[site] += len(items)
+                    yield ndjson({"site": site, "page": page, "results": items, "progress": dict(found)})
+        except HTTPException as e:
+            yield ndjson({"error": e.detail, "status_code": e.status_code})
+            return
+        yield ndjson({"summary": {**found, "source": search_source(local), "ms": round((time.perf_counter() - start) * 1000, 1)}})
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
 @app.post("/enrich_investor")
 async def enrich_investor(req: InvestorEnrichRequest):
-    params = {
-        "engine": "linkedin_profile",
-        "url": req.linkedin_url,
-        "api_key": SERPAPI_KEY
-    }
-    async with httpx.AsyncClient() as client:
-        response = await client.get("https://serpapi.com/search", params=params)
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail=f"SerpAPI LinkedIn Profile error: {response.text}")
-        data = response.json()
-        profile = data.get("linkedin_profile", {})
-        return {
-            "name": profile.get("name", ""),
-            "bio": profile.get("about", ""),
-            "interests": ", ".join(profile.get("interests", [])) if profile.get("interests") else "",
-            "linkedin": req.linkedin_url,
-            "notable_investments": ", ".join(profile.get("featured", [])) if profile.get("featured") else "",
-            "location": profile.get("location", "")
-        }
+    return await enrichment.linkedin_profile(req.linkedin_url, no_cache=bool(req.no_cache))
 
 @app.post("/auto_enrich_investor")
 async def auto_enrich_investor(req: AutoEnrichRequest):
-    # Step 1: Use SerpAPI to find LinkedIn URL
-    search_keywords = req.keywords or f'{req.name} investor site:linkedin.com/in'
-    if req.location:
-        search_keywords += f' {req.location}'
-    params = {
-        "engine": "google",
-        "q": search_keywords,
-        "api_key": SERPAPI_KEY,
-        "num": 1
-    }
-    async with httpx.AsyncClient() as client:
-        response = await client.get("https://serpapi.com/search", params=params)
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail=f"SerpAPI Google Search error: {response.text}")
-        data = response.json()
-        linkedin_url = None
-        snippet = ""
-        for item in data.get("organic_results", []):
-            link = item.get("link", "")
-            if "linkedin.com/in" in link:
-                linkedin_url = link
-                snippet = item.get("snippet", "")
-                break
-        if not linkedin_url:
-            raise HTTPException(status_code=404, detail="No LinkedIn profile found for this name.")
-
-    # Step 2: Use SerpAPI to search Crunchbase for the same name
-    crunchbase_bio = ""
-    notable_investments = ""
-    cb_params = {
-        "engine": "google",
-        "q": f'{req.name} site:crunchbase.com',
-        "api_key": SERPAPI_KEY,
-        "num": 1
-    }
-    async with httpx.AsyncClient() as client:
-        cb_response = await client.get("https://serpapi.com/search", params=cb_params)
-        if cb_response.status_code == 200:
-            cb_data = cb_response.json()
-            for item in cb_data.get("organic_results", []):
-                link = item.get("link", "")
-                if "crunchbase.com" in link:
-                    crunchbase_bio = item.get("snippet", "")
-                    # Try to extract notable investments from the snippet
-                    # e.g. "Notable investments include Uber, Twitter, AngelList."
-                    import re
-                    match = re.search(r'Notable investments? (include|includes|such as|:)? ([^.]+)', crunchbase_bio, re.IGNORECASE)
-                    if match:
-                        notable_investments = match.group(2).strip()
-                    break
+    # LinkedIn and Crunchbase searches run concurrently, Proxycurl follows LinkedIn;
+    # see enrichment.py for the per-stage deadlines reported under "stages"
+    return await enrichment.auto_enrich(req.name, req.location, req.keywords, no_cache=bool(req.no_cache))
+
+@app.post("/bulk_enrich_investors")
+async def bulk_enrich_investors(req: BulkEnrichRequest):
+    """
+    Enrich many investors concurrently and stream one NDJSON line per investor
+    as soon as it is ready, followed by a summary line. Entries that look like
+    LinkedIn profile URLs are enriched by URL, everything else by name.
+    """
+    concurrency = min(req.concurrency or BULK_ENRICH_CONCURRENCY, BULK_ENRICH_MAX_CONCURRENCY)
+    no_cache = bool(req.no_cache)
+
+    async def enrich_one(entry: str):
+        if "linkedin.com/in" in entry:
+            return await enrichment.linkedin_profile(entry.strip(), no_cache=no_cache)
+        return await enrichment.auto_enrich(entry.strip(), req.location, no_cache=no_cache)
+
+    async def stream():
+        start = time.perf_counter()
+        ok = failed = 0
+        async for outcome in run_bounded(req.investors, enrich_one, concurrency):
+            line = {"index": outcome.index, "input": outcome.item, "ms": outcome.ms}
+            if outcome.ok:
+                ok += 1
+                line.update(status="ok", profile=outcome.result)
+            else:
+                failed += 1
+                line.update(status="error", status_code=outcome.status_code, error=outcome.error)
+            yield ndjson(line)
+        yield ndjson({"summary": {"total": len(req.investors), "ok": ok, "failed": failed,
+                                  "concurrency": concurrency, "ms": round((time.perf_counter() - start) * 1000, 1)}})
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
-    # Step 3: Try Proxycurl for LinkedIn enrichment if key is set
-    if PROXYCURL_KEY:
-        proxycurl_url = "https://nubela.co/proxycurl/api/v2/linkedin"  # Free tier supports this endpoint
-        headers = {"Authorization": f"Bearer {PROXYCURL_KEY}"}
-        params = {"url": linkedin_url, "use_cache": "if-present"}
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(proxycurl_url, headers=headers, params=params)
-            if resp.status_code == 200:
-                pdata = resp.json()
-                return {
-                    "name": pdata.get("full_name", req.name),
-                    "bio": pdata.get("summary", snippet),
-                    "interests": ", ".join(pdata.get("activities", [])) if pdata.get("activities") else "",
-                    "linkedin": linkedin_url,
-                    "notable_investments": notable_investments or (", ".join(pdata.get("experiences", [{}])[0].get("notable_investments", [])) if pdata.get("experiences") else ""),
-                    "location": pdata.get("city", ""),
-                    "crunchbase_bio": crunchbase_bio
-                }
-            # If Proxycurl fails, fallback to snippet
-    # Fallback: Use snippet from SerpAPI and Crunchbase
-    return {
-        "name": req.name,
-        "bio": snippet,
-        "interests": "",
-        "linkedin": linkedin_url,
-        "notable_investments": notable_investments,
-        "location": "",
-        "crunchbase_bio": crunchbase_bio
-    }
+@app.post("/scrape_crunchbase", response_model=ScrapeResponse)
+async def scrape_crunchbase(req: CrunchbaseScrapeRequest):
+    # Scraped concurrently on the warm browser pool; each URL reports its own status
+    results = await browser_pool.scrape_many(req.urls, req.deadline or SCRAPER_DEADLINE)
+    return FastJSONResponse({"results": results})
 
 @app.get("/")
 def read_root():
     return {"message": "Backend is working!"}
 
+@app.get("/cache/stats")
+def cache_stats():
+    return upstream_cache.snapshot()
+
+@app.post("/rank_investors", response_model=RankResponse)
+def rank_investors(req: RankInvestorsRequest):
+    """
+    Rank investors by fit with the startup (TF-IDF cosine similarity of their
+    bio, interests and notable investments against its niche, traction and
+    goals; see ranking.py) so pitches are only generated for the best matches.
+    """
+    import ranking
+
+    ranker = ranking.fit_ranker
+    if req.investors is not None:
+        ranker = ranking.FitRanker()
+        for index, investor in enumerate(req.investors):
+            ranker.add(dict(investor), key=str(index))
+    with metrics.span("rank"):
+        return FastJSONResponse(ranker.rank(req.startup, req.top_k))
+
+@app.get("/upstream/stats")
+def upstream_stats():
+    """Per-provider adaptive concurrency limit, queue and circuit breaker state."""
+    return {name: provider.stats() for name, provider in upstreams.items()}
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Request, upstream, stage and LLM token metrics in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/search_index/stats")
+def search_index_stats():
+    return search_index.stats()
+
 @app.post("/generate")
 async def generate_pitch(req: PitchRequest):
-    s = req.startup
-    i = req.investor
+    """
+    Write the pitch email and return it as soon as it is ready. With `feedback`,
+    the critique of that email is queued as a background job; its id is returned
+    as "feedback_job" (see GET /jobs/{id}). Investor fields are compacted to the
+    prompt token budget first (see budget.py); "phases" reports the tokens used.
+    """
     tone = req.tone or "professional"
     feedback = req.feedback if req.feedback is not None else True
-    prompt = pitch_template.format(
-        startup_name=s.name,
-        startup_niche=s.niche,
-        startup_traction=s.traction,
-        startup_goals=s.goals,
-        startup_extra_info=s.extra_info or "",
-        investor_name=i.name or "Investor",
-        investor_bio=i.bio or "Not specified",
-        investor_interests=i.interests or "Not specified",
-        investor_linkedin=i.linkedin or "",
-        investor_notable_investments=i.notable_investments or "",
-        investor_location=i.location or ""
+    budget: dict = {}
+    prompt = generation.render_prompt(pitch_template, req.startup, req.investor, tone, budget)
+    max_tokens = generation.pitch_budget(prompt, budget, req.max_tokens)
+    pitch = await generation.complete_phase("pitch", prompt, max_tokens, fresh=bool(req.fresh))
+    response = {"result": pitch["text"], "cached": pitch["cached"],
+                "phases": {"pitch": generation.phase_summary(pitch, budget)}}
+    if feedback and pitch["text"]:
+        job = await job_queue.submit("feedback", {"pitch": pitch["text"], "fresh": bool(req.fresh)}, fresh=bool(req.fresh))
+        response["feedback_job"] = job["id"]
+    return response
+
+@app.post("/generate_feedback")
+async def generate_feedback(req: FeedbackRequest):
+    """Critique a generated pitch email (the second generation phase), on demand."""
+    prompt = generation.render_feedback_prompt(req.pitch)
+    max_tokens = generation.feedback_budget(prompt, req.max_tokens)
+    result = await generation.complete_phase("feedback", prompt, max_tokens, fresh=bool(req.fresh))
+    return {"feedback": result["text"], "cached": result["cached"],
+            "phases": {"feedback": generation.phase_summary(result)}}
+
+@app.post("/generate_stream")
+async def generate_pitch_stream(req: PitchRequest):
+    """
+    Like /generate, but tokens are relayed as Server-Sent Events as they arrive.
+    The email streams first; with `feedback`, the critique follows as
+    feedback_token / feedback_done events.
+    """
+    tone = req.tone or "professional"
+    feedback = req.feedback if req.feedback is not None else True
+    budget: dict = {}
+    prompt = generation.render_prompt(pitch_template, req.startup, req.investor, tone, budget)
+    max_tokens = generation.pitch_budget(prompt, budget, req.max_tokens)
+    return StreamingResponse(
+        generation.stream_pitch_events(prompt, feedback, fresh=bool(req.fresh), max_tokens=max_tokens, budget=budget),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    prompt += f"\n\nWrite the email in a {tone} tone."
-    if feedback:
-        prompt += ("\n---\n\nHow to make this email more effective?\n\n"
-                   "Please focus on the email's content and structure. Avoid suggesting specific changes to the subject line or sender name.\n\n"
-                   "1. Is the 1-liner hook effective in grabbing the investor's attention?\n"
-                   "2. Is the explanation of why the investor is a fit for the startup clear and concise?\n"
-                   "3. Is the unique tech explained in a way that resonates with the investor's interests and investments?\n"
-                   "4. Is the breakdown of how the funding will be used clear and specific?\n"
-                   "5. Is the call-to-action clear and direct?\n\n"
-                   "Please provide constructive feedback and suggestions for improvement.")
-    api_key = os.getenv("TOGETHER_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="Together API key not set.")
-    url = "https://api.together.xyz/v1/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "model": "meta-llama/Llama-3-8b-chat-hf",
-        "prompt": prompt,
-        "max_tokens": 700,
-        "temperature": 0.7
-    }
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, headers=headers, json=payload)
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail=f"Together API error: {response.text}")
-        data = response.json()
-        return {"result": data.get("choices", [{}])[0].get("text", "")}
+
+@app.get("/generation/stats")
+def generation_stats():
+    return {"ttft": generation.ttft_stats(), "completion_cache": generation.cache_stats()}
+
+@app.post("/generate_batch")
+async def generate_batch(req: BatchPitchRequest):
+    """
+    Pitch one startup to many investors. Completions run concurrently under the
+    shared Together limits (see upstream.py) and each pitch is streamed back as an NDJSON
+    line, tagged with its investor and carrying progress and per-item latency.
+    With `feedback`, each email's critique starts once that email is done and
+    arrives as its own line ("phase": "feedback"), so no email waits for one.
+    """
+    tone = req.tone or "professional"
+    feedback = req.feedback if req.feedback is not None else True
+    fresh = bool(req.fresh)
+    concurrency = min(req.concurrency or generation.TOGETHER_MAX_CONCURRENCY, len(req.investors) or 1)
+    # The startup half of the prompt is bound once and reused for every investor
+    startup_template = generation.bind_startup(pitch_template, req.startup)
+
+    async def generate_one(investor: InvestorInfo):
+        budget: dict = {}
+        prompt = generation.render_prompt(startup_template, None, investor, tone, budget)
+        max_tokens = generation.pitch_budget(prompt, budget, req.max_tokens)
+        pitch = await generation.complete_phase("pitch", prompt, max_tokens, fresh=fresh)
+        return {**pitch, "budget": generation.budget_summary(budget)}
+
+    async def critique(index: int, pitch: str, lines: asyncio.Queue, counts: dict) -> None:
+        line = {"index": index, "phase": "feedback"}
+        try:
+            prompt = generation.render_feedback_prompt(pitch)
+            result = await generation.complete_phase("feedback", prompt,
+                                                     generation.feedback_budget(prompt),
+                                                     fresh=fresh)
+            line.update(status="ok", feedback=result["text"], cached=result["cached"], ms=result["ms"],
+                        tokens=result["tokens"])
+            counts["ok"] += 1
+        except HTTPException as e:
+            line.update(status="error", status_code=e.status_code, error=str(e.detail))
+            counts["failed"] += 1
+        except Exception as e:
+            line.update(status="error", status_code=500, error=repr(e))
+            counts["failed"] += 1
+        await lines.put(line)
+
+    async def stream():
+        start = time.perf_counter()
+        total = len(req.investors)
+        completed = failed = 0
+        slowest = 0.0
+        lines: asyncio.Queue = asyncio.Queue()
+        critiques = set()
+        feedback_counts = {"ok": 0, "failed": 0}
+        tokens = {"prompt": 0, "completion": 0, "compacted": 0}  # pitch phase totals, cached calls included
+
+        async def produce():
+            nonlocal completed, failed, slowest
+            try:
+                async for outcome in run_bounded(req.investors, generate_one, concurrency):
+                    completed += 1
+                    slowest = max(slowest, outcome.ms)
+                    line = {
+                        "index": outcome.index,
+                        "phase": "pitch",
+                        "investor": {"name": outcome.item.name, "linkedin": outcome.item.linkedin},
+                        "ms": outcome.ms,
+                        "progress": {"completed": completed, "total": total},
+                    }
+                    if outcome.ok:
+                        line.update(status="ok", result=outcome.result["text"], cached=outcome.result["cached"],
+                                    tokens=outcome.result["tokens"], budget=outcome.result["budget"])
+                        tokens["prompt"] += outcome.result["tokens"]["prompt"] or 0
+                        tokens["completion"] += outcome.result["tokens"]["completion"] or 0
+                        tokens["compacted"] += outcome.result["budget"]["compacted_tokens"]
+                        if feedback and outcome.result["text"]:
+                            critiques.add(asyncio.create_task(
+                                critique(outcome.index, outcome.result["text"], lines, feedback_counts)))
+                    else:
+                        failed += 1
+                        line.update(status="error", status_code=outcome.status_code, error=outcome.error)
+                    await lines.put(line)
+                pitches_ms = round((time.perf_counter() - start) * 1000, 1)
+                await asyncio.gather(*critiques)
+                return pitches_ms
+            finally:
+                await lines.put(None)  # ends the stream below
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                line = await lines.get()
+                if line is None:
+                    break
+                yield ndjson(line)
+        finally:
+            producer.cancel()
+            for task in critiques:
+                task.cancel()
+        summary = {"total": total, "ok": completed - failed, "failed": failed, "slowest_ms": slowest,
+                   "pitches_ms": producer.result(), "ms": round((time.perf_counter() - start) * 1000, 1),
+                   "tokens": tokens}
+        if feedback:
+            summary["feedback"] = feedback_counts
+        yield ndjson({"summary": summary})
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+# Background job kinds: the request model a job's payload must match and the endpoint that runs it
+JOB_KINDS = {
+    "generate": (PitchRequest, generate_pitch),
+    "feedback": (FeedbackRequest, generate_feedback),
+    "enrich": (InvestorEnrichRequest, enrich_investor),
+    "auto_enrich": (AutoEnrichRequest, auto_enrich_investor),
+}
+for _kind, (_model, _endpoint) in JOB_KINDS.items():
+    job_queue.register(_kind, lambda payload, model=_model, endpoint=_endpoint: endpoint(model(**payload)))
+
+@app.post("/jobs")
+async def submit_job(req: JobRequest):
+    """
+    Queue a generation or enrichment job and return its id at once; see jobs.py.
+    An identical job that is queued, running or finished is shared instead of run again.
+    """
+    if req.kind not in JOB_KINDS:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind {req.kind!r}; choose from {', '.join(JOB_KINDS)}.")
+    model, _ = JOB_KINDS[req.kind]
+    try:
+        payload = model(**req.payload)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    fresh = bool(getattr(payload, "fresh", False) or getattr(payload, "no_cache", False))
+    return await job_queue.submit(req.kind, payload.model_dump(), req.priority or 0, fresh=fresh)
+
+@app.get("/jobs/stats")
+async def job_stats():
+    return await job_queue.stats()
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+    """The job's status, and its result once done. `wait` long-polls up to that many seconds for it to finish."""
+    job = await job_queue.wait(job_id, min(max(wait, 0.0), MAX_WAIT))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-Sent Events: one event per status or queue position change, named after the status."""
+    if await job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    async def stream():
+        async for job in job_queue.watch(job_id):
+            yield generation.sse_event(job["status"], job)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = await job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
 
 if __name__ == "__main__":
     import uvicorn
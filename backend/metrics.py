@@ -0,0 +1,281 @@
+"""
+Request timing spans and Prometheus metrics.
+
+Every request gets a timeline (a context variable, so tasks spawned while
+handling it add to the same one). Code marks its work with:
+  span(name)                        an internal stage, e.g. prompt rendering
+  upstream_call(provider, op)       one call to SerpAPI, Proxycurl, Together or
+                                    a scraped page; set `.status` on the
+                                    returned handle to count HTTP errors
+Each finished span is added to the timeline and to the histograms below.
+
+MetricsMiddleware exposes the timeline as a Server-Timing response header,
+covering the stages that finished before the headers were sent; streamed
+bodies finish later. It records per-endpoint latency, status and in-flight
+counts, and logs the full timeline of a sample of slow requests.
+render() produces the Prometheus text format served at /metrics.
+
+Settings (environment variables):
+  SLOW_REQUEST_MS           requests slower than this are slow (default 1000)
+  SLOW_REQUEST_LOG_SAMPLE   fraction of slow requests logged (default 0.1)
+"""
+import contextvars
+import json
+import logging
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from config import env_float
+
+logger = logging.getLogger(__name__)
+
+SLOW_REQUEST_MS = env_float("SLOW_REQUEST_MS", 1000.0)
+SLOW_REQUEST_LOG_SAMPLE = env_float("SLOW_REQUEST_LOG_SAMPLE", 0.1)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+MAX_TIMELINE_SPANS = 500
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _label_text(self, values: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{k}="{_escape(str(v))}"' for k, v in zip(self.labels, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self.values.items())
+        return super().render() + [f"{self.name}{self._label_text(k)} {v:g}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float) -> None:
+        with self._lock:
+            self.values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        self.values: Dict[Tuple[str, ...], list] = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, *labels: str, value: float) -> None:
+        with self._lock:
+            row = self.values.get(labels)
+            if row is None:
+                row = self.values[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self.values.items())
+        lines = super().render()
+        for labels, row in items:
+            bounds = [f'le="{bound:g}"' for bound in self.buckets] + ['le="+Inf"']
+            for bound, count in zip(bounds, row[:len(self.buckets)] + [row[-1]]):
+                lines.append(f"{self.name}_bucket{self._label_text(labels, bound)} {count}")
+            lines.append(f"{self.name}_sum{self._label_text(labels)} {row[-2]:.6f}")
+            lines.append(f"{self.name}_count{self._label_text(labels)} {row[-1]}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+HTTP_REQUESTS = Counter("http_requests_total", "Requests handled, by endpoint, method and status.",
+                        ("endpoint", "method", "status"))
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "Request latency until the last body byte.",
+                         ("endpoint", "method"))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled.", ("endpoint",))
+UPSTREAM_LATENCY = Histogram("upstream_request_duration_seconds", "Upstream call latency.",
+                             ("provider", "operation"))
+UPSTREAM_ERRORS = Counter("upstream_errors_total", "Failed upstream calls, by HTTP status or exception.",
+                          ("provider", "operation", "kind"))
+UPSTREAM_IN_FLIGHT = Gauge("upstream_requests_in_flight", "Upstream calls currently open.", ("provider",))
+UPSTREAM_RETRIES = Counter("upstream_retries_total", "Upstream calls retried, by reason.", ("provider", "reason"))
+UPSTREAM_REJECTED = Counter("upstream_rejected_total", "Calls failed fast by an open circuit breaker.", ("provider",))
+UPSTREAM_CONCURRENCY_LIMIT = Gauge("upstream_concurrency_limit", "Current adaptive concurrency limit.", ("provider",))
+UPSTREAM_CIRCUIT_STATE = Gauge("upstream_circuit_state", "Circuit breaker state: 0 closed, 1 half-open, 2 open.",
+                               ("provider",))
+STAGE_LATENCY = Histogram("stage_duration_seconds", "Internal stage latency.", ("stage",))
+LLM_PROMPT_TOKENS = Counter("llm_prompt_tokens_total", "Prompt tokens sent to the LLM provider.", ("model",))
+LLM_COMPLETION_TOKENS = Counter("llm_completion_tokens_total", "Completion tokens generated upstream.", ("model",))
+PROMPT_TOKENS_COMPACTED = Counter("llm_prompt_tokens_compacted_total",
+                                  "Estimated prompt tokens removed by budgeting, by step (dedupe or trim).", ("step",))
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def record_tokens(model: str, usage: dict) -> None:
+    """Count the token usage Together reported for one completion."""
+    LLM_PROMPT_TOKENS.inc(model, amount=usage.get("prompt_tokens") or 0)
+    LLM_COMPLETION_TOKENS.inc(model, amount=usage.get("completion_tokens") or 0)
+
+
+# --- request timelines ---
+class Timeline:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: List[Tuple[str, float, float]] = []  # (name, start offset ms, duration ms)
+
+    def add(self, name: str, started: float, ended: float) -> None:
+        if len(self.spans) < MAX_TIMELINE_SPANS:
+            self.spans.append((name, (started - self.start) * 1000, (ended - started) * 1000))
+
+    def server_timing(self) -> str:
+        """Spans so far, summed per name, plus the elapsed total, as a Server-Timing value."""
+        totals: Dict[str, List[float]] = {}
+        for name, _, duration in self.spans:
+            entry = totals.setdefault(name, [0.0, 0])
+            entry[0] += duration
+            entry[1] += 1
+        parts = []
+        for name, (duration, count) in totals.items():
+            token = re.sub(r"[^A-Za-z0-9_.\-]", "_", name)
+            parts.append(f'{token};dur={duration:.1f}' + (f';desc="x{count}"' if count > 1 else ""))
+        parts.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_timeline: contextvars.ContextVar[Optional[Timeline]] = contextvars.ContextVar("timeline", default=None)
+
+
+def _finish(name: str, started: float) -> float:
+    ended = time.perf_counter()
+    timeline = _timeline.get()
+    if timeline is not None:
+        timeline.add(name, started, ended)
+    return ended - started
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.observe(name, value=_finish(name, started))
+
+
+class UpstreamCall:
+    status: Optional[int] = None
+
+
+@contextmanager
+def upstream_call(provider: str, operation: str) -> Iterator[UpstreamCall]:
+    call = UpstreamCall()
+    UPSTREAM_IN_FLIGHT.inc(provider)
+    started = time.perf_counter()
+    try:
+        yield call
+    except BaseException as e:
+        UPSTREAM_ERRORS.inc(provider, operation, type(e).__name__)
+        raise
+    else:
+        if call.status is not None and call.status >= 400:
+            UPSTREAM_ERRORS.inc(provider, operation, str(call.status))
+    finally:
+        UPSTREAM_IN_FLIGHT.dec(provider)
+        UPSTREAM_LATENCY.observe(provider, operation, value=_finish(f"{provider}.{operation}", started))
+
+
+# --- middleware ---
+def _endpoint(scope) -> str:
+    from starlette.routing import Match
+
+    for route in getattr(scope.get("app"), "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware: request metrics, the Server-Timing header and sampled slow-request logs."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        endpoint = _endpoint(scope)
+        method = scope["method"]
+        timeline = Timeline()
+        token = _timeline.set(timeline)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timeline.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(endpoint)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            HTTP_IN_FLIGHT.dec(endpoint)
+            _timeline.reset(token)
+            elapsed = time.perf_counter() - timeline.start
+            HTTP_REQUESTS.inc(endpoint, method, str(status))
+            HTTP_LATENCY.observe(endpoint, method, value=elapsed)
+            if elapsed * 1000 >= SLOW_REQUEST_MS and random.random() < SLOW_REQUEST_LOG_SAMPLE:
+                logger.warning("Slow request %s %s (%s) took %.0f ms: %s", method, scope["path"], status,
+                               elapsed * 1000, json.dumps([
+                                   {"span": name, "start_ms": round(offset, 1), "ms": round(duration, 1)}
+                                   for name, offset, duration in timeline.spans
+                               ]))
@@ -0,0 +1,60 @@
+"""
+Precompiled prompt templates.
+
+A CompiledTemplate takes a `{name}`-style template (the f-string format
+LangChain's PromptTemplate uses) and splits it once into literal text and
+field names. Rendering is then a single join, and the output is
+byte-identical to PromptTemplate.format for the same template and values.
+partial() folds bound values into the literals, so a template with the
+startup fields pre-filled renders only the investor fields per call.
+
+Only plain `{name}` fields are supported. Format specs and conversions
+(`{name:>10}`, `{name!r}`) raise ValueError at compile time.
+"""
+from string import Formatter
+from typing import List, Optional, Sequence, Tuple, Union
+
+Piece = Union[str, Tuple[str]]  # literal text, or (field name,)
+
+
+class CompiledTemplate:
+    def __init__(self, template: str, input_variables: Optional[Sequence[str]] = None):
+        pieces: List[Piece] = []
+        for literal, field, spec, conversion in Formatter().parse(template):
+            if literal:
+                pieces.append(literal)
+            if field is None:
+                continue
+            if not field or spec or conversion:
+                raise ValueError(f"Unsupported template field {{{field}}}; only plain named fields are allowed.")
+            pieces.append((field,))
+        self.template = template
+        self.input_variables = list(input_variables or dict.fromkeys(p[0] for p in pieces if isinstance(p, tuple)))
+        self._pieces = self._merge(pieces)
+
+    @staticmethod
+    def _merge(pieces: List[Piece]) -> List[Piece]:
+        merged: List[Piece] = []
+        for piece in pieces:
+            if isinstance(piece, str) and merged and isinstance(merged[-1], str):
+                merged[-1] += piece
+            else:
+                merged.append(piece)
+        return merged
+
+    def partial(self, **values: str) -> "CompiledTemplate":
+        """A copy with `values` rendered into the literal text."""
+        bound = object.__new__(CompiledTemplate)
+        bound.template = self.template
+        bound.input_variables = [name for name in self.input_variables if name not in values]
+        bound._pieces = self._merge([
+            str(values[piece[0]]) if isinstance(piece, tuple) and piece[0] in values else piece
+            for piece in self._pieces
+        ])
+        return bound
+
+    def format(self, **values: str) -> str:
+        try:
+            return "".join(piece if isinstance(piece, str) else str(values[piece[0]]) for piece in self._pieces)
+        except KeyError as e:
+            raise KeyError(f"Missing template variable {e.args[0]!r}") from None
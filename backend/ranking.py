@@ -0,0 +1,222 @@
+"""
+Investor-startup fit ranking with TF-IDF and cosine similarity in NumPy.
+
+Each investor field that the pitch prompt uses for matching (bio, interests,
+notable_investments) is tokenized once, when the profile is added, into
+term ids and sublinear term frequencies. Per field, all investors live in
+one sparse matrix held as flat NumPy arrays (row of each entry, term id,
+tf). IDF weights and L2-normalised document weights are rebuilt only after
+the corpus changes, so ranking a startup is one gather and one bincount per
+field over the non-zero entries, with no Python loop per investor.
+
+The startup's niche, traction and goals form the query. Each field's cosine
+similarity is reported, and the fit score is their weighted sum
+(FIELD_WEIGHTS).
+
+Adding a profile for an investor that is already known replaces the old
+row; the old row is masked out and dropped at the next compaction.
+"""
+import math
+from array import array
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from search_index import search_index, tokenize
+
+FIELD_WEIGHTS = {
+    "interests": 0.4,
+    "bio": 0.35,
+    "notable_investments": 0.25,
+}
+STARTUP_QUERY_FIELDS = ("niche", "traction", "goals")
+PROFILE_FIELDS = ("name", "bio", "interests", "linkedin", "notable_investments", "location")
+COMPACT_DEAD_FRACTION = 0.1  # drop replaced rows once they make up this share of the corpus
+
+
+def _term_frequencies(tokens: List[str]) -> Dict[str, float]:
+    return {term: 1.0 + math.log(count) for term, count in Counter(tokens).items()}
+
+
+class _FieldMatrix:
+    """One field's term weights for every row, appended per row and compacted on demand."""
+
+    def __init__(self):
+        self.pending_rows = array("q")
+        self.pending_terms = array("q")
+        self.pending_tf = array("d")
+        self.rows = np.zeros(0, dtype=np.int64)
+        self.terms = np.zeros(0, dtype=np.int64)
+        self.tf = np.zeros(0, dtype=np.float64)
+        # Rebuilt after changes
+        self.idf: Optional[np.ndarray] = None
+        self.present: Optional[np.ndarray] = None
+        self.weights: Optional[np.ndarray] = None
+
+    def append(self, row: int, term_ids: List[int], tf: List[float]) -> None:
+        self.pending_rows.extend([row] * len(term_ids))
+        self.pending_terms.extend(term_ids)
+        self.pending_tf.extend(tf)
+
+    def compact(self, alive: np.ndarray, remap: Optional[np.ndarray]) -> None:
+        if self.pending_rows:
+            self.rows = np.concatenate([self.rows, np.frombuffer(self.pending_rows, dtype=np.int64)])
+            self.terms = np.concatenate([self.terms, np.frombuffer(self.pending_terms, dtype=np.int64)])
+            self.tf = np.concatenate([self.tf, np.frombuffer(self.pending_tf, dtype=np.float64)])
+            self.pending_rows, self.pending_terms, self.pending_tf = array("q"), array("q"), array("d")
+        if remap is not None:
+            keep = alive[self.rows]
+            self.rows = remap[self.rows[keep]]
+            self.terms = self.terms[keep]
+            self.tf = self.tf[keep]
+
+    def prepare(self, alive: np.ndarray, vocab_size: int) -> None:
+        live = alive[self.rows]
+        df = np.bincount(self.terms[live], minlength=vocab_size)
+        self.idf = np.log((1.0 + alive.sum()) / (1.0 + df)) + 1.0
+        self.present = df > 0
+        weights = np.where(live, self.tf * self.idf[self.terms], 0.0)
+        norms = np.sqrt(np.bincount(self.rows, weights=weights * weights, minlength=len(alive)))
+        norms[norms == 0] = 1.0
+        self.weights = weights / norms[self.rows]
+
+    def cosine(self, query_terms: Dict[int, float], n_rows: int, vocab_size: int) -> np.ndarray:
+        if not query_terms or not len(self.terms):
+            return np.zeros(n_rows)
+        query = np.zeros(vocab_size)
+        ids = np.fromiter(query_terms.keys(), dtype=np.int64)
+        tf = np.fromiter(query_terms.values(), dtype=np.float64)
+        # Terms this field never uses cannot match; leaving them out keeps field scores comparable
+        seen = self.present[ids]
+        query[ids[seen]] = tf[seen] * self.idf[ids[seen]]
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return np.zeros(n_rows)
+        return np.bincount(self.rows, weights=self.weights * query[self.terms], minlength=n_rows) / norm
+
+
+class FitRanker:
+    def __init__(self, seed: Optional[Callable[[], Iterable[dict]]] = None):
+        self._seed = seed
+        self._lock = threading.Lock()
+        self.vocab: Dict[str, int] = {}
+        self.keys: List[str] = []
+        self.profiles: List[dict] = []
+        self.row_of: Dict[str, int] = {}
+        self._alive: List[bool] = []
+        self.fields = {field: _FieldMatrix() for field in FIELD_WEIGHTS}
+        self._dirty = True
+        self._dead = 0
+        self._alive_mask = np.zeros(0, dtype=bool)
+
+    def _term_id(self, term: str) -> int:
+        term_id = self.vocab.get(term)
+        if term_id is None:
+            term_id = self.vocab[term] = len(self.vocab)
+        return term_id
+
+    def _add(self, key: str, profile: dict) -> None:
+        old = self.row_of.get(key)
+        if old is not None:
+            self._alive[old] = False
+            self._dead += 1
+        row = len(self.keys)
+        self.keys.append(key)
+        self.profiles.append({field: profile.get(field) or "" for field in PROFILE_FIELDS})
+        self.row_of[key] = row
+        self._alive.append(True)
+        for field, matrix in self.fields.items():
+            tf = _term_frequencies(tokenize(profile.get(field) or ""))
+            matrix.append(row, [self._term_id(term) for term in tf], list(tf.values()))
+        self._dirty = True
+
+    def add(self, profile: dict, key: Optional[str] = None) -> None:
+        """Add or replace one investor. `key` defaults to the LinkedIn URL, then the name."""
+        key = key or profile.get("linkedin") or profile.get("name") or ""
+        if not key:
+            return
+        with self._lock:
+            self._add(key, profile)
+
+    def add_many(self, profiles: Iterable[dict]) -> None:
+        with self._lock:
+            for profile in profiles:
+                key = profile.get("linkedin") or profile.get("name") or ""
+                if key:
+                    self._add(key, profile)
+
+    def _ensure_seeded(self) -> None:
+        if self._seed is not None:
+            seed, self._seed = self._seed, None
+            for profile in seed():
+                key = profile.get("linkedin") or profile.get("name") or ""
+                # Profiles added since startup are at least as fresh as the stored copy
+                if key and key not in self.row_of:
+                    self._add(key, profile)
+
+    def _prepare(self) -> None:
+        if not self._dirty:
+            return
+        alive = np.asarray(self._alive, dtype=bool)
+        remap = None
+        if self._dead > COMPACT_DEAD_FRACTION * len(self.keys):
+            remap = np.cumsum(alive) - 1
+            self.keys = [k for k, a in zip(self.keys, self._alive) if a]
+            self.profiles = [p for p, a in zip(self.profiles, self._alive) if a]
+            self.row_of = {key: row for row, key in enumerate(self.keys)}
+            self._alive = [True] * len(self.keys)
+            self._dead = 0
+        for matrix in self.fields.values():
+            matrix.compact(alive, remap)
+        self._alive_mask = np.asarray(self._alive, dtype=bool)
+        for matrix in self.fields.values():
+            matrix.prepare(self._alive_mask, len(self.vocab))
+        self._dirty = False
+
+    def rank(self, startup, top_k: int = 10) -> dict:
+        """
+        Score every investor against `startup` (anything with niche, traction
+        and goals attributes) and return the best `top_k`, each with its
+        per-field cosine similarities.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            self._ensure_seeded()
+            self._prepare()
+            n_rows = len(self.keys)
+            tokens = []
+            for field in STARTUP_QUERY_FIELDS:
+                tokens += tokenize(getattr(startup, field, "") or "")
+            query_terms = {self.vocab[t]: w for t, w in _term_frequencies(tokens).items() if t in self.vocab}
+            breakdown = {
+                field: matrix.cosine(query_terms, n_rows, len(self.vocab))
+                for field, matrix in self.fields.items()
+            }
+            scores = np.zeros(n_rows)
+            for field, weight in FIELD_WEIGHTS.items():
+                scores += weight * breakdown[field]
+            scores[~self._alive_mask] = -np.inf
+            total = n_rows - self._dead
+            k = min(top_k, total)
+            top = np.argpartition(-scores, k - 1)[:k] if k else np.zeros(0, dtype=np.int64)
+            top = top[np.argsort(-scores[top], kind="stable")]
+            results = [
+                {
+                    "investor": self.profiles[row],
+                    "score": round(float(scores[row]), 4),
+                    "fields": {field: round(float(values[row]), 4) for field, values in breakdown.items()},
+                }
+                for row in top
+            ]
+        return {"results": results, "total": total, "ms": round((time.perf_counter() - start) * 1000, 1)}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"investors": len(self.keys) - self._dead, "vocabulary": len(self.vocab)}
+
+
+# Seeded from the enriched profiles in the search index on first use
+fit_ranker = FitRanker(seed=search_index.profiles)
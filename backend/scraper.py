@@ -1,20 +1,46 @@
 import sys
 import json
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
-from bs4 import BeautifulSoup
+
+from extraction import get_extractor
+from snapshots import snapshot_store
+
+PROFILE_SELECTOR = "h1.profile-name"
+
+
+class ScrapeError(Exception):
+    """Raised when a Crunchbase page could not be loaded. Carries whatever HTML was captured."""
+
+    def __init__(self, message: str, content: str = None):
+        super().__init__(message)
+        self.content = content
+
+
+def parse_profile(content: str, backend: str = None) -> dict:
+    """
+    Extracts investor data from a Crunchbase profile page's HTML.
+    `backend` picks the extraction engine (see extraction.py); all engines return the same dict.
+    """
+    return get_extractor(backend)(content)
+
 
 def scrape_crunchbase_profile(url: str) -> dict:
     """
     Scrapes a Crunchbase profile URL and returns a dictionary of investor data.
-    Saves the HTML to debug_crunchbase.html for debugging.
+    Stores the captured HTML in the snapshot store for debugging and offline re-parsing.
+    Raises ScrapeError if the page does not load.
+
+    Each call launches its own browser; inside the backend use the warm
+    pool in browser_pool.py instead.
     """
+    from playwright.sync_api import sync_playwright  # only the CLI path needs it; keeps imports light
+
     with sync_playwright() as p:
         browser = p.chromium.launch()
         page = browser.new_page()
         content = None
         try:
             page.goto(url, timeout=30000)
-            page.wait_for_selector('h1.profile-name', timeout=15000)
+            page.wait_for_selector(PROFILE_SELECTOR, timeout=15000)
             content = page.content()
         except Exception as e:
             # Try to get the page content even on error
@@ -23,39 +49,25 @@ def scrape_crunchbase_profile(url: str) -> dict:
             except Exception:
                 content = None
             if content:
-                with open("debug_crunchbase.html", "w", encoding="utf-8") as f:
-                    f.write(content)
-            print(json.dumps({"error": f"Scraping failed: {repr(e)}"}), file=sys.stderr)
-            sys.exit(1)
+                snapshot_store.save(url, content, "error")
+            raise ScrapeError(f"Scraping failed: {repr(e)}", content) from e
         finally:
             browser.close()
 
     if content:
-        with open("debug_crunchbase.html", "w", encoding="utf-8") as f:
-            f.write(content)
-
-    soup = BeautifulSoup(content, "html.parser")
-    
-    name_tag = soup.select_one("h1.profile-name")
-    name = name_tag.text.strip() if name_tag else "Investor"
+        snapshot_store.save(url, content, "ok")
 
-    bio_tag = soup.select_one("div.description-text > span")
-    bio = bio_tag.text.strip() if bio_tag else "Not specified"
-
-    interests_tags = soup.select('a.chip')
-    interests = ", ".join([tag.text.strip() for tag in interests_tags]) or "Not specified"
-
-    return {
-        "name": name,
-        "bio": bio,
-        "interests": interests
-    }
+    return parse_profile(content)
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print(json.dumps({"error": "No URL provided"}), file=sys.stderr)
         sys.exit(1)
-    
+
     profile_url = sys.argv[1]
-    data = scrape_crunchbase_profile(profile_url)
-    print(json.dumps(data)) 
\ No newline at end of file
+    try:
+        data = scrape_crunchbase_profile(profile_url)
+    except ScrapeError as e:
+        print(json.dumps({"error": str(e)}), file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(data))
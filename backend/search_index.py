@@ -0,0 +1,326 @@
+"""
+Local full-text index of investors we have already seen.
+
+Every LinkedIn/Crunchbase hit returned by /search_investors and every
+enriched profile is stored as one document per profile URL. The fields
+below are tokenized and ranked with BM25, each field's term counts scaled by
+its weight:
+  name, snippet, bio, interests, notable_investments, location, crunchbase_bio
+
+/search_investors asks this index first and only calls SerpAPI for a source
+(LinkedIn or Crunchbase) that has too few local hits. A document matches
+only if it contains every meaningful query term: stopwords and words that
+every investor profile shares ("investor", "linkedin", "site", ...) are
+ignored, so a query made only of those goes to SerpAPI.
+
+Documents are upserted as fresh results and enrichments arrive, on a worker
+thread (write_in_background) so request handlers never wait on SQLite, and
+a document whose fields did not change is not rewritten. A write updates
+the in-memory index under the index lock and queues the changed rows; they
+are committed to SQLite, in order, after that lock is released, so searches
+never wait on the disk. Each document's
+weighted term counts are stored next to it in SQLite, so loading only
+rebuilds the postings and never re-tokenizes. BM25 length norms are kept
+per document and only all recomputed once the average document length has
+moved by NORM_REBUILD_DRIFT.
+
+Settings (environment variables):
+  SEARCH_INDEX_PATH       SQLite file (default search_index.sqlite3)
+  LOCAL_SEARCH_ENABLED    set to 0 to always use SerpAPI (default 1)
+  LOCAL_SEARCH_MIN_HITS   local hits a source needs to skip SerpAPI for it;
+                          0 means the request's num_results (default 0)
+"""
+import asyncio
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from config import env_flag, env_int
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", "search_index.sqlite3")
+LOCAL_SEARCH_ENABLED = env_flag("LOCAL_SEARCH_ENABLED", True)
+LOCAL_SEARCH_MIN_HITS = env_int("LOCAL_SEARCH_MIN_HITS", 0)
+
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "snippet": 1.0,
+    "bio": 1.0,
+    "interests": 2.0,
+    "notable_investments": 1.5,
+    "location": 1.0,
+    "crunchbase_bio": 1.0,
+}
+BM25_K1 = 1.2
+BM25_B = 0.75
+NORM_REBUILD_DRIFT = 0.05  # relative change of the average length that recomputes every norm
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "in", "is",
+    "it", "its", "of", "on", "or", "that", "the", "to", "was", "with",
+}
+# Query words that nearly every indexed profile matches; they say nothing about fit
+QUERY_STOPWORDS = {
+    "investor", "investing", "investment", "invest", "vc", "venture", "capital", "profile", "person",
+    "linkedin", "crunchbase", "site", "com", "www", "http", "https",
+}
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords; a trailing plural "s" is dropped."""
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def result_source(url: str) -> Optional[str]:
+    """Which /search_investors list a URL belongs to, if any."""
+    if "linkedin.com/in" in url:
+        return "linkedin"
+    if "crunchbase.com" in url:
+        return "crunchbase"
+    return None
+
+
+def _weighted_terms(fields: Dict[str, str]) -> Counter:
+    terms: Counter = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in tokenize(fields.get(field) or ""):
+            terms[token] += weight
+    return terms
+
+
+class SearchIndex:
+    def __init__(self, path: str = SEARCH_INDEX_PATH):
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()  # the in-memory index
+        self._write_lock = threading.Lock()  # SQLite writes; never taken while holding _lock
+        self._unwritten: List[tuple] = []  # rows indexed in memory, not yet in SQLite
+        self._loaded = False
+        self.docs: Dict[str, dict] = {}  # url -> {"source", "title", "fields"}; fields stay JSON until needed
+        self.doc_terms: Dict[str, Dict[str, float]] = {}
+        self.doc_len: Dict[str, float] = {}
+        self.postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self.total_len = 0.0
+        self._norms: Dict[str, float] = {}  # BM25 length normalisation, relative to _norm_avg
+        self._norm_avg = 0.0  # the average document length _norms was computed with
+        self._pending: Set[asyncio.Task] = set()
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.executescript(
+                "PRAGMA journal_mode=WAL;"
+                "PRAGMA synchronous=NORMAL;"
+                "CREATE TABLE IF NOT EXISTS docs ("
+                " url TEXT PRIMARY KEY, source TEXT NOT NULL, title TEXT NOT NULL,"
+                " fields TEXT NOT NULL, terms TEXT NOT NULL, updated_at REAL NOT NULL);"
+            )
+        return self._db
+
+    def load(self) -> int:
+        """Read every stored document into memory. Returns the document count."""
+        with self._lock:
+            self._load()
+            return len(self.docs)
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        for url, source, title, fields, terms in self._conn().execute(
+            "SELECT url, source, title, fields, terms FROM docs"
+        ):
+            self._index(url, {"source": source, "title": title, "fields": fields}, json.loads(terms))
+        self._loaded = True
+
+    def _index(self, url: str, doc: dict, terms: Dict[str, float]) -> None:
+        self._unindex(url)
+        self.docs[url] = doc
+        self.doc_terms[url] = terms
+        length = sum(terms.values())
+        self.doc_len[url] = length
+        self.total_len += length
+        if self._norm_avg:
+            self._norms[url] = self._norm(length)
+        for term, tf in terms.items():
+            self.postings[term][url] = tf
+
+    def _unindex(self, url: str) -> None:
+        old = self.doc_terms.pop(url, None)
+        if old is None:
+            return
+        self.total_len -= self.doc_len.pop(url, 0.0)
+        self._norms.pop(url, None)
+        for term in old:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(url, None)
+                if not posting:
+                    del self.postings[term]
+
+    def _upsert(self, url: str, source: str, title: str, updates: Dict[str, str]) -> Optional[tuple]:
+        """Index the merged document and return its row, or None if nothing changed."""
+        current = self.docs.get(url)
+        fields = dict(self._fields(current)) if current else {}
+        # Never overwrite a known value with an empty one
+        fields.update({k: v for k, v in updates.items() if v})
+        doc = {"source": source, "title": title or (current or {}).get("title") or fields.get("name", ""), "fields": fields}
+        if current is not None and (current["source"], current["title"], current["fields"]) == (
+                source, doc["title"], fields):
+            return None
+        terms = dict(_weighted_terms(fields))
+        self._index(url, doc, terms)
+        return url, source, doc["title"], json.dumps(fields), json.dumps(terms), time.time()
+
+    @staticmethod
+    def _fields(doc: dict) -> Dict[str, str]:
+        if isinstance(doc["fields"], str):
+            doc["fields"] = json.loads(doc["fields"])
+        return doc["fields"]
+
+    def _norm(self, length: float) -> float:
+        return BM25_K1 * (1 - BM25_B + BM25_B * length / self._norm_avg)
+
+    def _doc_norms(self) -> Dict[str, float]:
+        avg_len = self.total_len / len(self.docs)
+        if abs(avg_len - self._norm_avg) > NORM_REBUILD_DRIFT * self._norm_avg:
+            self._norm_avg = avg_len
+            self._norms = {url: self._norm(length) for url, length in self.doc_len.items()}
+        return self._norms
+
+    def _write(self) -> None:
+        """Commit the queued rows in the order they were indexed. Called without _lock."""
+        with self._write_lock:
+            with self._lock:
+                rows, self._unwritten = self._unwritten, []
+            if rows:
+                conn = self._conn()
+                conn.executemany("INSERT OR REPLACE INTO docs VALUES (?, ?, ?, ?, ?, ?)", rows)
+                conn.commit()
+
+    def add_results(self, items: Iterable[dict]) -> None:
+        """Index SerpAPI organic results ({"title", "link", "snippet"}) that point at investor profiles."""
+        with self._lock:
+            self._load()
+            for item in items:
+                url = item.get("link", "")
+                source = result_source(url)
+                if source:
+                    title = item.get("title", "")
+                    row = self._upsert(url, source, title, {"name": title, "snippet": item.get("snippet", "")})
+                    if row is not None:
+                        self._unwritten.append(row)
+        self._write()
+
+    def add_profile(self, profile: dict) -> bool:
+        """Index an enriched investor profile under its LinkedIn URL. Returns whether the document changed."""
+        url = profile.get("linkedin") or ""
+        source = result_source(url)
+        if not source:
+            return False
+        updates = {field: profile.get(field) or "" for field in FIELD_WEIGHTS if field != "snippet"}
+        with self._lock:
+            self._load()
+            row = self._upsert(url, source, "", updates)
+            if row is None:
+                return False
+            self._unwritten.append(row)
+        self._write()
+        return True
+
+    def write_in_background(self, write: Callable, *args) -> None:
+        """Run `write(*args)`, e.g. add_results, on a worker thread so the event loop never waits on SQLite."""
+        task = asyncio.ensure_future(asyncio.to_thread(write, *args))
+        self._pending.add(task)
+        task.add_done_callback(self._written)
+
+    def _written(self, task: asyncio.Task) -> None:
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Could not update the search index: %r", task.exception())
+
+    async def flush(self) -> None:
+        """Wait for the background writes started so far."""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def search(self, query: str, limit: int) -> Dict[str, List[dict]]:
+        """
+        Up to `limit` results per source, best BM25 score first, in the
+        /search_investors shape. Documents must contain every query term
+        outside QUERY_STOPWORDS; a query with no such term finds nothing.
+        """
+        terms = list(dict.fromkeys(t for t in tokenize(query) if t not in QUERY_STOPWORDS))
+        results: Dict[str, List[dict]] = {"linkedin": [], "crunchbase": []}
+        with self._lock:
+            self._load()
+            n_docs = len(self.docs)
+            if not terms or not n_docs:
+                return results
+            if any(term not in self.postings for term in terms):
+                return results
+            norms = self._doc_norms()
+            scores: Dict[str, float] = defaultdict(float)
+            matched: Counter = Counter()
+            for term in terms:
+                posting = self.postings[term]
+                idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                weight = idf * (BM25_K1 + 1)
+                for url, tf in posting.items():
+                    scores[url] += weight * tf / (tf + norms[url])
+                    matched[url] += 1
+            by_source: Dict[str, List[tuple]] = {"linkedin": [], "crunchbase": []}
+            for url, score in scores.items():
+                if matched[url] == len(terms):
+                    by_source[self.docs[url]["source"]].append((score, url))
+            for source, hits in by_source.items():
+                for score, url in heapq.nlargest(limit, hits):
+                    doc = self.docs[url]
+                    fields = self._fields(doc)
+                    results[source].append({
+                        "title": doc["title"],
+                        "url": url,
+                        "snippet": fields.get("snippet") or fields.get("bio", ""),
+                    })
+        return results
+
+    def profiles(self) -> List[dict]:
+        """Every enriched profile (documents with more than a search snippet), its URL under "linkedin"."""
+        with self._lock:
+            self._load()
+            profiles = []
+            for url, doc in self.docs.items():
+                fields = self._fields(doc)
+                if fields.get("bio") or fields.get("interests") or fields.get("notable_investments"):
+                    profiles.append({**fields, "linkedin": url})
+            return profiles
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._load()
+            return {"documents": len(self.docs), "terms": len(self.postings)}
+
+    def close(self) -> None:
+        with self._write_lock, self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+search_index = SearchIndex()
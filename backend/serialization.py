@@ -0,0 +1,41 @@
+"""
+Fast JSON responses for endpoints that return large payloads.
+
+When an endpoint returns a plain dict, FastAPI first copies it through
+jsonable_encoder, which walks every value in Python, and then json.dumps the
+copy. For a list of a few thousand investor profiles that walk costs far
+more than the encoding itself. Endpoints that return FastJSONResponse skip
+it: the content is encoded in one pass with orjson, or with the standard
+library when orjson is not installed.
+
+The bytes are the same as Starlette's JSONResponse for the JSON types the
+endpoints return (dicts with str keys, lists, str, int, bool, None and
+rounded floats): compact separators, UTF-8 with non-ASCII kept. orjson writes
+floats below 1e-4 in positional notation (0.00001 instead of 1e-05) and NaN as
+null where the standard library raises; neither occurs in these responses.
+The content must already be JSON-native, because nothing converts dates,
+models or sets on the way.
+"""
+import json
+from typing import Any
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json produces the same bytes, only slower
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """`content` as compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """A JSONResponse rendered by dumps(); return it from an endpoint to bypass jsonable_encoder."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
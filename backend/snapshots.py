@@ -0,0 +1,237 @@
+"""
+Content-addressed, compressed store for scraped HTML pages.
+
+Each page body is stored once, zlib-compressed, under its SHA-256 content
+hash (snapshots/ab/abcd....html.z). A SQLite index records every capture:
+which URL, which content hash, when, and whether the scrape succeeded.
+Identical pages are stored once; re-capturing the same page for the same URL
+only refreshes its timestamp. When the store exceeds its size budget, the
+oldest captures are evicted, and a blob is deleted once no capture uses it.
+
+Stored pages can be re-parsed offline (e.g. after changing selectors) without
+fetching them again:
+    python snapshots.py reparse --workers 8 --backend lxml --out profiles.jsonl
+    python snapshots.py add debug_crunchbase.html --url https://www.crunchbase.com/person/example
+    python snapshots.py stats
+
+Settings (environment variables):
+  SNAPSHOT_DIR        directory for blobs and index (default snapshots)
+  SNAPSHOT_MAX_BYTES  compressed size budget (default 512 MiB)
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from typing import Callable, Iterator, List, Optional, Set, Tuple
+
+from config import env_int
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_MAX_BYTES = env_int("SNAPSHOT_MAX_BYTES", 512 * 1024 * 1024)
+
+
+def _read_blob(path: str) -> str:
+    with open(path, "rb") as f:
+        return zlib.decompress(f.read()).decode("utf-8")
+
+
+def _parse_blob(args: Tuple[str, Callable[[str], dict]]) -> dict:
+    path, parser = args
+    return parser(_read_blob(path))
+
+
+class SnapshotStore:
+    def __init__(self, root: str = SNAPSHOT_DIR, max_bytes: int = SNAPSHOT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._pending: Set[asyncio.Task] = set()
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(self.root, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(self.root, "index.sqlite3"), check_same_thread=False)
+            self._db.executescript(
+                "PRAGMA journal_mode=WAL;"
+                "CREATE TABLE IF NOT EXISTS blobs ("
+                " content_hash TEXT PRIMARY KEY, raw_bytes INTEGER NOT NULL, stored_bytes INTEGER NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS captures ("
+                " id INTEGER PRIMARY KEY, url TEXT NOT NULL, content_hash TEXT NOT NULL,"
+                " captured_at REAL NOT NULL, status TEXT NOT NULL, UNIQUE (url, content_hash));"
+                "CREATE INDEX IF NOT EXISTS captures_by_time ON captures (captured_at);"
+                "CREATE INDEX IF NOT EXISTS captures_by_hash ON captures (content_hash);"
+            )
+        return self._db
+
+    def blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.root, content_hash[:2], f"{content_hash}.html.z")
+
+    def save(self, url: str, html: str, status: str = "ok") -> str:
+        """Store a captured page and return its content hash."""
+        raw = html.encode("utf-8")
+        content_hash = hashlib.sha256(raw).hexdigest()
+        path = self.blob_path(content_hash)
+        with self._lock:
+            conn = self._conn()
+            known = conn.execute("SELECT 1 FROM blobs WHERE content_hash = ?", (content_hash,)).fetchone()
+            if not known:
+                data = zlib.compress(raw, 6)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+                conn.execute("INSERT INTO blobs VALUES (?, ?, ?)", (content_hash, len(raw), len(data)))
+            conn.execute(
+                "INSERT INTO captures (url, content_hash, captured_at, status) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (url, content_hash) DO UPDATE SET captured_at = excluded.captured_at, status = excluded.status",
+                (url, content_hash, time.time(), status),
+            )
+            self._evict(conn)
+            conn.commit()
+        return content_hash
+
+    def save_in_background(self, url: str, html: Optional[str], status: str = "ok") -> None:
+        """Queue a save on a worker thread so the scrape's hot path never waits on disk."""
+        if not html:
+            return
+        task = asyncio.ensure_future(asyncio.to_thread(self.save, url, html, status))
+        self._pending.add(task)
+        task.add_done_callback(self._saved)
+
+    def _saved(self, task: asyncio.Task) -> None:
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Could not store HTML snapshot: %r", task.exception())
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(stored_bytes), 0) FROM blobs").fetchone()[0]
+        while total > self.max_bytes:
+            oldest = conn.execute(
+                "SELECT id, content_hash FROM captures ORDER BY captured_at LIMIT 1"
+            ).fetchone()
+            if oldest is None:
+                break
+            capture_id, content_hash = oldest
+            conn.execute("DELETE FROM captures WHERE id = ?", (capture_id,))
+            if conn.execute("SELECT 1 FROM captures WHERE content_hash = ? LIMIT 1", (content_hash,)).fetchone():
+                continue
+            stored = conn.execute("SELECT stored_bytes FROM blobs WHERE content_hash = ?", (content_hash,)).fetchone()
+            conn.execute("DELETE FROM blobs WHERE content_hash = ?", (content_hash,))
+            try:
+                os.remove(self.blob_path(content_hash))
+            except FileNotFoundError:
+                pass
+            total -= stored[0] if stored else 0
+
+    def latest(self, url: str) -> Optional[str]:
+        """HTML of the most recent capture of `url`, if any."""
+        with self._lock:
+            row = self._conn().execute(
+                "SELECT content_hash FROM captures WHERE url = ? ORDER BY captured_at DESC LIMIT 1", (url,)
+            ).fetchone()
+        return _read_blob(self.blob_path(row[0])) if row else None
+
+    def captures(self, status: Optional[str] = None) -> List[Tuple[str, str, float, str]]:
+        """(url, content_hash, captured_at, status) for every capture, newest first."""
+        query = "SELECT url, content_hash, captured_at, status FROM captures"
+        params: tuple = ()
+        if status:
+            query += " WHERE status = ?"
+            params = (status,)
+        with self._lock:
+            return self._conn().execute(query + " ORDER BY captured_at DESC", params).fetchall()
+
+    def stats(self) -> dict:
+        with self._lock:
+            conn = self._conn()
+            blobs, raw, stored = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(raw_bytes), 0), COALESCE(SUM(stored_bytes), 0) FROM blobs"
+            ).fetchone()
+            captures, urls = conn.execute("SELECT COUNT(*), COUNT(DISTINCT url) FROM captures").fetchone()
+        return {"captures": captures, "urls": urls, "blobs": blobs, "raw_bytes": raw,
+                "stored_bytes": stored, "max_bytes": self.max_bytes}
+
+    def reparse(self, parser: Callable[[str], dict], status: Optional[str] = None,
+                workers: int = 0) -> Iterator[dict]:
+        """
+        Run `parser` over every stored capture and yield
+        {"url", "content_hash", "captured_at", "status", "profile"}. Each distinct
+        page is parsed once; `workers` > 1 parses in a process pool.
+        """
+        rows = self.captures(status)
+        hashes = list(dict.fromkeys(row[1] for row in rows))
+        jobs = [(self.blob_path(h), parser) for h in hashes]
+        if workers > 1:
+            from concurrent.futures import ProcessPoolExecutor  # offline tool only; multiprocessing is slow to import
+
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parsed = dict(zip(hashes, pool.map(_parse_blob, jobs, chunksize=32)))
+        else:
+            parsed = dict(zip(hashes, map(_parse_blob, jobs)))
+        for url, content_hash, captured_at, capture_status in rows:
+            yield {"url": url, "content_hash": content_hash, "captured_at": captured_at,
+                   "status": capture_status, "profile": parsed[content_hash]}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+snapshot_store = SnapshotStore()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Manage stored HTML snapshots.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("add", help="store an HTML file as a capture of URL")
+    add.add_argument("path")
+    add.add_argument("--url", required=True)
+    add.add_argument("--status", default="ok")
+    reparse = sub.add_parser("reparse", help="re-run profile extraction over stored pages")
+    reparse.add_argument("--status", help="only captures with this status (ok/error)")
+    reparse.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    reparse.add_argument("--out", help="write JSON lines here instead of stdout")
+    reparse.add_argument("--backend", help="extraction backend (see extraction.py), default EXTRACTION_BACKEND")
+    sub.add_parser("stats", help="show store size and counts")
+    args = parser.parse_args(argv)
+
+    if args.command == "add":
+        with open(args.path, "r", encoding="utf-8") as f:
+            print(snapshot_store.save(args.url, f.read(), args.status))
+    elif args.command == "stats":
+        print(json.dumps(snapshot_store.stats(), indent=2))
+    elif args.command == "reparse":
+        from functools import partial
+
+        from scraper import parse_profile
+
+        parser_fn = partial(parse_profile, backend=args.backend)
+        start = time.perf_counter()
+        out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+        count = 0
+        try:
+            for record in snapshot_store.reparse(parser_fn, args.status, args.workers):
+                out.write(json.dumps(record) + "\n")
+                count += 1
+        finally:
+            if args.out:
+                out.close()
+        elapsed = time.perf_counter() - start
+        print(f"re-parsed {count} captures in {elapsed:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
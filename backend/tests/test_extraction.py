@@ -0,0 +1,79 @@
+import os
+import random
+
+import pytest
+
+from extraction import EXTRACTORS, available_backends, get_extractor
+
+NAME = '<h1 class="profile-name">Jane Doe</h1>'
+BIO = '<div class="description-text"><span>Seed investor.</span></div>'
+
+# Malformed or unusual markup that every backend must read the same way as bs4
+MALFORMED = {
+    "unclosed chips": NAME + BIO + '<div><a class="chip">AI<a class="chip">Fintech</div>',
+    "nested chips": '<a class="chip">x<a class="chip">y</a></a>',
+    "chip closed by its parent": '<ul><li><a class="chip">AI</li><li><a class="chip">SaaS</a></li></ul>',
+    "stray end tags": '</span></a>' + NAME + '</div>' + BIO + '<a class="chip">AI</a></h1>',
+    "name left open": '<h1 class="profile-name">Jane <b>Doe</b>' + BIO,
+    "bio after a comment": '<div class="description-text"><!-- x --><span>Angel.</span></div>',
+    "bio nested too deep": '<div class="description-text"><p><span>not the bio</span></p></div>',
+    "template contents": '<template><h1 class="profile-name">T</h1><a class="chip">t</a></template>'
+                         + '<a class="chip">z<template>hidden</template></a>',
+    "script and style in chips": '<a class="chip">A<script>x()</script>I<style>p{}</style></a>',
+    "nul characters": '<h1 class="profile-name">Ja\x00ne</h1><a class="chip">A\x00I</a>',
+    "entities": '<h1 class="profile-name">Jane &amp; Co&nbsp;</h1><a class="chip">R&D &lt;3</a>',
+    "self-closed chip": '<a class="chip"/><a class="chip">AI</a>',
+    "void element chip": '<img class="chip"><a class="chip extra">AI</a>',
+    "upper-case tags": '<H1 CLASS="profile-name">Jane</H1><A class="chip">AI</A>',
+    "empty page": "",
+    "text only": "just some text",
+    "comment only": "<!-- c -->",
+    "stray end tag only": "</p>",
+}
+# Pages where libxml2 builds a different tree than html.parser (see extraction.py)
+LXML_REPAIRS = {"nested chips", "unclosed chips"}
+FRAGMENTS = [
+    '<h1 class="profile-name">', '</h1>', '<div class="description-text">', '</div>', '<span>', '</span>',
+    '<a class="chip">', '</a>', '<td>', '<table>', '<p>', '</p>', '<template>', '</template>', '<br>',
+    '<script>', '</script>', '<!-- c -->', 'text', ' more ', '&amp;', '\x00',
+]
+
+
+def backends():
+    if "bs4" not in available_backends():
+        pytest.skip("bs4 is not installed")
+    return [name for name in available_backends() if name != "bs4"]
+
+
+@pytest.mark.parametrize("label", sorted(MALFORMED))
+def test_backends_match_bs4_on_malformed_html(label):
+    page = MALFORMED[label]
+    expected = EXTRACTORS["bs4"](page)
+    for backend in backends():
+        if backend == "lxml" and label in LXML_REPAIRS:
+            continue
+        assert EXTRACTORS[backend](page) == expected, backend
+
+
+def test_stream_matches_bs4_on_random_pages():
+    if "bs4" not in available_backends():
+        pytest.skip("bs4 is not installed")
+    rng = random.Random(7)
+    for _ in range(500):
+        page = "<html><body>" + "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 30)))
+        assert EXTRACTORS["stream"](page) == EXTRACTORS["bs4"](page), page
+
+
+@pytest.mark.skipif("EXTRACTION_BACKEND" in os.environ, reason="EXTRACTION_BACKEND overrides the default")
+def test_stream_is_the_default():
+    assert get_extractor() is EXTRACTORS["stream"]
+    assert get_extractor("auto") is EXTRACTORS["stream"]
+
+
+def test_stream_keeps_nested_chips_in_document_order():
+    assert EXTRACTORS["stream"](MALFORMED["nested chips"])["interests"] == "xy, y"
+
+
+def test_nul_characters_are_dropped():
+    for backend in available_backends():
+        assert EXTRACTORS[backend](MALFORMED["nul characters"])["name"] == "Jane", backend
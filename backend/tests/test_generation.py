@@ -0,0 +1,116 @@
+import asyncio
+import contextlib
+import json
+import math
+from collections import deque
+from types import SimpleNamespace
+
+import pytest
+
+import generation
+from cache import TieredCache
+from main import InvestorInfo, StartupInfo
+
+STARTUP = StartupInfo(name="Acme", niche="developer tools", traction="1k users", goals="raise a seed round")
+
+
+def pitch_max_tokens(investor: InvestorInfo) -> int:
+    report: dict = {}
+    prompt = generation.render_prompt(generation.pitch_template, STARTUP, investor, "professional", report)
+    return generation.pitch_budget(prompt, report)
+
+
+def test_default_budget_is_the_cap_until_lengths_are_measured(monkeypatch):
+    monkeypatch.setattr(generation, "completion_lengths", {"pitch": deque(maxlen=200), "feedback": deque(maxlen=200)})
+    assert pitch_max_tokens(InvestorInfo(name="Jane")) == generation.PITCH_MAX_TOKENS
+    for _ in range(generation.COMPLETION_MIN_SAMPLES):
+        generation.record_completion_length("pitch", "", {"completion_tokens": 200}, "stop")
+    assert pitch_max_tokens(InvestorInfo(name="Jane")) == math.ceil(200 * generation.COMPLETION_HEADROOM)
+    prompt = generation.render_feedback_prompt("Hi Jane, quick intro.")
+    assert generation.feedback_budget(prompt) == generation.FEEDBACK_MAX_TOKENS
+
+
+def test_truncated_completions_raise_the_default_budget(monkeypatch):
+    monkeypatch.setattr(generation, "completion_lengths", {"pitch": deque(maxlen=200), "feedback": deque(maxlen=200)})
+    for _ in range(generation.COMPLETION_MIN_SAMPLES):
+        generation.record_completion_length("pitch", "", {"completion_tokens": 200}, "stop")
+    for _ in range(generation.COMPLETION_MIN_SAMPLES // 10 + 1):
+        generation.record_completion_length("pitch", "", {"completion_tokens": 250}, "length")
+    assert pitch_max_tokens(InvestorInfo(name="Jane")) == generation.PITCH_MAX_TOKENS
+
+
+def test_requested_budget_wins_up_to_the_cap():
+    report: dict = {}
+    prompt = generation.render_prompt(generation.pitch_template, STARTUP, InvestorInfo(name="Jane"), "professional", report)
+    assert generation.pitch_budget(prompt, report, 123) == 123
+    assert generation.pitch_budget(prompt, report, 10_000) == generation.PITCH_MAX_TOKENS
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, chunks, done):
+        self.lines = [f"data: {json.dumps({'choices': [{'text': chunk}]})}" for chunk in chunks]
+        if done:
+            self.lines.append(f"data: {json.dumps({'choices': [{'text': '', 'finish_reason': 'stop'}]})}")
+        if done:
+            self.lines.append("data: [DONE]")
+
+    async def aiter_lines(self):
+        for line in self.lines:
+            await asyncio.sleep(0.001)
+            yield line
+
+
+@pytest.fixture
+def together_stream(monkeypatch, tmp_path):
+    """Stub Together's streamed completions; `.calls` lists the payloads sent upstream."""
+    monkeypatch.setenv("TOGETHER_API_KEY", "test")
+    monkeypatch.setattr(generation, "completion_cache", TieredCache(db_path=str(tmp_path / "c.sqlite3"), stale_window=0.0))
+    upstream = SimpleNamespace(calls=[], done=True)
+
+    @contextlib.asynccontextmanager
+    async def stream(operation, method, url, json=None, **kwargs):
+        upstream.calls.append(json)
+        yield FakeResponse(["Hello", ", ", "Jane"], upstream.done)
+
+    monkeypatch.setattr(generation.together, "stream", stream)
+    monkeypatch.setattr(generation, "completion_lengths", {"pitch": deque(maxlen=200), "feedback": deque(maxlen=200)})
+    return upstream
+
+
+def collect(prompt):
+    async def events():
+        return [event async for event in generation.stream_completion_events(prompt, max_tokens=100)]
+
+    return events()
+
+
+def test_concurrent_identical_streams_share_one_upstream_call(together_stream):
+    async def scenario():
+        first, second = await asyncio.gather(collect("same prompt"), collect("same prompt"))
+        plain = await generation.complete("same prompt", 100)
+        return first, second, plain
+
+    first, second, plain = asyncio.run(scenario())
+    assert len(together_stream.calls) == 1
+    for events in (first, second):
+        text = "".join(json.loads(e.split("data: ", 1)[1])["text"] for e in events if e.startswith("event: token"))
+        assert text == "Hello, Jane"
+        assert json.loads(events[-1].split("data: ", 1)[1])["tokens"]["finish_reason"] == "stop"
+    assert plain["text"] == "Hello, Jane" and plain["cached"] and plain["finish_reason"] == "stop"
+    assert len(generation.completion_lengths["pitch"]) == 1
+
+
+def test_a_stream_cut_off_before_done_is_not_cached(together_stream):
+    together_stream.done = False
+
+    async def scenario():
+        events = await collect("cut off")
+        cached = await generation.completion_cache.get(generation.CACHE_NAMESPACE,
+                                                       generation.completion_key("cut off", 100, 0.7, None))
+        return events, cached
+
+    events, cached = asyncio.run(scenario())
+    assert events[-1].startswith("event: error")
+    assert cached is None
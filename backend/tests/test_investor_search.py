@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+import investor_search
+
+
+def stub_pages(monkeypatch, per_page, last_page, fail=()):
+    """fetch_page returning `per_page` results per page, with more pages up to `last_page`."""
+    fetched = []
+
+    async def fetch_page(query, page, no_cache=False):
+        fetched.append(page)
+        await asyncio.sleep(0.001 * (last_page - page))  # later pages arrive first
+        if page in fail:
+            raise RuntimeError("upstream failed")
+        site = "linkedin.com/in" if "linkedin" in query else "crunchbase.com/person"
+        items = [{"title": f"{page}-{i}", "link": f"https://www.{site}/{page}-{i}", "snippet": ""}
+                 for i in range(per_page)]
+        return items, page < last_page
+
+    monkeypatch.setattr(investor_search, "fetch_page", fetch_page)
+    return fetched
+
+
+def run_search(keywords, num_results):
+    async def collect():
+        results = {site: [] for site in investor_search.SITES}
+        async for site, _, items in investor_search.search(keywords, num_results):
+            results[site].extend(items)
+        return results
+
+    return asyncio.run(collect())
+
+
+@pytest.fixture(autouse=True)
+def page_size(monkeypatch):
+    monkeypatch.setattr(investor_search, "SEARCH_PAGE_SIZE", 10)
+    monkeypatch.setattr(investor_search, "SEARCH_MAX_PAGES", 10)
+
+
+def test_short_pages_are_not_the_end_of_results(monkeypatch):
+    fetched = stub_pages(monkeypatch, per_page=9, last_page=9)
+    results = run_search("fintech investor", 50)
+    assert [len(results[site]) for site in investor_search.SITES] == [50, 50]
+    assert len(fetched) <= 2 * 6 + 2  # one wave of 5 pages per site, then one more page each
+
+
+def test_search_stops_where_google_has_no_next_page(monkeypatch):
+    fetched = stub_pages(monkeypatch, per_page=10, last_page=1)
+    results = run_search("fintech investor", 50)
+    assert [len(results[site]) for site in investor_search.SITES] == [20, 20]
+    assert max(fetched) < 5
+
+
+def test_pages_after_a_failed_page_are_still_used(monkeypatch):
+    stub_pages(monkeypatch, per_page=10, last_page=9, fail={1})
+    results = run_search("fintech investor", 30)
+    titles = [result["title"] for result in results["linkedin"]]
+    assert titles == [f"{page}-{i}" for page in (0, 2) for i in range(10)]
@@ -0,0 +1,102 @@
+import asyncio
+import sqlite3
+
+import jobs
+from jobs import JobQueue
+
+
+def make_queue(tmp_path, handler=None, workers=1):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), workers=workers)
+
+    async def echo(payload):
+        return payload
+
+    queue.register("echo", handler or echo)
+    return queue
+
+
+def test_identical_jobs_are_deduplicated(tmp_path):
+    async def scenario():
+        queue = make_queue(tmp_path)
+        first = await queue.submit("echo", {"x": 1})
+        second = await queue.submit("echo", {"x": 1}, priority=5)
+        other = await queue.submit("echo", {"x": 2})
+        queue.start()
+        done = await queue.wait(first["id"], 5)
+        again = await queue.submit("echo", {"x": 1})
+        fresh = await queue.submit("echo", {"x": 1}, fresh=True)
+        await queue.stop()
+        queue.close()
+        return first, second, other, done, again, fresh
+
+    first, second, other, done, again, fresh = asyncio.run(scenario())
+    assert second == {"id": first["id"], "status": "queued", "deduplicated": True}
+    assert other["id"] != first["id"]
+    assert done["status"] == "done" and done["result"] == {"x": 1} and done["priority"] == 5
+    assert again["id"] == first["id"] and again["deduplicated"]
+    assert fresh["id"] != first["id"] and not fresh["deduplicated"]
+
+
+def test_jobs_of_a_dead_process_are_requeued_and_run(tmp_path, monkeypatch):
+    async def scenario():
+        dead = make_queue(tmp_path)
+        job = await dead.submit("echo", {"x": 1})
+        assert await asyncio.to_thread(dead._claim) is not None
+        await asyncio.to_thread(dead._heartbeat)
+        dead.close()  # crashed: no stop(), its heartbeat just goes stale
+        monkeypatch.setattr(jobs, "OWNER_TIMEOUT", 0.0)
+
+        queue = make_queue(tmp_path)
+        queue.start()
+        finished = await queue.wait(job["id"], 5)
+        await queue.stop()
+        queue.close()
+        return finished
+
+    finished = asyncio.run(scenario())
+    assert finished["status"] == "done" and finished["attempts"] == 2
+
+
+def test_a_job_interrupted_too_often_fails(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "OWNER_TIMEOUT", 0.0)
+
+    async def scenario():
+        queue = make_queue(tmp_path)
+        job = await queue.submit("echo", {"x": 1})
+        for _ in range(jobs.JOB_MAX_ATTEMPTS):
+            crashed = make_queue(tmp_path)
+            assert await asyncio.to_thread(crashed._claim) is not None
+            crashed.close()
+            await asyncio.to_thread(queue._heartbeat)
+        failed = await queue.get(job["id"])
+        queue.close()
+        return failed
+
+    failed = asyncio.run(scenario())
+    assert failed["status"] == "failed" and failed["attempts"] == jobs.JOB_MAX_ATTEMPTS
+    assert failed["error"] == "Interrupted too many times."
+
+
+def test_workers_survive_database_errors(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "POLL_INTERVAL", 0.01)
+
+    async def scenario():
+        queue = make_queue(tmp_path)
+        claim = queue._claim
+        failures = {"left": 2}
+
+        def flaky_claim():
+            if failures["left"]:
+                failures["left"] -= 1
+                raise sqlite3.OperationalError("database is locked")
+            return claim()
+
+        queue._claim = flaky_claim
+        job = await queue.submit("echo", {"x": 1})
+        queue.start()
+        finished = await queue.wait(job["id"], 5)
+        await queue.stop()
+        queue.close()
+        return finished
+
+    assert asyncio.run(scenario())["status"] == "done"
@@ -0,0 +1,69 @@
+import threading
+import time
+
+import search_index
+from search_index import SearchIndex
+
+
+def make_index(tmp_path):
+    index = SearchIndex(str(tmp_path / "index.sqlite3"))
+    index.add_results([
+        {"title": "Ada Lovelace - Fintech Investor", "link": "https://www.linkedin.com/in/ada",
+         "snippet": "Seed investor in fintech and payments."},
+        {"title": "Grace Hopper - Investor", "link": "https://www.linkedin.com/in/grace",
+         "snippet": "Angel investor in climate software."},
+        {"title": "Ada Ventures", "link": "https://www.crunchbase.com/organization/ada",
+         "snippet": "Fintech fund."},
+    ])
+    return index
+
+
+def test_every_meaningful_term_must_match(tmp_path):
+    index = make_index(tmp_path)
+    assert [r["url"] for r in index.search("fintech payments", 5)["linkedin"]] == ["https://www.linkedin.com/in/ada"]
+    # "climate" matches Grace, but "payments" does not
+    assert index.search("climate payments", 5) == {"linkedin": [], "crunchbase": []}
+
+
+def test_domain_words_alone_match_nothing(tmp_path):
+    index = make_index(tmp_path)
+    assert index.search("investors site:linkedin.com/in", 5) == {"linkedin": [], "crunchbase": []}
+    assert len(index.search("fintech investor linkedin", 5)["linkedin"]) == 1
+
+
+def test_unchanged_documents_are_not_rewritten(tmp_path):
+    index = make_index(tmp_path)
+    profile = {"linkedin": "https://www.linkedin.com/in/ada", "bio": "Backs fintech founders."}
+    assert index.add_profile(profile)
+    assert not index.add_profile(profile)
+    index.close()
+
+
+def test_length_norms_follow_added_documents(tmp_path):
+    index = make_index(tmp_path)
+    index.search("fintech", 5)
+    for i in range(20):
+        index.add_results([{"title": f"Investor {i}", "link": f"https://www.linkedin.com/in/p{i}",
+                            "snippet": "Fintech seed investor. " * (i + 1)}])
+        index.search("fintech", 5)
+    avg_len = index.total_len / len(index.docs)
+    for url, length in index.doc_len.items():
+        exact = search_index.BM25_K1 * (1 - search_index.BM25_B + search_index.BM25_B * length / avg_len)
+        assert abs(index._norms[url] - exact) <= exact * search_index.NORM_REBUILD_DRIFT
+
+
+def test_searches_do_not_wait_for_the_disk(tmp_path):
+    index = make_index(tmp_path)
+    index._write_lock.acquire()  # a write stuck on a locked database file
+    writer = threading.Thread(target=index.add_results, args=([
+        {"title": "Alan Turing - Investor", "link": "https://www.linkedin.com/in/alan", "snippet": "Fintech angel."}],))
+    writer.start()
+    try:
+        deadline = time.monotonic() + 5
+        while "https://www.linkedin.com/in/alan" not in index.docs and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(index.search("fintech", 5)["linkedin"]) == 2
+    finally:
+        index._write_lock.release()
+        writer.join()
+    index.close()
@@ -0,0 +1,34 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from http_clients import get_client
+from upstream import CircuitBreaker, Upstream
+
+
+def test_cancelled_half_open_probe_releases_the_breaker():
+    async def scenario():
+        upstream = Upstream("serpapi")
+        upstream.breaker.failure()
+        upstream.breaker._set_state(CircuitBreaker.OPEN)
+        upstream.breaker._opened_at -= upstream.breaker.reset  # reset time has passed
+        # Fill the limiter so the probe queues in _acquire
+        upstream.concurrency.limit = 1
+        await upstream.concurrency.acquire()
+        request = get_client(upstream.name).build_request("GET", "/search")
+        probe = asyncio.create_task(upstream._send("search", request, stream=False))
+        await asyncio.sleep(0)
+        assert upstream.breaker.state == CircuitBreaker.HALF_OPEN and upstream.breaker._probing
+        assert len(upstream.concurrency._waiters) == 1
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert not upstream.breaker._probing
+        assert not upstream.concurrency._waiters
+        upstream.breaker.allow()  # the next call may probe instead of failing fast
+        with pytest.raises(HTTPException):
+            upstream.breaker.allow()
+
+    asyncio.run(scenario())
+
@@ -0,0 +1,334 @@
+"""
+One call layer for every SerpAPI, Proxycurl and Together request.
+
+Each provider has:
+  - a token bucket that spaces call starts to its requests-per-second quota.
+    A 429 pauses the bucket for the Retry-After it carries, so every caller
+    backs off together, not just the one that was throttled.
+  - an adaptive concurrency limit (AIMD). It grows by one slot per window of
+    successful calls and shrinks by OVERLOAD_DECREASE on a 429, a 5xx or a
+    timeout, at most once per congestion event.
+  - a circuit breaker. After BREAKER_FAILURES consecutive failures (5xx,
+    timeouts, connection errors) calls fail fast with a 503 for BREAKER_RESET
+    seconds. Then a single probe decides whether it closes again.
+
+Throttled, 5xx and transport failures are retried up to <PROVIDER>_MAX_RETRIES
+times. The wait is exponential backoff with full jitter, or the Retry-After
+when the provider sends one. Retries queue for the same bucket and slots as
+new calls, so they cannot push a provider past its limits.
+
+Settings (environment variables):
+  <PROVIDER>_RPS               call starts per second, 0 for unlimited (default 0)
+  <PROVIDER>_BURST             calls allowed back to back before pacing (default max(1, RPS))
+  <PROVIDER>_MAX_CONCURRENCY   upper bound of the adaptive limit
+                               (defaults: serpapi 20, proxycurl 10, together 16)
+  <PROVIDER>_MIN_CONCURRENCY   lower bound of the adaptive limit (default 1)
+  <PROVIDER>_MAX_RETRIES       retries per call (default 3)
+  UPSTREAM_BACKOFF_BASE        first backoff ceiling in seconds (default 0.25)
+  UPSTREAM_BACKOFF_MAX         backoff ceiling in seconds (default 8)
+  UPSTREAM_RETRY_AFTER_MAX     longest Retry-After worth waiting for; longer ones
+                               are returned to the caller (default 30)
+  UPSTREAM_BREAKER_FAILURES    consecutive failures that open a breaker (default 5)
+  UPSTREAM_BREAKER_RESET       seconds a breaker stays open (default 30)
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+
+import httpx
+from fastapi import HTTPException
+
+from config import env_float, env_int
+from http_clients import get_client
+from metrics import (UPSTREAM_CIRCUIT_STATE, UPSTREAM_CONCURRENCY_LIMIT, UPSTREAM_REJECTED, UPSTREAM_RETRIES,
+                     span, upstream_call)
+
+UPSTREAM_BACKOFF_BASE = env_float("UPSTREAM_BACKOFF_BASE", 0.25)
+UPSTREAM_BACKOFF_MAX = env_float("UPSTREAM_BACKOFF_MAX", 8.0)
+UPSTREAM_RETRY_AFTER_MAX = env_float("UPSTREAM_RETRY_AFTER_MAX", 30.0)
+BREAKER_FAILURES = env_int("UPSTREAM_BREAKER_FAILURES", 5)
+BREAKER_RESET = env_float("UPSTREAM_BREAKER_RESET", 30.0)
+
+OVERLOAD_DECREASE = 0.7  # multiplier applied to the concurrency limit on overload
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+DEFAULT_MAX_CONCURRENCY = {"serpapi": 20, "proxycurl": 10, "together": 16}
+
+
+def retry_after_seconds(value: Optional[str], default: float = 1.0) -> float:
+    """Parse a Retry-After header given in seconds; HTTP dates fall back to `default`."""
+    try:
+        return max(0.0, float(value)) if value else default
+    except ValueError:
+        return default
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter for retry number `attempt` (0-based)."""
+    return random.uniform(0.0, min(UPSTREAM_BACKOFF_MAX, UPSTREAM_BACKOFF_BASE * 2 ** attempt))
+
+
+class TokenBucket:
+    """
+    Spaces call starts to `rate` per second with bursts of up to `burst`.
+    Tokens are reserved synchronously, so concurrent waiters queue in order.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def reserve(self) -> float:
+        """Take a token and return how long to wait before using it."""
+        now = time.monotonic()
+        wait = max(0.0, self._paused_until - now)
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1.0
+            if self._tokens < 0:
+                wait = max(wait, -self._tokens / self.rate)
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        """Hold every call start for `seconds`, e.g. for a 429's Retry-After."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class AdaptiveLimit:
+    """
+    Concurrency limit tuned by additive increase / multiplicative decrease.
+    Waiters are plain futures so the limit works on whichever event loop uses it.
+    """
+
+    def __init__(self, provider: str, minimum: int, maximum: int):
+        self.provider = provider
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(self.maximum)
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        UPSTREAM_CONCURRENCY_LIMIT.set(provider, value=self.limit)
+
+    async def acquire(self) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # Granted a slot just as we were cancelled; hand it on
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def success(self) -> None:
+        if self.limit < self.maximum:
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            UPSTREAM_CONCURRENCY_LIMIT.set(self.provider, value=self.limit)
+            self._wake()
+
+    def overload(self, started: float) -> None:
+        # Calls that were already in flight when the limit last shrank report the same congestion
+        if started < self._last_decrease:
+            return
+        self._last_decrease = time.monotonic()
+        self.limit = max(float(self.minimum), self.limit * OVERLOAD_DECREASE)
+        UPSTREAM_CONCURRENCY_LIMIT.set(self.provider, value=self.limit)
+
+
+class CircuitBreaker:
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    _GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, provider: str, failures: int = BREAKER_FAILURES, reset: float = BREAKER_RESET):
+        self.provider = provider
+        self.threshold = max(1, failures)
+        self.reset = reset
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._set_state(self.CLOSED)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        UPSTREAM_CIRCUIT_STATE.set(self.provider, value=self._GAUGE[state])
+
+    def allow(self) -> None:
+        """Raise 503 while open; once the reset time has passed, let one probe through."""
+        if self.state == self.CLOSED:
+            return
+        remaining = self._opened_at + self.reset - time.monotonic()
+        if self.state == self.OPEN and remaining <= 0:
+            self._set_state(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return
+        UPSTREAM_REJECTED.inc(self.provider)
+        retry_after = max(1, round(remaining))
+        raise HTTPException(status_code=503, headers={"Retry-After": str(retry_after)},
+                            detail=f"{self.provider} is failing; calls are paused for {retry_after}s.")
+
+    def success(self) -> None:
+        self.failures = 0
+        self._probing = False
+        if self.state != self.CLOSED:
+            self._set_state(self.CLOSED)
+
+    def failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+            self._opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+    def abandon(self) -> None:
+        """The call was cancelled before it told us anything."""
+        self._probing = False
+
+
+class Upstream:
+    def __init__(self, name: str):
+        prefix = name.upper()
+        self.name = name
+        rps = env_float(f"{prefix}_RPS", 0.0)
+        self.bucket = TokenBucket(rps, env_float(f"{prefix}_BURST", max(1.0, rps)))
+        self.max_concurrency = env_int(f"{prefix}_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY.get(name, 10))
+        self.concurrency = AdaptiveLimit(name, env_int(f"{prefix}_MIN_CONCURRENCY", 1), self.max_concurrency)
+        self.breaker = CircuitBreaker(name)
+        self.max_retries = env_int(f"{prefix}_MAX_RETRIES", 3)
+
+    async def _acquire(self) -> None:
+        with span(f"{self.name}.queue"):
+            await self.concurrency.acquire()
+            try:
+                await asyncio.sleep(self.bucket.reserve())
+            except BaseException:
+                self.concurrency.release()
+                raise
+
+    def _outcome(self, response: Optional[httpx.Response], started: float, attempt: int) -> Optional[float]:
+        """Feed one attempt's result to the limiter and breaker; return the retry delay, or None if final."""
+        status = response.status_code if response is not None else None
+        if status is not None and status not in RETRYABLE_STATUSES:
+            self.breaker.success()
+            self.concurrency.success()
+            return None
+        self.concurrency.overload(started)
+        if status == 429:
+            # Throttling means the provider is up, so it does not count towards the breaker
+            self.breaker.success()
+            delay = retry_after_seconds(response.headers.get("retry-after"), backoff_delay(attempt))
+            if delay > UPSTREAM_RETRY_AFTER_MAX:
+                return None
+            self.bucket.pause(delay)
+            return delay + random.uniform(0.0, UPSTREAM_BACKOFF_BASE)
+        self.breaker.failure()
+        if self.breaker.state == CircuitBreaker.OPEN:
+            return None
+        if status == 503 and response.headers.get("retry-after"):
+            delay = retry_after_seconds(response.headers["retry-after"])
+            return delay if delay <= UPSTREAM_RETRY_AFTER_MAX else None
+        return backoff_delay(attempt)
+
+    async def _send(self, operation: str, request: httpx.Request, stream: bool) -> httpx.Response:
+        """Send with retries. The returned response still holds its concurrency slot."""
+        client = get_client(self.name)
+        attempt = 0
+        while True:
+            self.breaker.allow()
+            try:
+                await self._acquire()
+            except BaseException:
+                # Cancelled while queued: a half-open probe must not stay claimed forever
+                self.breaker.abandon()
+                raise
+            started = time.monotonic()
+            response, error = None, None
+            try:
+                with upstream_call(self.name, operation) as call:
+                    response = await client.send(request, stream=stream)
+                    call.status = response.status_code
+            except httpx.TransportError as e:
+                error = e
+            except BaseException:
+                self.breaker.abandon()
+                self.concurrency.release()
+                raise
+            delay = self._outcome(response, started, attempt)
+            if delay is None or attempt >= self.max_retries:
+                if error is not None:
+                    self.concurrency.release()
+                    raise error
+                return response
+            if response is not None:
+                await response.aclose()
+            self.concurrency.release()
+            UPSTREAM_RETRIES.inc(self.name, str(response.status_code) if response is not None else type(error).__name__)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def request(self, operation: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send one request under this provider's limits, retrying transient failures."""
+        request = get_client(self.name).build_request(method, url, **kwargs)
+        response = await self._send(operation, request, stream=False)
+        self.concurrency.release()
+        return response
+
+    @asynccontextmanager
+    async def stream(self, operation: str, method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """
+        Like request(), but the body is streamed. Retries happen only before the
+        body starts; the concurrency slot is held until the stream is closed.
+        """
+        request = get_client(self.name).build_request(method, url, **kwargs)
+        response = await self._send(operation, request, stream=True)
+        try:
+            yield response
+        finally:
+            await response.aclose()
+            self.concurrency.release()
+
+    def stats(self) -> dict:
+        return {
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "max_concurrency": self.concurrency.maximum,
+            "in_flight": self.concurrency.in_flight,
+            "queued": len(self.concurrency._waiters),
+            "rps": self.bucket.rate,
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+        }
+
+
+upstreams: Dict[str, Upstream] = {name: Upstream(name) for name in ("serpapi", "proxycurl", "together")}
+
+
+def upstream_error(response: httpx.Response, label: str) -> HTTPException:
+    """The error to raise for a final non-200 upstream response."""
+    if response.status_code == 429:
+        return HTTPException(status_code=503, detail=f"{label} is rate limiting us: {response.text}",
+                             headers={"Retry-After": response.headers.get("retry-after", "1")})
+    return HTTPException(status_code=500, detail=f"{label} error: {response.text}")
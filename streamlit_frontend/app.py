@@ -1,36 +1,182 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 import os
 import json
+import uuid
+
+from storage import InvestorStore
 
 # --- CONFIG ---
 BACKEND_URL = "http://localhost:8000"  # Change if your FastAPI backend runs elsewhere
+DATA_DB = os.getenv("INVESTOR_DB_PATH", "investor_data.sqlite3")
+RESULTS_PAGE_SIZE = 20
+ENRICH_CONCURRENCY = 20  # parallel enrichments for "Enrich all visible results"
+REQUEST_TIMEOUT = (5, 120)  # (connect, read) seconds for backend calls
+SEARCH_CACHE_TTL = 600  # seconds a search response is reused across reruns
+# Legacy JSON files, imported into DATA_DB once
 STARTUP_FILE = "startup_info.json"
-RESULTS_FILE = "investor_results.json"
 ENRICHED_FILE = "enriched_investors.json"
 
-# --- LOAD FROM FILES ON APP START ---
-def load_json_file(path, default):
-    if os.path.exists(path):
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return default
-    return default
+# --- STORAGE ---
+@st.cache_resource
+def get_store():
+    store = InvestorStore(DATA_DB)
+    store.import_json_files(STARTUP_FILE, ENRICHED_FILE)
+    return store
+
+@st.cache_resource
+def get_http():
+    """One pooled Session shared by all reruns and sessions, sized for parallel enrichment."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=ENRICH_CONCURRENCY)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+store = get_store()
+http = get_http()
+# Search results are stored per browser session, so concurrent users never overwrite each other's
+if "session_id" not in st.session_state:
+    st.session_state["session_id"] = uuid.uuid4().hex
+session_id = st.session_state["session_id"]
+
+@st.cache_data(ttl=SEARCH_CACHE_TTL, show_spinner=False)
+def search_investors(keywords, num_results, no_cache=False):
+    """
+    Cached per query so reruns and repeated searches skip the backend. 'Refresh search'
+    clears it and sets no_cache, so the backend skips its local index and cache too.
+    """
+    resp = http.post(
+        f"{BACKEND_URL}/search_investors",
+        json={"keywords": keywords, "num_results": num_results, "no_cache": no_cache},
+        timeout=REQUEST_TIMEOUT,
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+def iter_sse(resp):
+    """Yield (event, data) pairs from a Server-Sent Events response."""
+    event, data_lines = "message", []
+    for line in resp.iter_lines(decode_unicode=True):
+        if not line:
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+
+def show_enriched(enriched):
+    with st.expander("Enriched Info"):
+        st.markdown(f"**Name:** {enriched.get('name','')}")
+        st.markdown(f"**Bio:** {enriched.get('bio','')}")
+        st.markdown(f"**Interests:** {enriched.get('interests','')}")
+        st.markdown(f"**LinkedIn:** {enriched.get('linkedin','')}")
+        st.markdown(f"**Notable Investments:** {enriched.get('notable_investments','')}")
+        st.markdown(f"**Location:** {enriched.get('location','')}")
+        if enriched.get('crunchbase_bio'):
+            st.markdown(f"**Crunchbase Bio:** {enriched.get('crunchbase_bio','')}")
+
+def visible_page(source, label):
+    """The current page of `source` results as [(result, enrich_key)]; only that page is read from the store."""
+    total = store.count_results(session_id, source)
+    if not total:
+        return []
+    pages = (total + RESULTS_PAGE_SIZE - 1) // RESULTS_PAGE_SIZE
+    page = 1
+    if pages > 1:
+        page = st.number_input(f"{label} page (of {pages})", min_value=1, max_value=pages, value=1, key=f"{source}_page")
+    page_results = store.load_results(session_id, source, (page - 1) * RESULTS_PAGE_SIZE, RESULTS_PAGE_SIZE)
+    # Use a unique key based on name and url
+    return [(res, f"{source}_{res['title']}_{res['url']}") for res in page_results]
+
+def enrich_all(rows, refresh):
+    """
+    Enrich every visible result through /bulk_enrich_investors, which runs
+    them concurrently and streams one line per investor as it finishes.
+    Already enriched investors are skipped unless `refresh` is set.
+    """
+    known = store.get_enriched_many([key for _, key in rows])
+    todo = [(res, key) for res, key in rows if refresh or key not in known]
+    if not todo:
+        st.info("All visible results are already enriched.")
+        return
+    progress = st.progress(0.0, text=f"Enriching 0/{len(todo)} investors...")
+    done = failed = 0
+    try:
+        with http.post(
+            f"{BACKEND_URL}/bulk_enrich_investors",
+            json={"investors": [res['title'] for res, _ in todo], "concurrency": ENRICH_CONCURRENCY, "no_cache": refresh},
+            stream=True,
+            timeout=REQUEST_TIMEOUT,
+        ) as resp:
+            if resp.status_code != 200:
+                st.error(f"Error: {resp.text}")
+                return
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                item = json.loads(line)
+                if "summary" in item:
+                    continue
+                if item["status"] == "ok":
+                    store.upsert_enriched(todo[item["index"]][1], item["profile"])
+                else:
+                    failed += 1
+                done += 1
+                progress.progress(done / len(todo), text=f"Enriching {done}/{len(todo)} investors...")
+    except Exception as e:
+        st.error(f"API error: {e}")
+        return
+    progress.empty()
+    if failed:
+        st.warning(f"Enriched {done - failed} of {len(todo)} investors; {failed} failed.")
+    else:
+        st.success(f"Enriched {done} investors.")
+
+def render_results(rows, label):
+    """Render result cards for one page; their enriched info is fetched in one query."""
+    if not rows:
+        return
+    st.markdown(f"**{label} Results:**")
+    enriched_page = store.get_enriched_many([key for _, key in rows])
+    for res, enrich_key in rows:
+        with st.container():
+            st.markdown(f"**{res['title']}**  ")
+            st.markdown(f"[View {label} Profile]({res['url']})")
+            st.markdown(f"_{res['snippet']}_")
+            if st.button("Auto Enrich", key=enrich_key):
+                with st.spinner("Enriching investor info..."):
+                    try:
+                        enrich_resp = http.post(
+                            f"{BACKEND_URL}/auto_enrich_investor",
+                            json={"name": res['title']},
+                            timeout=REQUEST_TIMEOUT,
+                        )
+                        if enrich_resp.status_code == 200:
+                            enriched = enrich_resp.json()
+                            # Write just this investor; the rest of the store is untouched
+                            store.upsert_enriched(enrich_key, enriched)
+                            enriched_page[enrich_key] = enriched
+                        else:
+                            st.error(f"Error: {enrich_resp.text}")
+                    except Exception as e:
+                        st.error(f"API error: {e}")
+            # Show enriched info if available
+            enriched = enriched_page.get(enrich_key)
+            if enriched:
+                show_enriched(enriched)
+            st.markdown("---")
 
 if "startup_loaded" not in st.session_state:
-    startup_info = load_json_file(STARTUP_FILE, {})
+    startup_info = store.get_startup()
     for k in ["startup_name", "description", "sector", "website"]:
         if k in startup_info:
             st.session_state[k] = startup_info[k]
     st.session_state["startup_loaded"] = True
 
-if "results_loaded" not in st.session_state:
-    st.session_state["investor_results"] = load_json_file(RESULTS_FILE, None)
-    st.session_state["enriched_investors"] = load_json_file(ENRICHED_FILE, {})
-    st.session_state["results_loaded"] = True
-
 # --- SIDEBAR ---
 st.sidebar.title("Smart Investor Pitch Generator")
 st.sidebar.markdown("""
@@ -56,29 +202,26 @@ if submitted:
     st.session_state["description"] = description
     st.session_state["sector"] = sector
     st.session_state["website"] = website
-    # Save to file
-    with open(STARTUP_FILE, "w", encoding="utf-8") as f:
-        json.dump({
-            "startup_name": startup_name,
-            "description": description,
-            "sector": sector,
-            "website": website
-        }, f)
+    store.save_startup({
+        "startup_name": startup_name,
+        "description": description,
+        "sector": sector,
+        "website": website
+    })
     st.success(f"Saved info for: {startup_name}")
 
 # Step 2: Search for Investors
 st.header("2. Search for Investors")
 search_query = st.text_input("Search investors by name, keyword, or sector")
+refresh_search = st.checkbox("Refresh search (skip cached results)", value=False)
 
-# Add a Clear All button to reset all data
+# Add a Clear All button to reset this session's data; enriched investors are shared and kept
 if st.button("Clear All Data"):
-    for k in ["startup_name", "description", "sector", "website", "investor_results", "enriched_investors"]:
+    for k in ["startup_name", "description", "sector", "website", "linkedin_page", "crunchbase_page"]:
         if k in st.session_state:
             del st.session_state[k]
-    # Remove files
-    for f in [STARTUP_FILE, RESULTS_FILE, ENRICHED_FILE]:
-        if os.path.exists(f):
-            os.remove(f)
+    store.clear(session_id)
+    search_investors.clear()
     st.experimental_rerun()
 
 if st.button("Search"):
@@ -87,121 +230,41 @@ if st.button("Search"):
     else:
         with st.spinner("Searching investors..."):
             try:
-                resp = requests.post(
-                    f"{BACKEND_URL}/search_investors",
-                    json={"keywords": search_query, "num_results": 5}
-                )
-                if resp.status_code == 200:
-                    results = resp.json()
-                    st.session_state["investor_results"] = results
-                    # Do NOT reset enriched_investors here, so previous enrichments are kept
-                    # Save to file
-                    with open(RESULTS_FILE, "w", encoding="utf-8") as f:
-                        json.dump(results, f)
-                    total_results = len(results.get('linkedin', [])) + len(results.get('crunchbase', []))
-                    st.success(f"Found {total_results} results.")
-                else:
-                    st.error(f"Error: {resp.text}")
+                if refresh_search:
+                    search_investors.clear()
+                results = search_investors(search_query, 5, no_cache=refresh_search)
+                # Do NOT reset enriched investors here, so previous enrichments are kept
+                store.replace_results(session_id, results)
+                for k in ["linkedin_page", "crunchbase_page"]:
+                    st.session_state.pop(k, None)
+                total_results = len(results.get('linkedin', [])) + len(results.get('crunchbase', []))
+                st.success(f"Found {total_results} results.")
+            except requests.HTTPError as e:
+                st.error(f"Error: {e.response.text}")
             except Exception as e:
                 st.error(f"API error: {e}")
 
 # --- Display Results if present ---
-results = st.session_state.get("investor_results")
-if results:
-    total_results = len(results.get('linkedin', [])) + len(results.get('crunchbase', []))
-    if total_results > 0:
-        st.subheader("Investor Results")
-        # LinkedIn Results
-        if results.get('linkedin'):
-            st.markdown("**LinkedIn Results:**")
-            for i, res in enumerate(results['linkedin']):
-                with st.container():
-                    st.markdown(f"**{res['title']}**  ")
-                    st.markdown(f"[View LinkedIn Profile]({res['url']})")
-                    st.markdown(f"_{res['snippet']}_")
-                    # Use a unique key based on name and url
-                    enrich_key = f"linkedin_{res['title']}_{res['url']}"
-                    if st.button("Auto Enrich", key=enrich_key):
-                        with st.spinner("Enriching investor info..."):
-                            try:
-                                enrich_resp = requests.post(
-                                    f"{BACKEND_URL}/auto_enrich_investor",
-                                    json={"name": res['title']}
-                                )
-                                if enrich_resp.status_code == 200:
-                                    enriched = enrich_resp.json()
-                                    st.session_state["enriched_investors"][enrich_key] = enriched
-                                    # Save enriched investors to file
-                                    with open(ENRICHED_FILE, "w", encoding="utf-8") as f:
-                                        json.dump(st.session_state["enriched_investors"], f)
-                                else:
-                                    st.error(f"Error: {enrich_resp.text}")
-                            except Exception as e:
-                                st.error(f"API error: {e}")
-                    # Show enriched info if available
-                    enriched = st.session_state["enriched_investors"].get(enrich_key)
-                    if enriched:
-                        with st.expander("Enriched Info"):
-                            st.markdown(f"**Name:** {enriched.get('name','')}")
-                            st.markdown(f"**Bio:** {enriched.get('bio','')}")
-                            st.markdown(f"**Interests:** {enriched.get('interests','')}")
-                            st.markdown(f"**LinkedIn:** {enriched.get('linkedin','')}")
-                            st.markdown(f"**Notable Investments:** {enriched.get('notable_investments','')}")
-                            st.markdown(f"**Location:** {enriched.get('location','')}")
-                            if enriched.get('crunchbase_bio'):
-                                st.markdown(f"**Crunchbase Bio:** {enriched.get('crunchbase_bio','')}")
-                    st.markdown("---")
-        # Crunchbase Results
-        if results.get('crunchbase'):
-            st.markdown("**Crunchbase Results:**")
-            for i, res in enumerate(results['crunchbase']):
-                with st.container():
-                    st.markdown(f"**{res['title']}**  ")
-                    st.markdown(f"[View Crunchbase Profile]({res['url']})")
-                    st.markdown(f"_{res['snippet']}_")
-                    # Use a unique key based on name and url
-                    enrich_key = f"crunchbase_{res['title']}_{res['url']}"
-                    if st.button("Auto Enrich", key=enrich_key):
-                        with st.spinner("Enriching investor info..."):
-                            try:
-                                enrich_resp = requests.post(
-                                    f"{BACKEND_URL}/auto_enrich_investor",
-                                    json={"name": res['title']}
-                                )
-                                if enrich_resp.status_code == 200:
-                                    enriched = enrich_resp.json()
-                                    st.session_state["enriched_investors"][enrich_key] = enriched
-                                    # Save enriched investors to file
-                                    with open(ENRICHED_FILE, "w", encoding="utf-8") as f:
-                                        json.dump(st.session_state["enriched_investors"], f)
-                                else:
-                                    st.error(f"Error: {enrich_resp.text}")
-                            except Exception as e:
-                                st.error(f"API error: {e}")
-                    # Show enriched info if available
-                    enriched = st.session_state["enriched_investors"].get(enrich_key)
-                    if enriched:
-                        with st.expander("Enriched Info"):
-                            st.markdown(f"**Name:** {enriched.get('name','')}")
-                            st.markdown(f"**Bio:** {enriched.get('bio','')}")
-                            st.markdown(f"**Interests:** {enriched.get('interests','')}")
-                            st.markdown(f"**LinkedIn:** {enriched.get('linkedin','')}")
-                            st.markdown(f"**Notable Investments:** {enriched.get('notable_investments','')}")
-                            st.markdown(f"**Location:** {enriched.get('location','')}")
-                            if enriched.get('crunchbase_bio'):
-                                st.markdown(f"**Crunchbase Bio:** {enriched.get('crunchbase_bio','')}")
-                    st.markdown("---")
+if store.count_results(session_id) > 0:
+    st.subheader("Investor Results")
+    linkedin_rows = visible_page("linkedin", "LinkedIn")
+    crunchbase_rows = visible_page("crunchbase", "Crunchbase")
+    enrich_col, refresh_col = st.columns(2)
+    refresh_enriched = refresh_col.checkbox("Re-enrich investors that are already enriched", value=False)
+    if enrich_col.button("Enrich all visible results"):
+        enrich_all(linkedin_rows + crunchbase_rows, refresh_enriched)
+    render_results(linkedin_rows, "LinkedIn")
+    render_results(crunchbase_rows, "Crunchbase")
 
 # Step 4: Generate Personalized Pitch
 st.header("3. Generate Personalized Pitch")
 
 # Only allow if there is at least one enriched investor
-all_enriched = st.session_state.get("enriched_investors", {})
-if all_enriched:
-    enriched_keys = list(all_enriched.keys())
-    enriched_labels = [all_enriched[k].get("name", k) for k in enriched_keys]
-    selected_idx = st.selectbox("Select an investor to generate a pitch for:", range(len(enriched_keys)), format_func=lambda i: enriched_labels[i])
-    selected_investor = all_enriched[enriched_keys[selected_idx]]
+# Only names are listed; the selected profile is then looked up by key
+enriched_index = store.list_enriched()
+if enriched_index:
+    selected_idx = st.selectbox("Select an investor to generate a pitch for:", range(len(enriched_index)), format_func=lambda i: enriched_index[i][1])
+    selected_investor = store.get_enriched(enriched_index[selected_idx][0]) or {}
 
     # Startup info (from session state)
     s_name = st.session_state.get("startup_name", "")
@@ -217,6 +280,7 @@ if all_enriched:
 
     tone = st.selectbox("Select tone: ", ["professional", "friendly", "bold", "enthusiastic"])
     feedback = st.checkbox("Request feedback on the pitch?", value=True)
+    fresh = st.checkbox("Write a new variation (ignore the cached pitch)", value=False)
 
     if st.button("Generate Pitch"):
         with st.spinner("Generating pitch..."):
@@ -239,20 +303,51 @@ if all_enriched:
                         "location": selected_investor.get("location", "")
                     },
                     "tone": tone,
-                    "feedback": feedback
+                    "feedback": feedback,
+                    "fresh": fresh
                 }
-                resp = requests.post(f"{BACKEND_URL}/generate", json=payload)
-                if resp.status_code == 200:
-                    pitch = resp.json().get("result", "")
+                # Stream tokens from the backend and render the email as it is written
+                st.markdown("---")
+                st.markdown("**Generated Pitch:**")
+                pitch_placeholder = st.empty()
+                feedback_header = st.empty()
+                feedback_placeholder = st.empty()
+                pitch = ""
+                critique = ""
+                done = None
+                feedback_done = None
+                with http.post(f"{BACKEND_URL}/generate_stream", json=payload, stream=True, timeout=REQUEST_TIMEOUT) as resp:
+                    if resp.status_code != 200:
+                        st.error(f"Error: {resp.text}")
+                    else:
+                        for event, data in iter_sse(resp):
+                            if event == "token":
+                                pitch += data.get("text", "")
+                                pitch_placeholder.markdown(f"""```markdown\n{pitch}\n```""")
+                            elif event == "error":
+                                st.error(f"Error: {data.get('detail', '')}")
+                            elif event == "done":
+                                done = data
+                            elif event == "feedback_token":
+                                # The pitch is final; its critique streams in below it
+                                critique += data.get("text", "")
+                                feedback_header.markdown("**Feedback:**")
+                                feedback_placeholder.markdown(critique)
+                            elif event == "feedback_error":
+                                st.warning(f"Feedback unavailable: {data.get('detail', '')}")
+                            elif event == "feedback_done":
+                                feedback_done = data
+                if done is not None:
                     st.success("Pitch generated!")
-                    st.markdown("---")
-                    st.markdown("**Generated Pitch:**")
-                    st.markdown(f"""```markdown\n{pitch}\n```""")
+                    if done.get("cached"):
+                        st.caption("Served from cache. Tick 'Write a new variation' for a fresh pitch.")
+                    else:
+                        st.caption(f"First token after {done.get('ttft_ms')} ms, complete after {done.get('total_ms')} ms")
+                    if feedback_done is not None and not feedback_done.get("cached"):
+                        st.caption(f"Feedback written in {feedback_done.get('total_ms')} ms")
                     if st.button("Copy Pitch to Clipboard"):
                         st.experimental_set_clipboard(pitch)
                         st.info("Pitch copied to clipboard!")
-                else:
-                    st.error(f"Error: {resp.text}")
             except Exception as e:
                 st.error(f"API error: {e}")
 else:
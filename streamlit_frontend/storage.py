@@ -0,0 +1,183 @@
+"""
+SQLite-backed storage for the Streamlit app.
+
+Replaces the three JSON files (startup_info.json, investor_results.json,
+enriched_investors.json) that were rewritten in full on every change:
+  - enriched investors are upserted one row at a time and looked up by key;
+    they are shared by every browser session
+  - search results are stored as rows and loaded a page at a time; they are
+    keyed by the browser session's id, so sessions never see or replace each
+    other's results, and a session's rows are dropped after RESULTS_MAX_AGE
+  - WAL mode plus a busy timeout lets several sessions write safely
+
+On first use the startup and enriched investor JSON files are imported once.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SCHEMA = """
+PRAGMA journal_mode=WAL;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS startup (id INTEGER PRIMARY KEY CHECK (id = 1), data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS search_results (
+    session TEXT NOT NULL,
+    source TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    url TEXT NOT NULL,
+    snippet TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (session, source, position)
+);
+CREATE INDEX IF NOT EXISTS results_by_age ON search_results (created_at);
+CREATE TABLE IF NOT EXISTS enriched_investors (
+    key TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS enriched_by_update ON enriched_investors (updated_at);
+"""
+
+RESULT_SOURCES = ("linkedin", "crunchbase")
+RESULTS_MAX_AGE = 7 * 24 * 3600.0  # seconds a session's search results are kept
+
+
+class InvestorStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(search_results)")]
+            if columns and "session" not in columns:
+                # Results from before sessions were tracked belong to nobody
+                conn.execute("DROP TABLE search_results")
+            conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread: Streamlit runs each session's script on its own thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA busy_timeout = 30000")
+            self._local.conn = conn
+        return conn
+
+    # --- startup info ---
+    def get_startup(self) -> dict:
+        row = self._conn().execute("SELECT data FROM startup WHERE id = 1").fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def save_startup(self, info: dict) -> None:
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO startup (id, data) VALUES (1, ?)", (json.dumps(info),))
+
+    # --- search results ---
+    def replace_results(self, session: str, results: dict) -> None:
+        """
+        Store a new search response ({"linkedin": [...], "crunchbase": [...]})
+        for `session`, replacing its previous one. Expired sessions are dropped.
+        """
+        now = time.time()
+        rows = [
+            (session, source, position, r.get("title", ""), r.get("url", ""), r.get("snippet", ""), now)
+            for source in RESULT_SOURCES
+            for position, r in enumerate(results.get(source) or [])
+        ]
+        with self._conn() as conn:
+            conn.execute("DELETE FROM search_results WHERE session = ? OR created_at < ?",
+                         (session, now - RESULTS_MAX_AGE))
+            conn.executemany("INSERT INTO search_results VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def count_results(self, session: str, source: Optional[str] = None) -> int:
+        if source:
+            return self._conn().execute(
+                "SELECT COUNT(*) FROM search_results WHERE session = ? AND source = ?", (session, source)
+            ).fetchone()[0]
+        return self._conn().execute("SELECT COUNT(*) FROM search_results WHERE session = ?", (session,)).fetchone()[0]
+
+    def load_results(self, session: str, source: str, offset: int = 0, limit: int = 10) -> List[dict]:
+        """One page of `session`'s results for `source`, in the order the search returned them."""
+        rows = self._conn().execute(
+            "SELECT title, url, snippet FROM search_results WHERE session = ? AND source = ?"
+            " ORDER BY position LIMIT ? OFFSET ?",
+            (session, source, limit, offset),
+        ).fetchall()
+        return [{"title": title, "url": url, "snippet": snippet} for title, url, snippet in rows]
+
+    # --- enriched investors ---
+    def upsert_enriched(self, key: str, investor: dict) -> None:
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO enriched_investors (key, name, data, updated_at) VALUES (?, ?, ?, ?)",
+                (key, investor.get("name") or key, json.dumps(investor), time.time()),
+            )
+
+    def upsert_enriched_many(self, items: Iterable[Tuple[str, dict]]) -> None:
+        now = time.time()
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO enriched_investors (key, name, data, updated_at) VALUES (?, ?, ?, ?)",
+                [(key, inv.get("name") or key, json.dumps(inv), now) for key, inv in items],
+            )
+
+    def get_enriched(self, key: str) -> Optional[dict]:
+        row = self._conn().execute("SELECT data FROM enriched_investors WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_enriched_many(self, keys: List[str]) -> Dict[str, dict]:
+        """Look up several keys in one query, e.g. every card on the current page."""
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        rows = self._conn().execute(
+            f"SELECT key, data FROM enriched_investors WHERE key IN ({placeholders})", keys
+        ).fetchall()
+        return {key: json.loads(data) for key, data in rows}
+
+    def list_enriched(self) -> List[Tuple[str, str]]:
+        """(key, name) for every enriched investor, oldest first, without loading profiles."""
+        return self._conn().execute(
+            "SELECT key, name FROM enriched_investors ORDER BY updated_at, key"
+        ).fetchall()
+
+    def count_enriched(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM enriched_investors").fetchone()[0]
+
+    # --- maintenance ---
+    def clear(self, session: str) -> None:
+        """Drop `session`'s search results; other sessions and the shared enriched investors are kept."""
+        with self._conn() as conn:
+            conn.execute("DELETE FROM search_results WHERE session = ?", (session,))
+
+    def import_json_files(self, startup_path: str, enriched_path: str) -> bool:
+        """
+        One-time import of the legacy JSON files. Returns True if it ran.
+        The files are left in place; a meta flag stops the import from repeating.
+        Old search results are not imported: they belonged to no session.
+        """
+        with self._conn() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'json_imported'").fetchone():
+                return False
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported', ?)", (str(time.time()),))
+        startup = _load_json(startup_path)
+        if startup:
+            self.save_startup(startup)
+        enriched = _load_json(enriched_path)
+        if enriched:
+            self.upsert_enriched_many(enriched.items())
+        return True
+
+
+def _load_json(path: str):
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return None
+    return None